@@ -0,0 +1,237 @@
+"""
+Factories for the Jira and Confluence API clients.
+
+All clients are built on a tuned requests Session: connections are kept alive
+and pooled (sized to the number of threads that will share the client),
+responses are requested gzip-compressed, and every call has connect and read
+timeouts. The pools keep counters of requests and new connections so that
+connection reuse can be checked.
+
+JSON responses are decoded directly from the raw bytes, with orjson if it is
+installed, and the text of each response is only decoded once.
+"""
+
+import json
+import logging
+import os
+from functools import cached_property
+from typing import Any, Optional
+
+import requests
+from atlassian import Confluence, Jira  # type: ignore
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library decoder is used instead
+    orjson = None  # type: ignore[assignment]  # pylint: disable=invalid-name
+
+_logger = logging.getLogger(__name__)
+
+# Number of connections to keep open to each host. This should be at least the
+# number of threads that share a client, or connections get discarded and
+# re-established (with a new TLS handshake) under load.
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+# Maximum time, in seconds, to wait for a connection to be established
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "10"))
+# Maximum time, in seconds, to wait between bytes of the response
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "60"))
+
+# The JSON decoder used for API responses
+JSON_DECODER = "orjson" if orjson is not None else "json"
+
+
+def json_loads(data: bytes | str) -> Any:
+    """
+    Decode a JSON document with the fastest available decoder.
+
+    Parameters:
+        - data: The JSON document (UTF-8 if bytes)
+
+    Returns:
+        The decoded value
+
+    Examples:
+    >>> json_loads(b'{"key": "ABC-1", "fields": {"labels": []}}')
+    {'key': 'ABC-1', 'fields': {'labels': []}}
+    """
+    if orjson is not None:
+        return orjson.loads(data)  # pylint: disable=no-member
+    return json.loads(data)
+
+
+class _FastResponse(requests.Response):
+    """
+    A response that decodes its JSON body straight from the raw bytes.
+
+    The atlassian client reads the text of every response several times (for
+    its debug log, and to check for an empty body) before decoding the JSON
+    from that text, so the text is decoded once and kept.
+    """
+
+    @cached_property
+    def text(self) -> str:  # type: ignore[override]
+        return super().text
+
+    def json(self, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().json(**kwargs)
+        try:
+            return json_loads(self.content)
+        except ValueError:
+            # Not UTF-8 or not JSON; let requests handle (and report) it
+            return super().json()
+
+
+def _fast_response(
+    response: requests.Response, *_args: Any, **_kwargs: Any
+) -> requests.Response:
+    """Response hook that switches a response to the fast decoding path."""
+    response.__class__ = _FastResponse
+    return response
+
+
+def make_session(pool_size: Optional[int] = None) -> requests.Session:
+    """
+    Create a pooled, keep-alive HTTP session.
+
+    The session does not retry on its own; retries are handled by
+    `jiraissues.with_retry`.
+
+    Parameters:
+        - pool_size: The number of connections to keep per host (default:
+          HTTP_POOL_SIZE)
+
+    Returns:
+        The session
+
+    Examples:
+    >>> session = make_session(4)
+    >>> session.get_adapter("https://jira.example.com")._pool_maxsize
+    4
+    >>> session.headers["Accept-Encoding"]
+    'gzip, deflate'
+    >>> _fast_response in session.hooks["response"]
+    True
+    """
+    size = pool_size if pool_size is not None else HTTP_POOL_SIZE
+    adapter = HTTPAdapter(
+        pool_connections=4,  # Number of distinct hosts to keep pools for
+        pool_maxsize=size,
+        # Wait for a free connection instead of opening (and then discarding)
+        # an extra one when all are in use
+        pool_block=True,
+        max_retries=0,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    session.headers["Connection"] = "keep-alive"
+    session.hooks["response"].append(_fast_response)
+    return session
+
+
+def _set_timeouts(client: Jira | Confluence) -> Jira | Confluence:
+    """Give a client separate connect and read timeouts."""
+    # The constructor only accepts a single (integer) timeout, but the value is
+    # passed straight through to requests, which also takes (connect, read)
+    client.timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    return client
+
+
+def jira_client(pool_size: Optional[int] = None) -> Jira:
+    """
+    Create a Jira client from the JIRA_URL and JIRA_TOKEN environment
+    variables.
+
+    Parameters:
+        - pool_size: The number of connections to keep (default:
+          HTTP_POOL_SIZE)
+
+    Returns:
+        The Jira client
+    """
+    return _set_timeouts(
+        Jira(
+            url=os.environ["JIRA_URL"],
+            token=os.environ["JIRA_TOKEN"],
+            session=make_session(pool_size),
+        )
+    )
+
+
+def confluence_client(pool_size: Optional[int] = None) -> Confluence:
+    """
+    Create a Confluence client from the CONFLUENCE_URL and CONFLUENCE_TOKEN
+    environment variables.
+
+    Parameters:
+        - pool_size: The number of connections to keep (default:
+          HTTP_POOL_SIZE)
+
+    Returns:
+        The Confluence client
+    """
+    return _set_timeouts(
+        Confluence(
+            url=os.environ["CONFLUENCE_URL"],
+            token=os.environ["CONFLUENCE_TOKEN"],
+            session=make_session(pool_size),
+        )
+    )
+
+
+def connection_stats(client: Jira | Confluence | requests.Session) -> dict[str, int]:
+    """
+    Get the connection reuse counters of a client.
+
+    Parameters:
+        - client: A client created by this module, or its session
+
+    Returns:
+        A dictionary with the number of requests made and the number of
+        connections opened to make them. With pooling working, the number of
+        connections stays close to the pool size as requests increase.
+
+    Examples:
+    >>> connection_stats(make_session())
+    {'requests': 0, 'connections': 0, 'reused': 0}
+    """
+    session = client if isinstance(client, requests.Session) else client.session
+    num_requests = 0
+    num_connections = 0
+    # The same adapter is mounted for both http and https
+    adapters = {id(a): a for a in session.adapters.values()}
+    for adapter in adapters.values():
+        if not isinstance(adapter, HTTPAdapter):
+            continue
+        pools = adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            num_requests += pool.num_requests
+            num_connections += pool.num_connections
+    return {
+        "requests": num_requests,
+        "connections": num_connections,
+        "reused": max(num_requests - num_connections, 0),
+    }
+
+
+def log_connection_stats(name: str, client: Jira | Confluence) -> None:
+    """
+    Log the connection reuse counters of a client.
+
+    Parameters:
+        - name: The name to identify the client in the log
+        - client: The client
+    """
+    stats = connection_stats(client)
+    _logger.info(
+        "%s HTTP: %d requests over %d connections",
+        name,
+        stats["requests"],
+        stats["connections"],
+    )
@@ -0,0 +1 @@
+"""Benchmarks for the summarizer's performance-sensitive code."""
@@ -0,0 +1,189 @@
+#! /usr/bin/env python
+
+"""
+Measure the memory used by cached Jira issues.
+
+Synthetic, but realistically shaped, issue payloads are loaded into an
+IssueCache, and the memory allocated while doing so is reported per issue.
+
+Run from the top of the repository:
+
+    python -m benchmarks.issue_memory --issues 10000
+"""
+
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from fakejira import random_user, random_words
+from jiraissues import (
+    CF_CONTRIBUTORS,
+    CF_EPIC_LINK,
+    ChangelogEntry,
+    Issue,
+    IssueCache,
+)
+
+_STATUSES = ["New", "Refinement", "In Progress", "Review", "Closed"]
+_TYPES = ["Story", "Task", "Bug", "Epic", "Sub-task"]
+_RESOLUTIONS = [None, {"name": "Done"}, {"name": "Won't Do"}]
+_FIELDS = ["status", "assignee", "labels", "description", "Sprint", "Story Points"]
+
+
+def make_payload(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    rnd: random.Random,
+    key: str,
+    n_users: int = 200,
+    n_comments: int = 5,
+    n_changes: int = 20,
+    n_links: int = 5,
+) -> dict[str, Any]:
+    """
+    Create a synthetic (hydrated) issue payload, as returned by the API.
+
+    Parameters:
+        - rnd: The random number generator to use
+        - key: The key of the issue
+        - n_users: The number of distinct users to draw from
+        - n_comments: The number of comments on the issue
+        - n_changes: The number of changelog entries
+        - n_links: The number of linked issues
+
+    Returns:
+        The issue payload
+    """
+    now = datetime(2024, 6, 1, tzinfo=UTC)
+
+    def stamp(days: float) -> str:
+        return (now - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%S.000+0000")
+
+    def status() -> dict[str, Any]:
+        return {
+            "name": rnd.choice(_STATUSES),
+            "statusCategory": {"name": rnd.choice(["To Do", "Done"])},
+        }
+
+    links = [
+        {
+            "type": {"inward": "is blocked by", "outward": "blocks"},
+            "outwardIssue": {
+                "key": f"LINK-{rnd.randrange(100000)}",
+                "fields": {
+                    "summary": random_words(rnd, 8),
+                    "issuetype": {"name": rnd.choice(_TYPES)},
+                    "status": status(),
+                },
+            },
+        }
+        for _ in range(n_links)
+    ]
+    return {
+        "key": key,
+        "fields": {
+            "summary": random_words(rnd, 8),
+            "description": random_words(rnd, 150),
+            "issuetype": {"name": rnd.choice(_TYPES)},
+            "project": {"key": key.split("-", maxsplit=1)[0]},
+            "status": status(),
+            "labels": ["AISummary"] if rnd.random() < 0.5 else [],
+            "resolution": rnd.choice(_RESOLUTIONS),
+            "updated": stamp(rnd.uniform(0, 30)),
+            "comment": {
+                "comments": [
+                    {
+                        "author": random_user(rnd, n_users),
+                        "created": stamp(rnd.uniform(0, 90)),
+                        "body": random_words(rnd, 40),
+                    }
+                    for _ in range(n_comments)
+                ]
+            },
+            "assignee": random_user(rnd, n_users),
+            CF_CONTRIBUTORS: [random_user(rnd, n_users) for _ in range(3)],
+            CF_EPIC_LINK: f"EPIC-{rnd.randrange(1000)}",
+            "issuelinks": links,
+            "subtasks": [],
+        },
+        "changelog": {
+            "startAt": 0,
+            "maxResults": n_changes,
+            "total": n_changes,
+            "histories": [
+                {
+                    "id": str(10000 + i),
+                    "author": random_user(rnd, n_users),
+                    "created": stamp(rnd.uniform(0, 90)),
+                    "items": [
+                        {
+                            "field": rnd.choice(_FIELDS),
+                            "fromString": rnd.choice(_STATUSES),
+                            "toString": rnd.choice(_STATUSES),
+                        }
+                        for _ in range(2)
+                    ],
+                }
+                for i in range(n_changes)
+            ],
+        },
+    }
+
+
+def measure(n_issues: int, seed: int = 0) -> dict[str, Any]:
+    """
+    Load synthetic issues into a cache and measure the memory they use.
+
+    Parameters:
+        - n_issues: The number of issues to load
+        - seed: The random seed for generating the issues
+
+    Returns:
+        The measurements
+    """
+    rnd = random.Random(seed)
+    # The payloads are decoded while measuring so that, as with real API
+    # responses, every issue starts with its own copy of each string, and
+    # only what the Issue objects keep is counted.
+    responses = [
+        json.dumps(make_payload(rnd, f"BENCH-{i}")) for i in range(n_issues)
+    ]
+    cache = IssueCache(n_issues)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for response in responses:
+        payload = json.loads(response)
+        issue = Issue(None, payload["key"], payload)  # type: ignore[arg-type]
+        cache._insert(issue.key, issue)  # pylint: disable=protected-access
+    del payload, issue
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    # The changelog came with the payload, so it doesn't need to be fetched
+    sample = cache.get_issue(None, "BENCH-0")  # type: ignore[arg-type]
+    assert isinstance(sample.changelog[0], ChangelogEntry)
+    return {
+        "issues": n_issues,
+        "bytes_total": used,
+        "bytes_per_issue": used // max(n_issues, 1),
+        "estimated_bytes_per_issue": cache.size_bytes // max(n_issues, 1),
+    }
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Measure cached issue memory")
+    parser.add_argument(
+        "-n", "--issues", type=int, default=5000, help="Number of issues to load"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    print(json.dumps(measure(args.issues, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
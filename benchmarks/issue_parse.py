@@ -0,0 +1,136 @@
+#! /usr/bin/env python
+
+"""
+Measure the time to decode and parse Jira issue payloads.
+
+Each payload is decoded from its JSON text with the standard library and with
+the decoder used by the API clients (orjson, when installed), and then parsed
+into an Issue. The best time per payload over several runs is reported.
+
+The payloads are either recorded API responses, one per file (as returned when
+fetching an issue with `expand=changelog`), or synthetic ones shaped like a
+long-lived epic.
+
+Run from the top of the repository:
+
+    python -m benchmarks.issue_parse --issues 200
+    python -m benchmarks.issue_parse --recorded path/to/payloads/
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from typing import Any, Callable
+
+from apiclients import JSON_DECODER, json_loads
+from benchmarks.issue_memory import make_payload
+from jiraissues import Issue
+
+
+def _best_time(func: Callable[[], Any], repeat: int) -> float:
+    """The shortest time taken by a function over several runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_recorded(path: str) -> list[bytes]:
+    """
+    Load recorded issue payloads.
+
+    Parameters:
+        - path: A directory holding one JSON file per issue
+
+    Returns:
+        The raw payloads
+    """
+    payloads: list[bytes] = []
+    for name in sorted(os.listdir(path)):
+        if name.endswith(".json"):
+            with open(os.path.join(path, name), "rb") as file:
+                payloads.append(file.read())
+    return payloads
+
+
+def make_synthetic(n_issues: int, seed: int = 0) -> list[bytes]:
+    """
+    Create synthetic payloads shaped like long-lived epics.
+
+    Parameters:
+        - n_issues: The number of payloads to create
+        - seed: The random seed for generating the issues
+
+    Returns:
+        The raw payloads
+    """
+    rnd = random.Random(seed)
+    return [
+        json.dumps(
+            make_payload(rnd, f"BENCH-{i}", n_comments=50, n_changes=300, n_links=40)
+        ).encode()
+        for i in range(n_issues)
+    ]
+
+
+def measure(payloads: list[bytes], repeat: int = 5) -> dict[str, Any]:
+    """
+    Measure decoding and parsing a set of payloads.
+
+    Parameters:
+        - payloads: The raw payloads
+        - repeat: The number of runs to take the best time of
+
+    Returns:
+        The measurements, with times in microseconds per payload
+    """
+    decoded = [json_loads(payload) for payload in payloads]
+
+    def parse() -> None:
+        for data in decoded:
+            Issue(None, data["key"], data)  # type: ignore[arg-type]
+
+    count = max(len(payloads), 1)
+    per_payload = 1e6 / count
+    return {
+        "payloads": len(payloads),
+        "bytes_per_payload": sum(len(p) for p in payloads) // count,
+        "decoder": JSON_DECODER,
+        "decode_stdlib_us": round(
+            _best_time(lambda: [json.loads(p) for p in payloads], repeat) * per_payload,
+            1,
+        ),
+        "decode_fast_us": round(
+            _best_time(lambda: [json_loads(p) for p in payloads], repeat) * per_payload,
+            1,
+        ),
+        "parse_us": round(_best_time(parse, repeat) * per_payload, 1),
+    }
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Measure issue payload parsing")
+    parser.add_argument(
+        "-n", "--issues", type=int, default=200, help="Number of synthetic issues"
+    )
+    parser.add_argument(
+        "--recorded", type=str, help="Directory of recorded payloads to use instead"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    payloads = (
+        load_recorded(args.recorded)
+        if args.recorded
+        else make_synthetic(args.issues, args.seed)
+    )
+    print(json.dumps(measure(payloads, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
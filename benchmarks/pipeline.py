@@ -0,0 +1,484 @@
+#! /usr/bin/env python
+
+"""
+Measure the summarization pipeline end to end.
+
+Each scenario serves a synthetic issue hierarchy from a local Jira server
+(`fakejira`), summarizes with the fake model (`fakellm`) and keeps the
+summaries in a SQLite database, then reports:
+
+- wall_s: The time taken by the scenario, in seconds
+- jira_calls: The number of requests made to the Jira server (and per
+  endpoint in jira_endpoints)
+- db_queries: The number of statements sent to the database
+- llm_calls: The number of summaries generated by the model (and the prompt
+  and generated tokens)
+- peak_rss_mb: The peak memory used by the process, in MiB
+
+Only the work being measured is counted: setting up the server and the
+database is not. Each scenario runs in a fresh process, so that the peak
+memory and the global issue cache aren't shared between them.
+
+The scenarios are:
+
+- project: The bot picking up the recently updated issues of a 10k-issue
+  project, with their parents, and summarizing them
+- initiative: Rolling up the status of a single initiative with 2k
+  descendants
+- burst: Invalidating and refreshing the summaries after a burst of 500
+  updates to a project whose summaries are all current, with one or more
+  refresh workers. A fraction of the updates can be made to fields that
+  aren't summarized (`--noop`)
+
+Run from the top of the repository:
+
+    python -m benchmarks.pipeline --output results.json
+    python -m benchmarks.pipeline --scenario burst --compare results.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any, Callable, Optional
+
+from atlassian import Jira  # type: ignore
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+
+import jiraissues
+import summarizer
+from apiclients import make_session
+from fakejira import FakeIssue, FakeJira, generate_hierarchy
+from jiraissues import CF_EPIC_LINK, CF_PARENT_LINK, hierarchy, issue_cache
+from rollup_status import build_rollup
+from simplestats import Timer
+from summarizer import get_issues_to_summarize, get_or_update_summary
+from summarizer_invalidate import invalidate_updated
+from summarizer_refresh import refresh_stale
+from summary_dbi import Summary, db_stats, sqlite_db
+
+# The project key of the synthetic issues
+PROJECT = "BENCH"
+
+
+@dataclass
+class Settings:  # pylint: disable=too-many-instance-attributes
+    """How fast the simulated servers are."""
+
+    scale: float = 1.0
+    """The size of the scenarios, relative to their nominal size"""
+    jira_latency: float = 0.0
+    """The time the Jira server takes to answer each request, in seconds"""
+    llm_ttft: float = 0.0
+    """The model's time to the first token, in seconds"""
+    llm_tps: float = 0.0
+    """The model's generation rate, in tokens per second (0 for no delay)"""
+    workers: int = 1
+    """The number of refresh workers in the burst scenario"""
+    batch: int = 100
+    """The number of stale summaries each refresh worker claims at a time"""
+    ancestors: bool = False
+    """Whether updates invalidate all the ancestors in the burst scenario"""
+    noop: float = 0.0
+    """The fraction of the burst's updates that only change the labels"""
+
+
+@dataclass
+class Pipeline:
+    """The servers and database that a scenario runs against."""
+
+    server: FakeJira
+    jira: Jira
+    db: Engine
+    settings: Settings
+    db_queries: int = 0
+
+
+@dataclass
+class Scenario:
+    """A benchmark scenario."""
+
+    description: str
+    hierarchy: Callable[[float], dict[str, Any]]
+    """The arguments to `generate_hierarchy` for a given scale"""
+    run: Callable[[Pipeline], None]
+    """The work being measured"""
+    prepare: Optional[Callable[[Pipeline], None]] = None
+    """Work done before the measurement starts"""
+
+
+def _fanout(depth: int, size: float) -> int:
+    """
+    The smallest fanout that gives a single tree of at least the given size.
+
+    Examples:
+    >>> _fanout(4, 2000)
+    13
+    >>> _fanout(4, 1)
+    1
+    """
+    fanout = 1
+    while sum(fanout**level for level in range(depth)) < size:
+        fanout += 1
+    return fanout
+
+
+def _parent_key(issue: FakeIssue) -> Optional[str]:
+    """The key of an issue's parent in the hierarchy."""
+    fields = issue.fields
+    parent = fields.get(CF_PARENT_LINK) or fields.get(CF_EPIC_LINK)
+    return parent or (fields["parent"] or {}).get("key")
+
+
+def _run_project(pipeline: Pipeline) -> None:
+    """Summarize the issues that the bot would pick up in one pass."""
+    since = datetime.now(tz=UTC) - timedelta(days=2)
+    limit = max(1, round(150 * pipeline.settings.scale))
+    keys, _ = get_issues_to_summarize(pipeline.jira, since, limit)
+    for issue in issue_cache.get_issues(pipeline.jira, keys):
+        get_or_update_summary(issue, pipeline.db)
+
+
+def _run_initiative(pipeline: Pipeline) -> None:
+    """Roll up the status of the initiative."""
+    if build_rollup(pipeline.jira, pipeline.db, f"{PROJECT}-1", 14) is None:
+        raise RuntimeError("The initiative could not be rolled up")
+
+
+def _prepare_burst(pipeline: Pipeline) -> None:
+    """Generate a current summary for every issue, then change some of them."""
+    now = datetime.now(tz=UTC)
+    with Session(pipeline.db) as session:
+        session.add_all(
+            Summary(issue_key=issue.key, stale_ts=now, parent_key=_parent_key(issue))
+            for issue in pipeline.server.issues.values()
+        )
+        session.commit()
+    # Summarize with an instant model, so that the stored summaries (and the
+    # fingerprints of their inputs) are the ones the refresh would produce
+    os.environ["FAKE_LLM_TTFT"] = "0"
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = "0"
+    while refresh_stale(pipeline.jira, pipeline.db, 500, "prepare"):
+        pass
+    # Back to the model's speed, and to cold caches
+    _configure(pipeline.settings)
+    updates = 500 * pipeline.settings.scale
+    noop = round(updates * pipeline.settings.noop)
+    total = len(pipeline.server.issues)
+    changed = pipeline.server.simulate_activity(min(1.0, (updates - noop) / total))
+    # The others are only relabelled, which doesn't reach the prompts
+    unchanged = sorted(set(pipeline.server.issues) - set(changed))
+    for key in random.Random(0).sample(unchanged, min(noop, len(unchanged))):
+        labels = pipeline.server.issues[key].fields["labels"]
+        pipeline.server.update_issue(key, {"labels": [*labels, "triaged"]})
+
+
+def _run_burst(pipeline: Pipeline) -> None:
+    """Invalidate the updated issues, then refresh until nothing is stale."""
+    # The JQL times have a granularity of a minute
+    now = datetime.now(tz=UTC)
+    invalidate_updated(
+        pipeline.jira,
+        pipeline.db,
+        now - timedelta(minutes=2),
+        now + timedelta(minutes=1),
+        pipeline.settings.ancestors,
+    )
+
+    def work(owner: str) -> None:
+        while True:
+            if refresh_stale(
+                pipeline.jira,
+                pipeline.db,
+                pipeline.settings.batch,
+                owner,
+                ancestors=pipeline.settings.ancestors,
+            ):
+                continue
+            # The other workers may still make more summaries stale
+            if not db_stats(pipeline.db)["stale"]:
+                return
+            time.sleep(0.05)
+
+    workers = pipeline.settings.workers
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(work, [f"worker-{n}" for n in range(workers)]):
+            pass
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "project": Scenario(
+        "Summarize the recently updated issues of a 10k-issue project",
+        lambda scale: {
+            "roots": max(1, round(12 * scale)),
+            "depth": 4,
+            "fanout": 9,
+        },
+        _run_project,
+    ),
+    "initiative": Scenario(
+        "Roll up an initiative with 2k descendants",
+        lambda scale: {
+            "depth": 4,
+            "fanout": _fanout(4, 2000 * scale),
+            "update_rate": 0.5,
+        },
+        _run_initiative,
+    ),
+    "burst": Scenario(
+        "Refresh the summaries after a burst of 500 updates",
+        lambda scale: {
+            "roots": max(1, round(8 * scale)),
+            "depth": 4,
+            "fanout": 6,
+        },
+        _run_burst,
+        _prepare_burst,
+    ),
+}
+
+
+def _peak_rss_mb() -> float:
+    """The peak memory used by this process, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports the size in KiB, macOS in bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _configure(settings: Settings) -> None:
+    """Point the summarizer at the fake model and reset the global state."""
+    summarizer.LLM_BACKEND = "fake"
+    os.environ["FAKE_LLM_TTFT"] = str(settings.llm_ttft)
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = str(settings.llm_tps)
+    os.environ["ALLOWED_PROJECTS"] = PROJECT
+    # The local server doesn't need protecting
+    jiraissues.jira_limiter.rate = 0
+    issue_cache.clear()
+    hierarchy.clear()
+    Timer.clear()
+
+
+def run_scenario(name: str, settings: Settings) -> dict[str, Any]:
+    """
+    Run a scenario in this process.
+
+    Parameters:
+        - name: The name of the scenario
+        - settings: The size of the scenario and the speed of the servers
+
+    Returns:
+        The measurements
+    """
+    scenario = SCENARIOS[name]
+    _configure(settings)
+    issues = generate_hierarchy(PROJECT, **scenario.hierarchy(settings.scale))
+    with (
+        tempfile.TemporaryDirectory() as tmpdir,
+        FakeJira(issues, latency=settings.jira_latency) as server,
+    ):
+        pipeline = Pipeline(
+            server,
+            Jira(url=server.url, token="benchmark", session=make_session()),
+            sqlite_db(os.path.join(tmpdir, "summaries.db")),
+            settings,
+        )
+
+        def count_query(*_args: Any) -> None:
+            pipeline.db_queries += 1
+
+        event.listen(pipeline.db, "before_cursor_execute", count_query)
+        if scenario.prepare is not None:
+            scenario.prepare(pipeline)
+        pipeline.db_queries = 0
+        Timer.clear()
+        requests_before = server.stats.copy()
+        start = time.perf_counter()
+        scenario.run(pipeline)
+        wall_s = time.perf_counter() - start
+        requests = server.stats - requests_before
+        pipeline.db.dispose()
+    prompts = Timer.stats("FakeLLM.first_token")
+    generation = Timer.stats("FakeLLM.generation")
+    return {
+        "issues": len(issues),
+        "wall_s": round(wall_s, 3),
+        "jira_calls": requests["requests"],
+        "jira_endpoints": {
+            key: count
+            for key, count in sorted(requests.items())
+            if key not in ("requests", "throttled", "errors")
+        },
+        "db_queries": pipeline.db_queries,
+        "llm_calls": generation.count,
+        "llm_prompt_tokens": prompts.units,
+        "llm_output_tokens": generation.units,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_isolated(name: str, settings: Settings) -> dict[str, Any]:
+    """
+    Run a scenario in a fresh process.
+
+    Parameters:
+        - name: The name of the scenario
+        - settings: The size of the scenario and the speed of the servers
+
+    Returns:
+        The measurements
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_scenario, name, settings).result()
+
+
+def _git_commit() -> Optional[str]:
+    """The commit being measured, if we're in a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict[str, Any], results: dict[str, Any]) -> list[str]:
+    """
+    Compare two sets of results.
+
+    Parameters:
+        - baseline: The earlier results
+        - results: The current results
+
+    Returns:
+        The lines of a table of the changes in each measurement
+
+    Examples:
+    >>> old = {"scenarios": {"burst": {"wall_s": 2.0, "db_queries": 10}}}
+    >>> new = {"scenarios": {"burst": {"wall_s": 1.5, "db_queries": 10}}}
+    >>> print("\\n".join(compare(old, new)))
+    burst       wall_s                   2.0        1.5   -25.0%
+    burst       db_queries                10         10     0.0%
+    """
+    lines = []
+    for name, metrics in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        for metric, value in metrics.items():
+            old = before.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+            if change in ("+0.0%", "-0.0%"):
+                change = "0.0%"
+            lines.append(f"{name:<11} {metric:<17} {old:>10} {value:>10} {change:>8}")
+    return lines
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark the summary pipeline")
+    parser.add_argument(
+        "-s",
+        "--scenario",
+        choices=list(SCENARIOS),
+        action="append",
+        help="Scenario to run (default: all of them)",
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Size relative to the nominal size"
+    )
+    parser.add_argument(
+        "--jira-latency",
+        type=float,
+        default=0.0,
+        help="Time for the Jira server to answer each request, in seconds",
+    )
+    parser.add_argument(
+        "--llm-ttft",
+        type=float,
+        default=0.0,
+        help="Model's time to the first token, in seconds",
+    )
+    parser.add_argument(
+        "--llm-tps",
+        type=float,
+        default=0.0,
+        help="Model's tokens per second (0 for no delay)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of refresh workers in the burst scenario",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=100,
+        help="Number of stale summaries each refresh worker claims at a time",
+    )
+    parser.add_argument(
+        "--ancestors",
+        action="store_true",
+        help="Invalidate all the ancestors of updated issues in the burst scenario",
+    )
+    parser.add_argument(
+        "--noop",
+        type=float,
+        default=0.0,
+        help="Fraction of the burst's updates that don't change the summaries",
+    )
+    parser.add_argument("-o", "--output", type=str, help="File to save the results to")
+    parser.add_argument(
+        "--compare", type=str, help="Earlier results to compare against"
+    )
+    args = parser.parse_args()
+    settings = Settings(
+        args.scale,
+        args.jira_latency,
+        args.llm_ttft,
+        args.llm_tps,
+        args.workers,
+        args.batch,
+        args.ancestors,
+        args.noop,
+    )
+    results: dict[str, Any] = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(tz=UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": vars(settings),
+        "scenarios": {},
+    }
+    for name in args.scenario or SCENARIOS:
+        print(f"Running {name}: {SCENARIOS[name].description}", file=sys.stderr)
+        results["scenarios"][name] = run_isolated(name, settings)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        print("\n".join(compare(baseline, results)))
+
+
+if __name__ == "__main__":
+    main()
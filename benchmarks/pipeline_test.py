@@ -0,0 +1,56 @@
+"""Test the pipeline benchmark at a small scale."""
+
+import os
+
+import pytest
+
+import jiraissues
+import summarizer
+from benchmarks.pipeline import SCENARIOS, Settings, compare, run_scenario
+
+
+class TestPipeline:
+    """Test the pipeline scenarios."""
+
+    @pytest.fixture(autouse=True)
+    def restore_globals(self, monkeypatch) -> None:
+        """Undo the configuration done by the benchmark."""
+        monkeypatch.setattr(summarizer, "LLM_BACKEND", summarizer.LLM_BACKEND)
+        monkeypatch.setattr(jiraissues.jira_limiter, "rate", 0)
+        for name in ("FAKE_LLM_TTFT", "FAKE_LLM_TOKENS_PER_SECOND", "ALLOWED_PROJECTS"):
+            monkeypatch.setenv(name, os.environ.get(name, ""))
+
+    @pytest.mark.parametrize("name", list(SCENARIOS))
+    def test_scenario(self, name):
+        """Test that each scenario does some of each kind of work."""
+        results = run_scenario(name, Settings(scale=0.03))
+        assert results["issues"] > 0
+        assert results["jira_calls"] == sum(results["jira_endpoints"].values())
+        assert results["jira_calls"] > 0
+        assert results["db_queries"] > 0
+        assert results["llm_calls"] > 0
+        assert results["llm_output_tokens"] > results["llm_calls"]
+        assert results["peak_rss_mb"] > 0
+
+    def test_scale(self):
+        """Test that the scenarios grow with the scale, and the comparison."""
+        small = run_scenario("burst", Settings(scale=0.05))
+        larger = run_scenario("burst", Settings(scale=0.2))
+        assert larger["issues"] > small["issues"]
+        assert larger["llm_calls"] > small["llm_calls"]
+        lines = compare(
+            {"scenarios": {"burst": small}}, {"scenarios": {"burst": larger}}
+        )
+        assert [line.split()[1] for line in lines][:2] == ["issues", "wall_s"]
+        assert all(line.startswith("burst ") for line in lines)
+
+    def test_workers(self):
+        """Test that several refresh workers share the burst."""
+        results = run_scenario("burst", Settings(scale=0.05, workers=3, batch=5))
+        assert results["llm_calls"] > 0
+
+    def test_noop(self):
+        """Test that updates that don't reach the prompts don't use the model."""
+        results = run_scenario("burst", Settings(scale=0.05, noop=1.0))
+        assert results["jira_calls"] > 0
+        assert results["llm_calls"] == 0
@@ -0,0 +1,172 @@
+#! /usr/bin/env python
+
+"""
+Measure the queries on the summary database, with and without its indexes.
+
+A SQLite database is filled with summary records (a small fraction of them
+stale, all with a parent), then the stale queue poll, the database statistics
+and a lookup of children are timed on the bare table, before and after adding
+the indexes with `upgrade_schema`, as an existing deployment would be
+migrated. The query plan of each query is reported with its best time.
+
+Run from the top of the repository:
+
+    python -m benchmarks.summary_queries --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy import Engine, insert, select, text
+
+from benchmarks.issue_parse import _best_time
+from summary_dbi import Summary, db_stats, get_stale_issues, sqlite_db, upgrade_schema
+
+
+def fill(db: Engine, rows: int, stale_rate: float, seed: int = 0) -> None:
+    """
+    Add synthetic summary records to the database.
+
+    Parameters:
+        - db: Database engine
+        - rows: The number of records to add
+        - stale_rate: The fraction of the records that are stale
+        - seed: The random seed
+    """
+    rnd = random.Random(seed)
+    now = datetime.now(tz=UTC)
+    summary = "This issue is in progress. " * 20
+    chunk = 50000
+    with db.begin() as conn:
+        for start in range(0, rows, chunk):
+            conn.execute(
+                insert(Summary),
+                [
+                    {
+                        "issue_key": f"BENCH-{n}",
+                        "ai_summary": summary,
+                        "summary_ts": now - timedelta(days=rnd.uniform(0, 90)),
+                        "stale_ts": (
+                            now - timedelta(minutes=rnd.uniform(0, 600))
+                            if rnd.random() < stale_rate
+                            else None
+                        ),
+                        # Ten children per parent
+                        "parent_key": f"BENCH-{n // 10}" if n >= 10 else None,
+                    }
+                    for n in range(start, min(rows, start + chunk))
+                ],
+            )
+
+
+def _plan(db: Engine, sql: str) -> str:
+    """The SQLite query plan of a statement, with its steps separated by ";"."""
+    with db.connect() as conn:
+        return "; ".join(
+            row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        )
+
+
+def measure_queries(db: Engine, repeat: int) -> dict[str, Any]:
+    """
+    Time the queries that the summarizer makes on the summary table.
+
+    Parameters:
+        - db: Database engine
+        - repeat: The number of runs of each query
+
+    Returns:
+        The best time (in milliseconds) and the query plan of each query
+    """
+
+    def children() -> list[str]:
+        with db.connect() as conn:
+            return list(
+                conn.scalars(
+                    select(Summary.issue_key).where(Summary.parent_key == "BENCH-4242")
+                )
+            )
+
+    queries: dict[str, tuple[Callable[[], Any], str]] = {
+        "stale_poll": (
+            lambda: get_stale_issues(db, limit=100),
+            "SELECT issue_key FROM ai_summary WHERE stale_ts IS NOT NULL"
+            " ORDER BY stale_ts LIMIT 100",
+        ),
+        "db_stats": (
+            lambda: db_stats(db),
+            "SELECT count(*), count(stale_ts) FROM ai_summary",
+        ),
+        "children": (
+            children,
+            "SELECT issue_key FROM ai_summary WHERE parent_key = 'BENCH-4242'",
+        ),
+    }
+    return {
+        name: {
+            "ms": round(_best_time(func, repeat) * 1000, 3),
+            "plan": _plan(db, sql),
+        }
+        for name, (func, sql) in queries.items()
+    }
+
+
+def measure(rows: int, stale_rate: float, repeat: int) -> dict[str, Any]:
+    """
+    Measure the queries before and after the indexes are added.
+
+    Parameters:
+        - rows: The number of records in the database
+        - stale_rate: The fraction of the records that are stale
+        - repeat: The number of runs of each query
+
+    Returns:
+        The measurements
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = sqlite_db(os.path.join(tmpdir, "summaries.db"))
+        # Start from the table as it was created before it had the indexes
+        for index in Summary.metadata.tables[Summary.__tablename__].indexes:
+            index.drop(db)
+        start = time.perf_counter()
+        fill(db, rows, stale_rate)
+        fill_s = time.perf_counter() - start
+        before = measure_queries(db, repeat)
+        start = time.perf_counter()
+        created = upgrade_schema(db)
+        upgrade_s = time.perf_counter() - start
+        after = measure_queries(db, repeat)
+        db.dispose()
+    return {
+        "rows": rows,
+        "stale": stale_rate,
+        "fill_s": round(fill_s, 1),
+        "upgrade_s": round(upgrade_s, 2),
+        "indexes_created": created,
+        "without_indexes": before,
+        "with_indexes": after,
+    }
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Measure summary database queries")
+    parser.add_argument(
+        "-n", "--rows", type=int, default=1000000, help="Number of summary records"
+    )
+    parser.add_argument(
+        "--stale", type=float, default=0.01, help="Fraction of stale records"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs")
+    args = parser.parse_args()
+    print(json.dumps(measure(args.rows, args.stale, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,14 +4,15 @@
 
 import argparse
 import logging
-import os
 import time
 from datetime import UTC, datetime
 from sys import stdout
 
-from atlassian import Jira  # type: ignore
+import requests
 
-from jiraissues import issue_cache
+from apiclients import jira_client, log_connection_stats
+from jiraissues import InaccessibleIssueError, hierarchy, issue_cache
+from ratelimit import CircuitOpenError
 from simplestats import Timer
 from summarizer import (
     get_issues_to_summarize,
@@ -89,36 +90,49 @@ def main() -> (
     db_host = str(args.db_host)
     db_port = int(args.db_port)
 
-    jira = Jira(url=os.environ["JIRA_URL"], token=os.environ["JIRA_TOKEN"])
+    jira = jira_client()
     db = mariadb_db(host=db_host, port=db_port)
 
     most_recent_modification = since
     while True:
         start_time = datetime.now(UTC)
         logging.info("Starting iteration at %s", start_time.isoformat())
-        issue_keys: list[str] = []
-        (issue_keys, most_recent_modification) = get_issues_to_summarize(
-            jira, since, limit
-        )
+        try:
+            issue_keys: list[str] = []
+            (issue_keys, most_recent_modification) = get_issues_to_summarize(
+                jira, since, limit
+            )
 
-        if len(issue_keys) < limit - 5:
-            # We retrieved all the modified issues, so we can advance farther
-            # and avoid re-fetching old issues
-            most_recent_modification = start_time
-        logging.info("Got updates through %s", most_recent_modification.isoformat())
+            if len(issue_keys) < limit - 5:
+                # We retrieved all the modified issues, so we can advance farther
+                # and avoid re-fetching old issues
+                most_recent_modification = start_time
+            logging.info("Got updates through %s", most_recent_modification.isoformat())
+            # The issues were selected using only their headers; fetch the rest of
+            # their fields in bulk rather than one at a time
+            issue_cache.get_issues(jira, issue_keys)
 
-        for issue_key in issue_keys:
-            issue_start_time = datetime.now(UTC)
-            issue = issue_cache.get_issue(jira, issue_key)
-            summary = get_or_update_summary(issue, db)
-            if is_ok_to_post_summary(issue) and send_updates:
-                # NEED TO POST THE SUMMARY TO THE JIRA ISSUE...
-                # CODE WAS REMOVED FROM summarize_issue DURING THE REFACTOR
-                pass
-            elapsed = datetime.now(UTC) - issue_start_time
-            print(f"Summarized {issue_key} ({elapsed}s):\n{summary}\n")
-        since = most_recent_modification
+            for issue_key in issue_keys:
+                issue_start_time = datetime.now(UTC)
+                try:
+                    issue = issue_cache.get_issue(jira, issue_key)
+                except InaccessibleIssueError as ex:
+                    logging.warning("Skipping %s", ex)
+                    continue
+                summary = get_or_update_summary(issue, db)
+                if is_ok_to_post_summary(issue) and send_updates:
+                    # NEED TO POST THE SUMMARY TO THE JIRA ISSUE...
+                    # CODE WAS REMOVED FROM summarize_issue DURING THE REFACTOR
+                    pass
+                elapsed = datetime.now(UTC) - issue_start_time
+                print(f"Summarized {issue_key} ({elapsed}s):\n{summary}\n")
+            since = most_recent_modification
+        except (requests.exceptions.RequestException, CircuitOpenError):
+            # Jira is unavailable; try the same updates again next time
+            logging.exception("Failed to summarize the issues updated since %s", since)
         logging.info("Cache stats: %s", issue_cache)
+        log_connection_stats("Jira", jira)
+        hierarchy.save()
         Timer.dump(stdout)
         now = datetime.now(UTC)
         elapsed = now - start_time
@@ -0,0 +1,181 @@
+"""
+Eviction policies for in-memory caches.
+
+A policy tracks how the keys of a cache are used and decides which key should
+be evicted next. The bookkeeping for inserts, hits and evictions is O(1). The
+policies are not thread-safe; the owning cache is expected to serialize access
+to them.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+
+class EvictionPolicy(ABC):
+    """Base class for cache eviction policies."""
+
+    @abstractmethod
+    def inserted(self, key: str) -> None:
+        """
+        Record that a key has been added to the cache.
+
+        Parameters:
+            - key: The key that was added
+        """
+
+    @abstractmethod
+    def accessed(self, key: str) -> None:
+        """
+        Record a cache hit on a key.
+
+        Parameters:
+            - key: The key that was accessed
+        """
+
+    @abstractmethod
+    def removed(self, key: str) -> None:
+        """
+        Record that a key has been removed from the cache.
+
+        Parameters:
+            - key: The key that was removed
+        """
+
+    @abstractmethod
+    def victim(self) -> Optional[str]:
+        """
+        Get the key that should be evicted next.
+
+        Returns:
+            The key to evict, or None if no keys are being tracked
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Stop tracking all keys."""
+
+
+class LRUPolicy(EvictionPolicy):
+    """
+    Evict the least recently used key.
+
+    Examples:
+    >>> lru = LRUPolicy()
+    >>> for key in ["A-1", "A-2", "A-3"]:
+    ...     lru.inserted(key)
+    >>> lru.accessed("A-1")
+    >>> lru.victim()
+    'A-2'
+    """
+
+    def __init__(self) -> None:
+        # Ordered from least to most recently used
+        self._order: OrderedDict[str, None] = OrderedDict()
+
+    def inserted(self, key: str) -> None:
+        self._order[key] = None
+        self._order.move_to_end(key)
+
+    def accessed(self, key: str) -> None:
+        if key in self._order:
+            self._order.move_to_end(key)
+
+    def removed(self, key: str) -> None:
+        self._order.pop(key, None)
+
+    def victim(self) -> Optional[str]:
+        return next(iter(self._order), None)
+
+    def clear(self) -> None:
+        self._order.clear()
+
+
+class LFUPolicy(EvictionPolicy):
+    """
+    Evict the least frequently used key, breaking ties by evicting the least
+    recently used of them.
+
+    Examples:
+    >>> lfu = LFUPolicy()
+    >>> for key in ["A-1", "A-2", "A-3"]:
+    ...     lfu.inserted(key)
+    >>> lfu.accessed("A-1")
+    >>> lfu.accessed("A-2")
+    >>> lfu.victim()
+    'A-3'
+    """
+
+    def __init__(self) -> None:
+        self._freq: dict[str, int] = {}
+        # For each use count, the keys with that count in LRU order
+        self._buckets: dict[int, OrderedDict[str, None]] = {}
+        self._min_freq = 0
+
+    def _unlink(self, key: str) -> int:
+        """Remove a key from its frequency bucket, returning its count."""
+        freq = self._freq.pop(key)
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+        return freq
+
+    def _link(self, key: str, freq: int) -> None:
+        """Add a key to the bucket for the given count."""
+        self._freq[key] = freq
+        self._buckets.setdefault(freq, OrderedDict())[key] = None
+
+    def inserted(self, key: str) -> None:
+        if key in self._freq:
+            self._unlink(key)
+        self._link(key, 1)
+        self._min_freq = 1
+
+    def accessed(self, key: str) -> None:
+        if key in self._freq:
+            freq = self._unlink(key)
+            self._link(key, freq + 1)
+            if freq == self._min_freq and freq not in self._buckets:
+                self._min_freq = freq + 1
+
+    def removed(self, key: str) -> None:
+        if key in self._freq:
+            self._unlink(key)
+
+    def victim(self) -> Optional[str]:
+        if not self._freq:
+            return None
+        if self._min_freq not in self._buckets:
+            # Only happens after an explicit removal emptied the lowest bucket
+            self._min_freq = min(self._buckets)
+        return next(iter(self._buckets[self._min_freq]))
+
+    def clear(self) -> None:
+        self._freq.clear()
+        self._buckets.clear()
+        self._min_freq = 0
+
+
+def make_policy(name: str) -> EvictionPolicy:
+    """
+    Create an eviction policy by name.
+
+    Parameters:
+        - name: The name of the policy ("lru" or "lfu")
+
+    Returns:
+        The eviction policy
+
+    Examples:
+    >>> type(make_policy("LFU")).__name__
+    'LFUPolicy'
+    """
+    policies: dict[str, type[EvictionPolicy]] = {
+        "lru": LRUPolicy,
+        "lfu": LFUPolicy,
+    }
+    try:
+        return policies[name.lower()]()
+    except KeyError as ex:
+        raise ValueError(f"Unknown eviction policy: {name}") from ex
@@ -0,0 +1,100 @@
+"""Test the cache eviction policies."""
+
+import pytest
+
+from cachepolicy import EvictionPolicy, LFUPolicy, LRUPolicy, make_policy
+
+
+class TestPolicies:
+    """Test the eviction policies."""
+
+    @pytest.fixture(params=["lru", "lfu"])
+    def policy(self, request) -> EvictionPolicy:
+        """Create each of the policies."""
+        return make_policy(request.param)
+
+    def test_empty(self, policy):
+        """Test that an empty policy has nothing to evict."""
+        assert policy.victim() is None
+
+    def test_removed_keys_are_not_victims(self, policy):
+        """Test that removed keys are no longer tracked."""
+        policy.inserted("A-1")
+        policy.inserted("A-2")
+        policy.removed("A-1")
+        assert policy.victim() == "A-2"
+        policy.removed("A-2")
+        assert policy.victim() is None
+
+    def test_clear(self, policy):
+        """Test that clearing the policy forgets all keys."""
+        policy.inserted("A-1")
+        policy.clear()
+        assert policy.victim() is None
+
+    def test_unknown_policy(self):
+        """Test that an unknown policy name is rejected."""
+        with pytest.raises(ValueError):
+            make_policy("random")
+
+
+class TestLRU:
+    """Test the least-recently-used policy."""
+
+    def test_eviction_order(self):
+        """Test that keys are evicted in order of last use."""
+        lru = LRUPolicy()
+        for key in ["A-1", "A-2", "A-3"]:
+            lru.inserted(key)
+        lru.accessed("A-1")
+        lru.accessed("A-2")
+        order = []
+        while (victim := lru.victim()) is not None:
+            order.append(victim)
+            lru.removed(victim)
+        assert order == ["A-3", "A-1", "A-2"]
+
+    def test_reinsert_is_a_use(self):
+        """Test that re-inserting a key marks it as recently used."""
+        lru = LRUPolicy()
+        lru.inserted("A-1")
+        lru.inserted("A-2")
+        lru.inserted("A-1")
+        assert lru.victim() == "A-2"
+
+
+class TestLFU:
+    """Test the least-frequently-used policy."""
+
+    def test_eviction_order(self):
+        """Test that keys are evicted by use count, then by last use."""
+        lfu = LFUPolicy()
+        for key in ["A-1", "A-2", "A-3", "A-4"]:
+            lfu.inserted(key)
+        for key in ["A-1", "A-1", "A-2", "A-3"]:
+            lfu.accessed(key)
+        order = []
+        while (victim := lfu.victim()) is not None:
+            order.append(victim)
+            lfu.removed(victim)
+        assert order == ["A-4", "A-2", "A-3", "A-1"]
+
+    def test_reinsert_resets_count(self):
+        """Test that a re-inserted key starts over with a count of one."""
+        lfu = LFUPolicy()
+        lfu.inserted("A-1")
+        lfu.inserted("A-2")
+        lfu.accessed("A-1")
+        lfu.accessed("A-2")
+        lfu.inserted("A-1")
+        assert lfu.victim() == "A-1"
+
+    def test_min_after_removal(self):
+        """Test that removing the least used key exposes the next one."""
+        lfu = LFUPolicy()
+        lfu.inserted("A-1")
+        lfu.inserted("A-2")
+        for _ in range(5):
+            lfu.accessed("A-2")
+        lfu.removed("A-1")
+        assert lfu.victim() == "A-2"
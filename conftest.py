@@ -0,0 +1,30 @@
+"""Fixtures shared by the tests."""
+
+from typing import Iterator
+
+import pytest
+from atlassian import Jira  # type: ignore
+
+from apiclients import make_session
+from fakejira import FakeJira, generate_hierarchy
+
+
+@pytest.fixture(name="fake_jira")
+def fixture_fake_jira(request: pytest.FixtureRequest) -> Iterator[FakeJira]:
+    """
+    Serve a hierarchy of Feature -> 2 Epics -> 2 Stories each.
+
+    The options of the server (latency, throttling, ...) can be set by
+    parametrizing the fixture indirectly, e.g.:
+
+        @pytest.mark.parametrize("fake_jira", [{"latency": 0.2}], indirect=True)
+    """
+    issues = generate_hierarchy("TEST", depth=3, fanout=2, comments=4, seed=1)
+    with FakeJira(issues, **getattr(request, "param", {})) as server:
+        yield server
+
+
+@pytest.fixture(name="jira")
+def fixture_jira(fake_jira: FakeJira) -> Jira:
+    """Create a client for the fake Jira server."""
+    return Jira(url=fake_jira.url, token="any", session=make_session())
@@ -4,7 +4,6 @@
 
 import argparse
 import logging
-import os
 import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
@@ -12,7 +11,8 @@ from datetime import datetime, timedelta
 from atlassian import Jira  # type: ignore
 from sqlalchemy import Engine
 
-from jiraissues import Issue, check_response, get_self, issue_cache, with_retry
+from apiclients import jira_client
+from jiraissues import Issue, get_self, issue_cache, search_issues
 from summarizer import count_tokens, summarize_issue
 from summary_dbi import mariadb_db
 
@@ -79,23 +79,19 @@ def get_modified_issues(client: Jira, since: datetime) -> list[Issue]:
     user_zi = get_self(client).tzinfo
     since_string = since.astimezone(user_zi).strftime("%Y-%m-%d %H:%M")
 
-    issues = check_response(
-        with_retry(
-            lambda: client.jql(
-                f"updated >= '{since_string}' ORDER BY updated DESC",
-                limit=1000,
-                fields="key",
-            )
+    keys = [
+        issue["key"]
+        for issue in search_issues(
+            client,
+            f"updated >= '{since_string}' ORDER BY updated DESC",
+            ["key"],
+            prefetch=True,
         )
-    )
-    for issue in issues["issues"]:
-        issue_cache.remove(issue["key"])
+    ]
+    for key in keys:
+        issue_cache.remove(key)
 
-    issue_list: list[Issue] = []
-    for idict in issues["issues"]:
-        issue = issue_cache.get_issue(client, idict["key"])
-        issue_list.append(issue)
-    return issue_list
+    return issue_cache.get_issues(client, keys)
 
 
 def main() -> None:
@@ -150,7 +146,7 @@ def main() -> None:
     db_host = str(args.db_host)
     db_port = int(args.db_port)
 
-    jira = Jira(url=os.environ["JIRA_URL"], token=os.environ["JIRA_TOKEN"])
+    jira = jira_client()
     db = mariadb_db(host=db_host, port=db_port)
 
     print(IssueEstimate.csv_header(), file=outfile)
@@ -0,0 +1,1282 @@
+#! /usr/bin/env python
+
+"""
+A local stand-in for the Jira REST API, for offline testing and benchmarks.
+
+The server holds a synthetic set of issues, generated as a realistic
+hierarchy (Outcome > Feature > Epic > Story > Sub-task, linked the same way as
+on the real instance), and implements the parts of the API that we use:
+
+- `GET /rest/api/2/issue/{key}`: With field selection (`fields`) and
+  `expand=changelog`
+- `PUT /rest/api/2/issue/{key}`: Field updates, which are recorded in the
+  changelog
+- `GET /rest/api/2/issue/{key}/changelog`: The (Cloud style) paged changelog
+- `GET /rest/api/2/issue/{key}/comment`: Paged comments, in either order
+- `GET /rest/api/2/search`: JQL searches on key, `Epic Link`, `Parent Link`,
+  parent, labels, project, type, status and the created/updated dates, with
+  `and`/`or`/`not`, `ORDER BY` and paging
+- `GET /rest/agile/1.0/epic/{key}/issue`: The issues in an epic
+- `GET /rest/api/2/myself`: The bot's user
+
+Latency, rate limiting (429 with Retry-After) and server errors (5xx) can be
+injected to exercise the retry and circuit breaker logic, and the server
+counts the requests it handles so that tests and benchmarks can check how many
+calls an operation takes.
+
+Run from the top of the repository:
+
+    python fakejira.py --port 8080 --depth 4 --fanout 5
+
+and point the scripts at it with `JIRA_URL=http://localhost:8080` (any
+`JIRA_TOKEN` is accepted).
+"""
+
+# pylint: disable=too-many-lines
+
+import argparse
+import json
+import logging
+import operator
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from jiraissues import (
+    CF_BLOCKED,
+    CF_BLOCKED_REASON,
+    CF_CONTRIBUTORS,
+    CF_EPIC_LINK,
+    CF_FEATURE_LINK,
+    CF_PARENT_LINK,
+    CF_STATUS_SUMMARY,
+)
+
+_logger = logging.getLogger(__name__)
+
+# The issue types of each level of the generated hierarchy, from the top
+HIERARCHY_TYPES = ["Outcome", "Feature", "Epic", "Story", "Sub-task"]
+
+# The user that makes the changes sent to the server
+BOT_USER = {
+    "key": "summarizer-bot",
+    "name": "summarizer-bot",
+    "displayName": "Summarizer Bot",
+    "timeZone": "UTC",
+}
+
+# The user that makes the changes of simulated activity
+_OTHER_USER = {
+    "key": "someone",
+    "name": "someone",
+    "displayName": "Some One",
+    "timeZone": "UTC",
+}
+
+_STATUSES = {
+    "New": "To Do",
+    "Refinement": "To Do",
+    "In Progress": "In Progress",
+    "Review": "In Progress",
+    "Closed": "Done",
+}
+_TIMEZONES = ["UTC", "America/New_York", "Europe/Prague", "Asia/Kolkata"]
+_CHANGED_FIELDS = ["status", "assignee", "labels", "description", "Sprint"]
+
+# Defaults and limits for paged responses
+_DEFAULT_PAGE_SIZE = 50
+_MAX_PAGE_SIZE = 1000
+
+# How each issue type is linked to its parent
+_PARENT_FIELD = {
+    "Feature": CF_PARENT_LINK,
+    "Epic": CF_PARENT_LINK,
+    "Story": CF_EPIC_LINK,
+    "Sub-task": "parent",
+}
+
+# The fields whose values are issue keys
+_KEY_FIELDS = {"key", "issuekey", "parent", CF_EPIC_LINK, CF_PARENT_LINK}
+
+# The custom fields that have names in JQL
+_JQL_FIELDS = {
+    "epic link": CF_EPIC_LINK,
+    "parent link": CF_PARENT_LINK,
+    f"cf[{CF_EPIC_LINK.rsplit('_', 1)[1]}]": CF_EPIC_LINK,
+    f"cf[{CF_PARENT_LINK.rsplit('_', 1)[1]}]": CF_PARENT_LINK,
+}
+
+
+def random_user(rnd: random.Random, n_users: int) -> dict[str, Any]:
+    """
+    Create the payload of a user, drawn from a pool of synthetic users.
+
+    Parameters:
+        - rnd: The random number generator to use
+        - n_users: The number of distinct users to draw from
+
+    Returns:
+        The user payload
+    """
+    uid = rnd.randrange(n_users)
+    return {
+        "key": f"user{uid}",
+        "name": f"user{uid}",
+        "displayName": f"User Number{uid}",
+        "timeZone": _TIMEZONES[uid % len(_TIMEZONES)],
+    }
+
+
+def random_words(rnd: random.Random, count: int) -> str:
+    """
+    Create some filler text, drawn from a vocabulary of synthetic words.
+
+    Parameters:
+        - rnd: The random number generator to use
+        - count: The number of words
+
+    Returns:
+        The text
+    """
+    return " ".join(f"word{rnd.randrange(5000)}" for _ in range(count))
+
+
+def _stamp(when: datetime) -> str:
+    """
+    Format a time the way Jira does.
+
+    Examples:
+    >>> _stamp(datetime(2024, 6, 1, 12, 30, tzinfo=UTC))
+    '2024-06-01T12:30:00.000+0000'
+    """
+    when = when.astimezone(UTC)
+    return when.strftime("%Y-%m-%dT%H:%M:%S.") + f"{when.microsecond // 1000:03d}+0000"
+
+
+@dataclass
+class FakeIssue:
+    """An issue held by the fake server."""
+
+    key: str
+    """The key of the issue"""
+    fields: dict[str, Any]
+    """The issue's fields, except for the comments and issue links"""
+    comments: list[dict[str, Any]] = field(default_factory=list)
+    """The comments on the issue, oldest first"""
+    histories: list[dict[str, Any]] = field(default_factory=list)
+    """The changelog of the issue, oldest first"""
+    links: list[tuple[str, str]] = field(default_factory=list)
+    """The "Blocks" links to other issues, as (direction, key)"""
+
+    @property
+    def number(self) -> int:
+        """The number of the issue within its project."""
+        return int(self.key.rsplit("-", 1)[1])
+
+
+class _HierarchyBuilder:  # pylint: disable=too-few-public-methods
+    """Generates the issues of a synthetic hierarchy."""
+
+    def __init__(self, rnd: random.Random, now: datetime, n_users: int) -> None:
+        self.rnd = rnd
+        self.now = now
+        self.n_users = n_users
+        self.next_id = 10000
+
+    def _id(self) -> str:
+        self.next_id += 1
+        return str(self.next_id)
+
+    def _user(self) -> dict[str, Any]:
+        return random_user(self.rnd, self.n_users)
+
+    def _words(self, count: int) -> str:
+        return random_words(self.rnd, count)
+
+    def _times(self, count: int, start: datetime, end: datetime) -> list[datetime]:
+        """Random times between start and end, in order."""
+        span = (end - start).total_seconds()
+        return sorted(
+            start + timedelta(seconds=self.rnd.uniform(0, span)) for _ in range(count)
+        )
+
+    def issue(  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+        self,
+        key: str,
+        issue_type: str,
+        parent: Optional[FakeIssue],
+        n_comments: int,
+        n_changes: int,
+        recent: bool,
+        labelled: bool,
+    ) -> FakeIssue:
+        """Create an issue, with its comments and changelog."""
+        rnd = self.rnd
+        age = rnd.uniform(0, 1) if recent else rnd.uniform(1, 90)
+        updated = self.now - timedelta(days=age)
+        created = updated - timedelta(days=rnd.uniform(1, 365))
+        status = rnd.choice(list(_STATUSES))
+        fields: dict[str, Any] = {
+            "summary": f"{issue_type} {self._words(6)}",
+            "description": self._words(rnd.randint(20, 200)),
+            "issuetype": {"name": issue_type, "subtask": issue_type == "Sub-task"},
+            "project": {"key": key.rsplit("-", 1)[0]},
+            "status": {"name": status, "statusCategory": {"name": _STATUSES[status]}},
+            "labels": ["AISummary"] if labelled else [],
+            "resolution": {"name": "Done"} if status == "Closed" else None,
+            "created": _stamp(created),
+            "updated": _stamp(updated),
+            "assignee": self._user() if rnd.random() < 0.8 else None,
+            "parent": None,
+            "subtasks": [],
+            CF_STATUS_SUMMARY: self._words(30) if rnd.random() < 0.3 else None,
+            CF_BLOCKED: {"value": "True" if rnd.random() < 0.1 else "False"},
+            CF_BLOCKED_REASON: None,
+            CF_CONTRIBUTORS: [self._user() for _ in range(rnd.randint(0, 4))],
+            CF_EPIC_LINK: None,
+            CF_PARENT_LINK: None,
+            CF_FEATURE_LINK: None,
+        }
+        if parent is not None:
+            link_field = _PARENT_FIELD[issue_type]
+            if link_field == "parent":
+                fields["parent"] = _issue_ref(parent)
+                parent.fields["subtasks"].append(
+                    {
+                        "key": key,
+                        "fields": {
+                            "summary": fields["summary"],
+                            "issuetype": fields["issuetype"],
+                            "status": fields["status"],
+                        },
+                    }
+                )
+            else:
+                fields[link_field] = parent.key
+        comments = [
+            {
+                "id": self._id(),
+                "author": self._user(),
+                "created": _stamp(when),
+                "updated": _stamp(when),
+                "body": self._words(rnd.randint(5, 80)),
+            }
+            for when in self._times(n_comments, created, updated)
+        ]
+        histories = [
+            {
+                "id": self._id(),
+                "author": self._user(),
+                "created": _stamp(when),
+                "items": [
+                    {
+                        "field": rnd.choice(_CHANGED_FIELDS),
+                        "fieldtype": "jira",
+                        "fromString": rnd.choice(list(_STATUSES)),
+                        "toString": rnd.choice(list(_STATUSES)),
+                    }
+                    for _ in range(rnd.randint(1, 2))
+                ],
+            }
+            for when in self._times(n_changes, created, updated)
+        ]
+        return FakeIssue(key, fields, comments, histories)
+
+
+def _issue_ref(issue: FakeIssue) -> dict[str, Any]:
+    """The abbreviated form of an issue used when linking to it."""
+    return {
+        "key": issue.key,
+        "fields": {
+            "summary": issue.fields["summary"],
+            "issuetype": issue.fields["issuetype"],
+            "status": issue.fields["status"],
+        },
+    }
+
+
+def generate_hierarchy(  # pylint: disable=too-many-arguments,too-many-locals
+    project: str = "FAKE",
+    *,
+    roots: int = 1,
+    depth: int = 4,
+    fanout: int = 4,
+    comments: int = 5,
+    changes: int = 10,
+    links: float = 0.5,
+    update_rate: float = 0.1,
+    label_rate: float = 0.5,
+    users: int = 50,
+    seed: int = 0,
+    now: Optional[datetime] = None,
+) -> list[FakeIssue]:
+    """
+    Generate a synthetic issue hierarchy.
+
+    The hierarchy has `depth` levels, ending at Stories (or at Sub-tasks for a
+    depth of 5), e.g. a depth of 3 gives Features with Epics with Stories.
+    Issues are numbered breadth-first, so the roots come first.
+
+    Parameters:
+        - project: The project key for the issues
+        - roots: The number of issues at the top level
+        - depth: The number of levels (1-5)
+        - fanout: The number of children of each issue
+        - comments: The average number of comments on each issue
+        - changes: The average number of changelog entries of each issue
+        - links: The average number of "Blocks" links from each issue
+        - update_rate: The fraction of issues updated within the last day (the
+          others were last updated 1-90 days ago)
+        - label_rate: The fraction of issues with the AISummary label
+        - users: The number of distinct users to draw from
+        - seed: The random seed, so that the same hierarchy is generated each
+          time
+        - now: The current time (default: now)
+
+    Returns:
+        The issues
+
+    Examples:
+    >>> issues = generate_hierarchy(depth=3, fanout=2)
+    >>> [i.fields["issuetype"]["name"] for i in issues[:3]]
+    ['Feature', 'Epic', 'Epic']
+    >>> len(issues), issues[1].fields[CF_PARENT_LINK], issues[3].fields[CF_EPIC_LINK]
+    (7, 'FAKE-1', 'FAKE-2')
+    """
+    if not 1 <= depth <= len(HIERARCHY_TYPES):
+        raise ValueError(f"Depth must be between 1 and {len(HIERARCHY_TYPES)}")
+    levels = HIERARCHY_TYPES[max(0, 4 - depth) : max(4, depth)]
+    rnd = random.Random(seed)
+    builder = _HierarchyBuilder(rnd, now or datetime.now(tz=UTC), users)
+    issues: list[FakeIssue] = []
+
+    def make(issue_type: str, parent: Optional[FakeIssue]) -> FakeIssue:
+        issue = builder.issue(
+            f"{project}-{len(issues) + 1}",
+            issue_type,
+            parent,
+            n_comments=rnd.randint(0, 2 * comments),
+            n_changes=rnd.randint(0, 2 * changes),
+            recent=rnd.random() < update_rate,
+            labelled=rnd.random() < label_rate,
+        )
+        issues.append(issue)
+        return issue
+
+    level = [make(levels[0], None) for _ in range(roots)]
+    for issue_type in levels[1:]:
+        level = [make(issue_type, parent) for parent in level for _ in range(fanout)]
+
+    for issue in issues:
+        for _ in range(rnd.randint(0, round(2 * links))):
+            other = rnd.choice(issues)
+            if other is not issue:
+                issue.links.append(("outward", other.key))
+                other.links.append(("inward", issue.key))
+    return issues
+
+
+class JqlError(ValueError):
+    """Raised for a JQL query that the fake server doesn't understand."""
+
+
+_TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+        |(?P<op>!=|>=|<=|=|>|<|~|\(|\)|,)
+        |(?P<word>[^\s=!<>~(),'"]+)
+    )""",
+    re.VERBOSE,
+)
+
+_RELATIVE_DATE_RE = re.compile(r"^([-+]?\d+)([wdhm])$")
+_RELATIVE_UNITS = {"w": "weeks", "d": "days", "h": "hours", "m": "minutes"}
+_DATE_FORMATS = ["%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M", "%Y-%m-%d", "%Y/%m/%d"]
+_DATE_FIELDS = {"created", "updated"}
+_COMPARISONS: dict[str, Callable[[Any, Any], bool]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+# A JQL value: the token's text, and whether it was quoted
+_Value = tuple[str, bool]
+_Predicate = Callable[[FakeIssue], bool]
+
+
+def _everything(_issue: FakeIssue) -> bool:
+    """Matches every issue (for a query without conditions)."""
+    return True
+
+
+def _tokenize(jql: str) -> list[tuple[str, str]]:
+    """
+    Split a JQL query into (kind, text) tokens.
+
+    Examples:
+    >>> _tokenize("'Epic Link' in (A-1, 'A-2')")
+    [('string', 'Epic Link'), ('word', 'in'), ('op', '('), ('word', 'A-1'), \
+('op', ','), ('string', 'A-2'), ('op', ')')]
+    """
+    tokens: list[tuple[str, str]] = []
+    pos = 0
+    jql = jql.rstrip()
+    while pos < len(jql):
+        match = _TOKEN_RE.match(jql, pos)
+        if match is None or match.end() == pos:
+            raise JqlError(f"Unable to parse the JQL query at: {jql[pos:]}")
+        kind = str(match.lastgroup)
+        text = match.group(kind)
+        if kind == "string":
+            text = re.sub(r"\\(.)", r"\1", text[1:-1])
+        tokens.append((kind, text))
+        pos = match.end()
+    return tokens
+
+
+def _parse_date(text: str, now: datetime) -> datetime:
+    """
+    Parse a date in a JQL query, either absolute or relative to now.
+
+    Examples:
+    >>> now = datetime(2024, 6, 1, tzinfo=UTC)
+    >>> _parse_date("2024-05-31 10:15", now).isoformat()
+    '2024-05-31T10:15:00+00:00'
+    >>> _parse_date("-2d", now).isoformat()
+    '2024-05-30T00:00:00+00:00'
+    """
+    if match := _RELATIVE_DATE_RE.match(text):
+        amount, unit = match.groups()
+        return now + timedelta(**{_RELATIVE_UNITS[unit]: int(amount)})
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=UTC)
+        except ValueError:
+            pass
+    raise JqlError(f"Invalid date: {text}")
+
+
+def _field_values(issue: FakeIssue, name: str) -> list[str]:
+    """The values of a (JQL) field of an issue, as strings."""
+    fields = issue.fields
+    name = _JQL_FIELDS.get(name, name)
+    value: Any
+    if name in ("key", "issuekey", "id"):
+        value = issue.key
+    elif name in ("issuetype", "type", "status", "resolution"):
+        value = (fields.get("issuetype" if name == "type" else name) or {}).get("name")
+    elif name in ("parent", "project"):
+        value = (fields.get(name) or {}).get("key")
+    elif name == "assignee":
+        value = (fields.get(name) or {}).get("name")
+    elif name in fields:
+        value = fields[name]
+    else:
+        raise JqlError(f"Field '{name}' is not supported")
+    if value is None:
+        return []
+    return [str(v) for v in value] if isinstance(value, list) else [str(value)]
+
+
+class _JqlParser:  # pylint: disable=too-few-public-methods
+    """
+    A recursive descent parser for the subset of JQL that we use.
+
+    Parsing produces a predicate on issues and a list of sort keys.
+    """
+
+    def __init__(self, jql: str, now: datetime) -> None:
+        self.tokens = _tokenize(jql)
+        self.pos = 0
+        self.now = now
+
+    def _peek(self) -> Optional[tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise JqlError("Unexpected end of the JQL query")
+        self.pos += 1
+        return token
+
+    def _accept(self, *words: str) -> bool:
+        """Consume the next token if it is one of the given (key)words."""
+        token = self._peek()
+        if token is not None and token[0] != "string" and token[1].lower() in words:
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, word: str) -> None:
+        if not self._accept(word):
+            raise JqlError(f"Expected '{word}' in the JQL query")
+
+    def parse(self) -> tuple[_Predicate, list[tuple[str, bool]]]:
+        """
+        Parse the query.
+
+        Returns:
+            The predicate, and the (field, descending) pairs to sort by
+        """
+        token = self._peek()
+        if token is None or token[1].lower() == "order":
+            predicate: _Predicate = _everything
+        else:
+            predicate = self._or()
+        order: list[tuple[str, bool]] = []
+        if self._accept("order"):
+            self._expect("by")
+            while True:
+                name = self._next()[1].lower()
+                descending = self._accept("desc")
+                if not descending:
+                    self._accept("asc")
+                order.append((_JQL_FIELDS.get(name, name), descending))
+                if not self._accept(","):
+                    break
+        if (token := self._peek()) is not None:
+            raise JqlError(f"Unexpected '{token[1]}' in the JQL query")
+        return predicate, order
+
+    def _or(self) -> _Predicate:
+        terms = [self._and()]
+        while self._accept("or"):
+            terms.append(self._and())
+        return terms[0] if len(terms) == 1 else lambda i: any(t(i) for t in terms)
+
+    def _and(self) -> _Predicate:
+        terms = [self._not()]
+        while self._accept("and"):
+            terms.append(self._not())
+        return terms[0] if len(terms) == 1 else lambda i: all(t(i) for t in terms)
+
+    def _not(self) -> _Predicate:
+        if self._accept("not"):
+            term = self._not()
+            return lambda i: not term(i)
+        if self._accept("("):
+            term = self._or()
+            self._expect(")")
+            return term
+        return self._clause()
+
+    def _values(self) -> list[_Value]:
+        self._expect("(")
+        values: list[_Value] = []
+        while True:
+            kind, text = self._next()
+            values.append((text, kind == "string"))
+            if not self._accept(","):
+                break
+        self._expect(")")
+        return values
+
+    def _clause(self) -> _Predicate:
+        name = self._next()[1].lower()
+        if self._accept("in"):
+            return self._match(name, self._values(), False)
+        if self._accept("not"):
+            self._expect("in")
+            return self._match(name, self._values(), True)
+        if self._accept("is"):
+            negate = self._accept("not")
+            if not self._accept("empty", "null"):
+                raise JqlError("Expected EMPTY after IS")
+            return lambda i: bool(_field_values(i, name)) == negate
+        kind, op = self._next()
+        if kind != "op" or op not in _COMPARISONS:
+            raise JqlError(f"Unsupported operator '{op}' in the JQL query")
+        value_kind, value = self._next()
+        if name in _DATE_FIELDS:
+            return self._compare_dates(name, op, _parse_date(value, self.now))
+        if op in ("=", "!="):
+            return self._match(name, [(value, value_kind == "string")], op == "!=")
+        raise JqlError(f"Operator '{op}' is only supported for dates")
+
+    @staticmethod
+    def _match(name: str, values: list[_Value], negate: bool) -> _Predicate:
+        """Match a field against a list of values."""
+        if _JQL_FIELDS.get(name, name) in _KEY_FIELDS:
+            # Issue keys are not case sensitive
+            wanted = {text.upper() for text, _ in values}
+            return lambda i: negate != any(
+                v.upper() in wanted for v in _field_values(i, name)
+            )
+        exact = {text for text, _ in values}
+        return lambda i: negate != any(v in exact for v in _field_values(i, name))
+
+    @staticmethod
+    def _compare_dates(name: str, op: str, when: datetime) -> _Predicate:
+        compare = _COMPARISONS[op]
+        return lambda i: compare(datetime.fromisoformat(i.fields[name]), when)
+
+
+def _sort_key(name: str) -> Callable[[FakeIssue], Any]:
+    """The sort key for ordering search results by a field."""
+    if name in ("key", "issuekey"):
+        return lambda i: (i.fields["project"]["key"], i.number)
+    if name in _DATE_FIELDS:
+        return lambda i: datetime.fromisoformat(i.fields[name])
+    return lambda i: _field_values(i, name)
+
+
+class FakeJira:  # pylint: disable=too-many-instance-attributes
+    """
+    A local Jira server holding a set of synthetic issues.
+
+    Examples:
+    >>> from atlassian import Jira
+    >>> with FakeJira(generate_hierarchy(depth=2, fanout=3)) as server:
+    ...     jira = Jira(url=server.url, token="any")
+    ...     result = jira.jql("'Epic Link' = FAKE-1", fields="summary")
+    ...     print(result["total"], server.stats["search"])
+    3 1
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        issues: Optional[list[FakeIssue]] = None,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+    ) -> None:
+        """
+        Create a server. It doesn't listen for requests until it is started.
+
+        Parameters:
+            - issues: The issues to serve (default: a generated hierarchy)
+            - latency: The time to wait before answering each request, in
+              seconds
+            - jitter: The maximum random time added to the latency, in seconds
+            - throttle_rate: The fraction of requests rejected with 429 (Too
+              Many Requests)
+            - error_rate: The fraction of requests that fail with a 5xx error
+            - retry_after: The delay requested by the Retry-After header of
+              429 responses, in seconds
+            - seed: The random seed for the injected faults
+        """
+        self.issues: dict[str, FakeIssue] = {
+            issue.key: issue
+            for issue in (generate_hierarchy() if issues is None else issues)
+        }
+        self.forbidden: set[str] = set()
+        self.moved: dict[str, str] = {}
+        """The old keys of the issues moved to another project, with the new ones"""
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.stats: Counter[str] = Counter()
+        """The number of requests handled, in total and by type"""
+        self.lock = threading.RLock()
+        """Held while reading or changing the issues"""
+        self._rnd = random.Random(seed)
+        self._next_id = 1 + max(
+            (
+                int(entry["id"])
+                for issue in self.issues.values()
+                for entry in issue.comments + issue.histories
+            ),
+            default=10000,
+        )
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the running server."""
+        if self._server is None:
+            raise RuntimeError("The server is not running")
+        host, port = self._server.server_address[:2]
+        return f"http://{str(host)}:{port}"
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeJira":
+        """
+        Start serving requests in a background thread.
+
+        Parameters:
+            - host: The address to listen on
+            - port: The port to listen on (default: any free port)
+
+        Returns:
+            The server itself
+        """
+        self._server = _Server((host, port), _Handler, self)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fakejira", daemon=True
+        )
+        self._thread.start()
+        _logger.info("Fake Jira serving %d issues at %s", len(self.issues), self.url)
+        return self
+
+    def stop(self) -> None:
+        """Stop serving requests."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeJira":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def count(self, name: str) -> None:
+        """Count a request in the statistics."""
+        with self.lock:
+            self.stats[name] += 1
+
+    def draw_fault(self) -> tuple[float, int]:
+        """
+        Decide how to answer a request.
+
+        Returns:
+            The delay before answering, in seconds, and the status code to fail
+            the request with (or 0 to answer it normally)
+        """
+        with self.lock:
+            delay = self.latency + self._rnd.uniform(0, self.jitter)
+            if self._rnd.random() < self.throttle_rate:
+                return delay, 429
+            if self._rnd.random() < self.error_rate:
+                return delay, self._rnd.choice([500, 502, 503])
+            return delay, 0
+
+    def _new_id(self) -> str:
+        with self.lock:
+            self._next_id += 1
+            return str(self._next_id)
+
+    def search(self, jql: str) -> list[FakeIssue]:
+        """
+        Find the (visible) issues matching a JQL query.
+
+        Raises:
+            - JqlError: If the query isn't understood
+        """
+        predicate, order = _JqlParser(jql, datetime.now(tz=UTC)).parse()
+        with self.lock:
+            found = [
+                issue
+                for key, issue in self.issues.items()
+                if key not in self.forbidden and predicate(issue)
+            ]
+        found.sort(key=_sort_key("key"))
+        for name, descending in reversed(order):
+            found.sort(key=_sort_key(name), reverse=descending)
+        return found
+
+    def update_issue(
+        self,
+        key: str,
+        fields: dict[str, Any],
+        author: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """
+        Change the fields of an issue, recording the change in its changelog.
+
+        Parameters:
+            - key: The key of the issue
+            - fields: The new field values
+            - author: The user making the change (default: the bot)
+        """
+        now = datetime.now(tz=UTC)
+        with self.lock:
+            issue = self.issues[key]
+            items = [
+                {
+                    "field": name,
+                    "fieldtype": (
+                        "custom" if name.startswith("customfield_") else "jira"
+                    ),
+                    "fromString": _display(issue.fields.get(name)),
+                    "toString": _display(value),
+                }
+                for name, value in fields.items()
+            ]
+            issue.fields.update(fields)
+            issue.fields["updated"] = _stamp(now)
+            issue.histories.append(
+                {
+                    "id": self._new_id(),
+                    "author": author or BOT_USER,
+                    "created": _stamp(now),
+                    "items": items,
+                }
+            )
+
+    def add_comment(
+        self, key: str, body: str, author: Optional[dict[str, Any]] = None
+    ) -> None:
+        """
+        Add a comment to an issue.
+
+        Parameters:
+            - key: The key of the issue
+            - body: The text of the comment
+            - author: The user making the comment (default: the bot)
+        """
+        now = _stamp(datetime.now(tz=UTC))
+        with self.lock:
+            issue = self.issues[key]
+            issue.comments.append(
+                {
+                    "id": self._new_id(),
+                    "author": author or BOT_USER,
+                    "created": now,
+                    "updated": now,
+                    "body": body,
+                }
+            )
+            issue.fields["updated"] = now
+
+    def move_issue(self, key: str, new_key: str) -> None:
+        """
+        Move an issue to another project. As with Jira, the issue is found by
+        its old key too, but it is returned under its new one.
+
+        Parameters:
+            - key: The key of the issue
+            - new_key: The key of the issue in its new project
+        """
+        with self.lock:
+            issue = self.issues.pop(key)
+            issue.key = new_key
+            issue.fields["project"] = {"key": new_key.rsplit("-", 1)[0]}
+            self.issues[new_key] = issue
+            self.moved[key] = new_key
+
+    def simulate_activity(self, fraction: float) -> list[str]:
+        """
+        Change a random selection of issues, as other users would: each one
+        gets a new comment and a status change.
+
+        Parameters:
+            - fraction: The fraction of the issues to change
+
+        Returns:
+            The keys of the changed issues
+        """
+        with self.lock:
+            keys = sorted(self.issues)
+            chosen = self._rnd.sample(keys, round(fraction * len(keys)))
+            for key in chosen:
+                status = self._rnd.choice(list(_STATUSES))
+                self.add_comment(key, f"Moving this to {status}", _OTHER_USER)
+                self.update_issue(
+                    key,
+                    {
+                        "status": {
+                            "name": status,
+                            "statusCategory": {"name": _STATUSES[status]},
+                        }
+                    },
+                    _OTHER_USER,
+                )
+        return chosen
+
+    def render(
+        self, issue: FakeIssue, wanted: Optional[set[str]], changelog: bool = False
+    ) -> dict[str, Any]:
+        """
+        Build the API representation of an issue.
+
+        Parameters:
+            - issue: The issue
+            - wanted: The fields to include (None for all of them)
+            - changelog: Include the changelog
+
+        Returns:
+            The issue payload
+        """
+        with self.lock:
+            names = [*issue.fields, "comment", "issuelinks"]
+            fields: dict[str, Any] = {}
+            for name in names:
+                if wanted is not None and name not in wanted:
+                    continue
+                if name == "comment":
+                    fields[name] = _page(issue.comments, 0, len(issue.comments))
+                    fields[name]["comments"] = fields[name].pop("values")
+                elif name == "issuelinks":
+                    fields[name] = [
+                        self._render_link(direction, key)
+                        for direction, key in issue.links
+                        if key in self.issues
+                    ]
+                else:
+                    fields[name] = issue.fields[name]
+            data: dict[str, Any] = {
+                "id": str(issue.number),
+                "key": issue.key,
+                "fields": fields,
+            }
+            if changelog:
+                data["changelog"] = _page(issue.histories, 0, len(issue.histories))
+                data["changelog"]["histories"] = data["changelog"].pop("values")
+            return data
+
+    def _render_link(self, direction: str, key: str) -> dict[str, Any]:
+        return {
+            "type": {"name": "Blocks", "inward": "is blocked by", "outward": "blocks"},
+            f"{direction}Issue": _issue_ref(self.issues[key]),
+        }
+
+
+def _display(value: Any) -> Optional[str]:
+    """The form of a field value shown in the changelog."""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return str(value.get("name", value.get("value", value.get("key", ""))))
+    if isinstance(value, list):
+        return " ".join(_display(v) or "" for v in value)
+    return str(value)
+
+
+def _page(values: list[Any], start: int, limit: int) -> dict[str, Any]:
+    """
+    A page of a list, in the form the API returns it.
+
+    Examples:
+    >>> _page(["a", "b", "c"], 1, 1)
+    {'startAt': 1, 'maxResults': 1, 'total': 3, 'values': ['b']}
+    """
+    return {
+        "startAt": start,
+        "maxResults": limit,
+        "total": len(values),
+        "values": values[start : start + limit],
+    }
+
+
+def _wanted_fields(spec: Optional[str], available: list[str]) -> Optional[set[str]]:
+    """
+    Interpret the `fields` parameter of a request.
+
+    Examples:
+    >>> sorted(_wanted_fields("summary,status", ["summary", "labels", "status"]))
+    ['status', 'summary']
+    >>> sorted(_wanted_fields("*all,-labels", ["summary", "labels"]))
+    ['summary']
+    >>> _wanted_fields(None, ["summary"]) is None
+    True
+    """
+    if not spec:
+        return None
+    wanted: set[str] = set()
+    for name in spec.split(","):
+        name = name.strip()
+        if name in ("*all", "*navigable"):
+            wanted.update(available)
+        elif name.startswith("-"):
+            wanted.discard(name[1:])
+        elif name:
+            wanted.add(name)
+    return wanted
+
+
+class _Server(ThreadingHTTPServer):
+    """The HTTP server, with a reference to the fake it serves."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], handler: type, fake: FakeJira) -> None:
+        super().__init__(address, handler)
+        self.fake = fake
+
+
+class _HttpError(Exception):
+    """An error response to send."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+_ROUTES = [
+    ("GET", re.compile(r"/rest/api/2/issue/([^/]+)/changelog"), "changelog"),
+    ("GET", re.compile(r"/rest/api/2/issue/([^/]+)/comment"), "comment"),
+    ("GET", re.compile(r"/rest/api/2/issue/([^/]+)"), "issue"),
+    ("PUT", re.compile(r"/rest/api/2/issue/([^/]+)"), "update"),
+    ("GET", re.compile(r"/rest/api/2/search"), "search"),
+    ("GET", re.compile(r"/rest/agile/1\.0/epic/([^/]+)/issue"), "epic"),
+    ("GET", re.compile(r"/rest/api/2/myself"), "myself"),
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handles the requests to the fake server."""
+
+    server: _Server
+    protocol_version = "HTTP/1.1"  # Keep connections open between requests
+    # The headers and body are written separately; don't hold back the body
+    # waiting for the client to acknowledge the headers
+    disable_nagle_algorithm = True
+
+    def log_message(
+        self, format: str, *args: Any
+    ) -> None:  # pylint: disable=redefined-builtin
+        _logger.debug(format, *args)
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Handle a GET request."""
+        self._dispatch("GET")
+
+    def do_PUT(self) -> None:  # pylint: disable=invalid-name
+        """Handle a PUT request."""
+        self._dispatch("PUT")
+
+    def _send(
+        self, status: int, data: Any = None, headers: Optional[dict[str, str]] = None
+    ) -> None:
+        body = b"" if data is None else json.dumps(data).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if data is not None:
+            self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_faults(self, fake: FakeJira) -> bool:
+        """Delay the request and maybe fail it. Returns True if it failed."""
+        delay, status = fake.draw_fault()
+        if delay > 0:
+            time.sleep(delay)
+        if status == 429:
+            fake.count("throttled")
+            self._send(
+                429,
+                {"errorMessages": ["Rate limit exceeded"]},
+                {"Retry-After": f"{fake.retry_after:g}"},
+            )
+        elif status:
+            fake.count("errors")
+            self._send(status, {"errorMessages": ["Internal server error"]})
+        return status != 0
+
+    def _dispatch(self, method: str) -> None:
+        fake = self.server.fake
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        fake.count("requests")
+        if self._inject_faults(fake):
+            return
+        for route_method, pattern, name in _ROUTES:
+            if route_method == method and (match := pattern.fullmatch(url.path)):
+                fake.count(name)
+                handler = getattr(self, f"_{name}")
+                try:
+                    self._send(*handler(fake, params, body, *match.groups()))
+                except _HttpError as ex:
+                    self._send(ex.status, {"errorMessages": [str(ex)], "errors": {}})
+                return
+        self._send(404, {"errorMessages": [f"No route for {method} {url.path}"]})
+
+    @staticmethod
+    def _get_issue(fake: FakeJira, key: str) -> FakeIssue:
+        key = key.upper()
+        issue = fake.issues.get(fake.moved.get(key, key))
+        if issue is None:
+            raise _HttpError(404, "Issue Does Not Exist")
+        if issue.key in fake.forbidden:
+            raise _HttpError(
+                403, "You do not have the permission to see the specified issue."
+            )
+        return issue
+
+    @staticmethod
+    def _paging(params: dict[str, str]) -> tuple[int, int]:
+        start = int(params.get("startAt", 0))
+        limit = int(params.get("maxResults", _DEFAULT_PAGE_SIZE))
+        return start, min(limit, _MAX_PAGE_SIZE)
+
+    def _issue(
+        self, fake: FakeJira, params: dict[str, str], _body: bytes, key: str
+    ) -> tuple[int, Any]:
+        issue = self._get_issue(fake, key)
+        wanted = _wanted_fields(
+            params.get("fields"), [*issue.fields, "comment", "issuelinks"]
+        )
+        changelog = "changelog" in params.get("expand", "").split(",")
+        return 200, fake.render(issue, wanted, changelog)
+
+    def _update(
+        self, fake: FakeJira, _params: dict[str, str], body: bytes, key: str
+    ) -> tuple[int, Any]:
+        issue = self._get_issue(fake, key)
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError as ex:
+            raise _HttpError(400, f"Invalid JSON: {ex}") from ex
+        fields = dict(request.get("fields") or {})
+        # Label updates can also be given as a list of operations
+        operations = (request.get("update") or {}).get("labels")
+        if operations:
+            labels = list(fields.get("labels", issue.fields["labels"]))
+            for operation in operations:
+                if "add" in operation and operation["add"] not in labels:
+                    labels.append(operation["add"])
+                if "remove" in operation and operation["remove"] in labels:
+                    labels.remove(operation["remove"])
+                if "set" in operation:
+                    labels = list(operation["set"])
+            fields["labels"] = labels
+        if fields:
+            fake.update_issue(issue.key, fields)
+        return 204, None
+
+    def _changelog(
+        self, fake: FakeJira, params: dict[str, str], _body: bytes, key: str
+    ) -> tuple[int, Any]:
+        issue = self._get_issue(fake, key)
+        with fake.lock:
+            return 200, _page(issue.histories, *self._paging(params))
+
+    def _comment(
+        self, fake: FakeJira, params: dict[str, str], _body: bytes, key: str
+    ) -> tuple[int, Any]:
+        issue = self._get_issue(fake, key)
+        with fake.lock:
+            comments = list(issue.comments)
+        if params.get("orderBy", "created").startswith("-"):
+            comments.reverse()
+        page = _page(comments, *self._paging(params))
+        page["comments"] = page.pop("values")
+        return 200, page
+
+    def _results(
+        self, fake: FakeJira, params: dict[str, str], found: list[FakeIssue]
+    ) -> tuple[int, Any]:
+        """A page of search results."""
+        start, limit = self._paging(params)
+        changelog = "changelog" in params.get("expand", "").split(",")
+        issues = []
+        for issue in found[start : start + limit]:
+            wanted = _wanted_fields(
+                params.get("fields", "*navigable"),
+                [*issue.fields, "comment", "issuelinks"],
+            )
+            issues.append(fake.render(issue, wanted, changelog))
+        return 200, {
+            "startAt": start,
+            "maxResults": limit,
+            "total": len(found),
+            "issues": issues,
+        }
+
+    def _search(
+        self, fake: FakeJira, params: dict[str, str], _body: bytes
+    ) -> tuple[int, Any]:
+        try:
+            found = fake.search(params.get("jql", ""))
+        except JqlError as ex:
+            raise _HttpError(400, str(ex)) from ex
+        return self._results(fake, params, found)
+
+    def _epic(
+        self, fake: FakeJira, params: dict[str, str], _body: bytes, key: str
+    ) -> tuple[int, Any]:
+        self._get_issue(fake, key)
+        return self._results(fake, params, fake.search(f"'Epic Link' = '{key}'"))
+
+    def _myself(
+        self, _fake: FakeJira, _params: dict[str, str], _body: bytes
+    ) -> tuple[int, Any]:
+        return 200, BOT_USER
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Serve a fake Jira instance")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--project", type=str, default="FAKE", help="Project key")
+    parser.add_argument(
+        "--roots", type=int, default=1, help="Number of top-level issues"
+    )
+    parser.add_argument("--depth", type=int, default=4, help="Hierarchy levels (1-5)")
+    parser.add_argument("--fanout", type=int, default=4, help="Children per issue")
+    parser.add_argument(
+        "--comments", type=int, default=5, help="Average comments per issue"
+    )
+    parser.add_argument(
+        "--changes", type=int, default=10, help="Average changes per issue"
+    )
+    parser.add_argument(
+        "--update-rate",
+        type=float,
+        default=0.1,
+        help="Fraction of issues updated in the last day",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Response delay (seconds)"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Random extra delay (seconds)"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="Fraction of 429 responses"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of 5xx responses"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("-d", "--debug", action="store_true", help="Log each request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    issues = generate_hierarchy(
+        args.project,
+        roots=args.roots,
+        depth=args.depth,
+        fanout=args.fanout,
+        comments=args.comments,
+        changes=args.changes,
+        update_rate=args.update_rate,
+        seed=args.seed,
+    )
+    server = FakeJira(
+        issues,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ).start(args.host, args.port)
+    print(f"Serving {len(issues)} issues at {server.url}; press Ctrl-C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(json.dumps(dict(server.stats), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Test the fake Jira server."""
+
+import pytest
+import requests
+from atlassian import Jira  # type: ignore
+
+from apiclients import make_session
+from fakejira import FakeJira, generate_hierarchy
+from jiraissues import (
+    CF_EPIC_LINK,
+    InaccessibleIssueError,
+    Issue,
+    descendants,
+    iter_changelog,
+    iter_comments,
+    search_issues,
+)
+
+
+class TestFakeJira:
+    """Test the FakeJira server."""
+
+    def test_generate(self):
+        """Test that the hierarchy is linked the way Jira links it."""
+        issues = generate_hierarchy(depth=5, fanout=2, seed=3)
+        types = [issue.fields["issuetype"]["name"] for issue in issues]
+        assert types.count("Outcome") == 1
+        assert types.count("Sub-task") == 16
+        story = next(i for i in issues if i.fields["issuetype"]["name"] == "Story")
+        assert [s["key"] for s in story.fields["subtasks"]] == [
+            s.key for s in issues if (s.fields["parent"] or {}).get("key") == story.key
+        ]
+        again = generate_hierarchy(depth=5, fanout=2, seed=3)
+        assert [i.fields["summary"] for i in again] == [
+            i.fields["summary"] for i in issues
+        ]
+
+    def test_issue(self, fake_jira, jira):
+        """Test fetching an issue with and without field selection."""
+        data = jira.issue("TEST-4", fields="summary,customfield_12311140")
+        assert set(data["fields"]) == {"summary", CF_EPIC_LINK}
+        assert data["fields"][CF_EPIC_LINK] == "TEST-2"
+        issue = Issue(jira, "TEST-4")
+        assert issue.parent == "TEST-2"
+        assert len(issue.changelog) == len(fake_jira.issues["TEST-4"].histories)
+        # The fields, then the changelog (which is one more issue request)
+        assert fake_jira.stats["issue"] == 3
+
+    def test_inaccessible(self, fake_jira, jira):
+        """Test that hidden and missing issues are refused."""
+        fake_jira.forbidden.add("TEST-3")
+        with pytest.raises(InaccessibleIssueError, match="403"):
+            Issue(jira, "TEST-3")
+        with pytest.raises(InaccessibleIssueError, match="404"):
+            Issue(jira, "TEST-99")
+        assert "TEST-3" not in [i["key"] for i in search_issues(jira, "", [])]
+
+    def test_search(self, fake_jira, jira):
+        """Test the JQL queries that we use."""
+
+        def keys(jql: str) -> list[str]:
+            return [i["key"] for i in search_issues(jira, jql, ["summary"])]
+
+        assert keys("'Epic Link' in ('TEST-2', TEST-3)") == [
+            f"TEST-{n}" for n in range(4, 8)
+        ]
+        assert keys("key in (TEST-1, TEST-5) or 'Parent Link' = TEST-1") == [
+            "TEST-1",
+            "TEST-2",
+            "TEST-3",
+            "TEST-5",
+        ]
+        labelled = [
+            k for k, i in fake_jira.issues.items() if "AISummary" in i.fields["labels"]
+        ]
+        assert keys("labels = AISummary and updated >= '2000-01-01 00:00'") == labelled
+        assert keys("project = TEST ORDER BY key DESC")[0] == "TEST-7"
+        assert keys("updated >= -1m") == []
+        with pytest.raises(requests.HTTPError):
+            keys("summary ~ 'x'")
+
+    def test_descendants(self, fake_jira, jira):
+        """Test walking the hierarchy, with one search per level."""
+        found = descendants(jira, "TEST-1")
+        assert sorted(d.key for d in found) == sorted(
+            set(fake_jira.issues) - {"TEST-1"}
+        )
+        assert fake_jira.stats["search"] == 3
+
+    def test_paging(self, fake_jira, jira):
+        """Test that changelogs, comments and searches are paged."""
+        issue = fake_jira.issues["TEST-1"]
+        assert len(list(iter_changelog(jira, "TEST-1"))) == len(issue.histories)
+        comments = list(iter_comments(jira, "TEST-1", newest_first=True))
+        assert [c["id"] for c in comments] == [
+            c["id"] for c in reversed(issue.comments)
+        ]
+        assert len(list(search_issues(jira, "", [], page_size=2))) == 7
+        assert fake_jira.stats["search"] == 4
+
+    def test_update(self, fake_jira, jira):
+        """Test that field updates are applied and recorded."""
+        issue = Issue(jira, "TEST-5")
+        before = len(issue.changelog)
+        issue.update_labels({"AISummary", "other"})
+        assert sorted(fake_jira.issues["TEST-5"].fields["labels"]) == [
+            "AISummary",
+            "other",
+        ]
+        issue.refresh()
+        assert issue.labels == {"AISummary", "other"}
+        assert len(issue.changelog) == before + 1
+        assert issue.changelog[-1].changes[0].field == "labels"
+        assert issue.last_change is not None and issue.is_last_change_mine
+
+    def test_simulated_activity(self, fake_jira):
+        """Test that simulated activity changes the issues."""
+        before = {key: i.fields["updated"] for key, i in fake_jira.issues.items()}
+        changed = fake_jira.simulate_activity(0.5)
+        assert len(changed) == 4
+        assert all(
+            fake_jira.issues[key].fields["updated"] > before[key] for key in changed
+        )
+
+    def test_throttling(self):
+        """Test that throttled requests are retried."""
+        issues = generate_hierarchy(depth=2, fanout=3)
+        with FakeJira(issues, throttle_rate=0.5, retry_after=0, seed=2) as server:
+            jira = Jira(url=server.url, token="any", session=make_session())
+            assert len(list(search_issues(jira, "", [], page_size=1))) == 4
+            assert server.stats["throttled"] > 0
+            assert server.stats["search"] == 4
@@ -0,0 +1,245 @@
+"""
+A local stand-in for the summarization model, for offline testing and
+benchmarks.
+
+The fake model returns a deterministic summary for each prompt, built from
+the words of the prompt, and takes as long as a real model would to produce
+it: a fixed time to the first token, followed by the generated tokens at a
+fixed rate. Failures and rate limiting can be injected, and are retried the
+way the real model's are.
+
+The token counts are recorded with the timers in `simplestats`:
+
+- `FakeLLM.first_token`: The time to the first token, with the prompt tokens
+  as its units
+- `FakeLLM.generation`: The time to generate the rest of the response, with
+  the generated tokens as its units
+- `FakeLLM.failure`: The number of failed attempts
+
+Select it for the summarizer by setting `LLM_BACKEND=fake`.
+"""
+
+import hashlib
+import os
+import random
+import re
+import time
+from typing import Any, List, Mapping, Optional, Union
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import LLM, LanguageModelInput
+from langchain_core.pydantic_v1 import PrivateAttr
+from langchain_core.runnables import RunnableConfig
+
+from simplestats import Timer, measure_function
+
+# What counts as a token: a word or a single punctuation character
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# The words of a prompt that are used to build its summary
+_WORD_RE = re.compile(r"[A-Za-z]{4,}")
+_TITLE_RE = re.compile(r"^Title: ([A-Z][A-Z0-9]*-\d+)", re.MULTILINE)
+
+
+def fake_token_count(text: Union[str, list[str]]) -> int:
+    """
+    Count the tokens in some text, approximately as a real tokenizer would.
+
+    Parameters:
+        - text: The text (or texts) to count the tokens in
+
+    Returns:
+        The number of tokens
+
+    Examples:
+    >>> fake_token_count("Hello, world!")
+    4
+    >>> fake_token_count(["one", "two three"])
+    3
+    """
+    texts = [text] if isinstance(text, str) else text
+    return sum(len(_TOKEN_RE.findall(t)) for t in texts)
+
+
+def fake_summary(prompt: str, max_tokens: int = 4000) -> str:
+    """
+    Create the summary for a prompt. The same prompt always gives the same
+    summary.
+
+    Parameters:
+        - prompt: The prompt
+        - max_tokens: The maximum length of the summary, in tokens
+
+    Returns:
+        The summary
+
+    Examples:
+    >>> prompt = "Title: ABC-1 - Add the widget\\nThe widget is almost ready."
+    >>> fake_summary(prompt) == fake_summary(prompt)
+    True
+    >>> fake_summary(prompt).startswith("ABC-1 ")
+    True
+    >>> fake_token_count(fake_summary(prompt, max_tokens=10)) <= 10
+    True
+    """
+    rnd = random.Random(hashlib.sha256(prompt.encode()).digest())
+    words = _WORD_RE.findall(prompt) or ["progress"]
+    title = _TITLE_RE.search(prompt)
+    sentences = [f"{title.group(1) if title else 'This issue'} is in progress."]
+    length = fake_token_count(sentences[0])
+    target = min(rnd.randint(40, 120), max_tokens)
+    while True:
+        sentence = " ".join(rnd.choice(words) for _ in range(rnd.randint(6, 16)))
+        sentence = sentence.capitalize() + "."
+        length += fake_token_count(sentence)
+        if length > target:
+            break
+        sentences.append(sentence)
+    summary = " ".join(sentences)
+    if fake_token_count(summary) > target:  # Only for a tiny maximum
+        summary = " ".join(_TOKEN_RE.findall(summary)[:target])
+    return summary
+
+
+class FakeLLMError(Exception):
+    """A simulated failure of the model server."""
+
+    def __init__(self, status: int) -> None:
+        """
+        Parameters:
+            - status: The HTTP status code of the simulated failure
+        """
+        super().__init__(f"Simulated model failure (HTTP {status})")
+        self.status = status
+
+
+class FakeLLM(LLM):  # pylint: disable=abstract-method
+    """
+    A model that produces deterministic summaries at a simulated speed.
+
+    Examples:
+    >>> llm = FakeLLM(ttft=0, tokens_per_second=0)
+    >>> llm.invoke("Title: ABC-1 - A test") == llm.invoke("Title: ABC-1 - A test")
+    True
+    """
+
+    ttft: float = 0.5
+    """The time to the first token, in seconds"""
+    tokens_per_second: float = 50.0
+    """The rate the response is generated at (0 for no delay)"""
+    error_rate: float = 0.0
+    """The fraction of attempts that fail with a server error"""
+    throttle_rate: float = 0.0
+    """The fraction of attempts that are rejected as rate limited"""
+    max_new_tokens: int = 4000
+    """The maximum length of the response, in tokens"""
+    max_tries: int = 10
+    """The number of attempts before giving up"""
+    retry_delay: float = 1.0
+    """The delay before the first retry, in seconds (doubled each time)"""
+    seed: int = 0
+    """The random seed for the injected failures"""
+
+    _attempts: int = PrivateAttr(default=0)
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "FakeLLM":
+        """
+        Create a fake model configured via environment variables:
+
+        - FAKE_LLM_TTFT: The time to the first token, in seconds (default: 0.5)
+        - FAKE_LLM_TOKENS_PER_SECOND: The generation rate (default: 50)
+        - FAKE_LLM_ERROR_RATE: The fraction of failed attempts (default: 0)
+        - FAKE_LLM_THROTTLE_RATE: The fraction of rate limited attempts
+          (default: 0)
+        - FAKE_LLM_SEED: The random seed for the failures (default: 0)
+
+        Parameters:
+            - kwargs: Other settings for the model
+
+        Returns:
+            The model
+        """
+        return cls(
+            ttft=float(os.environ.get("FAKE_LLM_TTFT", "0.5")),
+            tokens_per_second=float(os.environ.get("FAKE_LLM_TOKENS_PER_SECOND", "50")),
+            error_rate=float(os.environ.get("FAKE_LLM_ERROR_RATE", "0")),
+            throttle_rate=float(os.environ.get("FAKE_LLM_THROTTLE_RATE", "0")),
+            seed=int(os.environ.get("FAKE_LLM_SEED", "0")),
+            **kwargs,
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> Mapping[str, Any]:
+        return {
+            "ttft": self.ttft,
+            "tokens_per_second": self.tokens_per_second,
+            "max_new_tokens": self.max_new_tokens,
+        }
+
+    def _draw_failure(self, prompt: str) -> int:
+        """
+        Decide whether an attempt fails. The outcome depends only on the seed,
+        the prompt and the attempt number, so it doesn't change with the order
+        in which concurrent requests are made.
+
+        Returns:
+            The status code of the failure, or 0 if the attempt succeeds
+        """
+        self._attempts += 1
+        rnd = random.Random(f"{self.seed}:{self._attempts}:{prompt}")
+        if rnd.random() < self.throttle_rate:
+            return 429
+        if rnd.random() < self.error_rate:
+            return 503
+        return 0
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        status = self._draw_failure(prompt)
+        if status == 429:  # Rejected straight away
+            Timer("FakeLLM.failure", autostart=True).stop()
+            raise FakeLLMError(status)
+        with Timer("FakeLLM.first_token") as timer:
+            timer.add_units(fake_token_count(prompt))
+            time.sleep(self.ttft)
+        if status:
+            Timer("FakeLLM.failure", autostart=True).stop()
+            raise FakeLLMError(status)
+        summary = fake_summary(prompt, self.max_new_tokens)
+        for sequence in stop or []:
+            summary = summary.split(sequence, 1)[0]
+        with Timer("FakeLLM.generation") as timer:
+            tokens = fake_token_count(summary)
+            timer.add_units(tokens)
+            if self.tokens_per_second > 0:
+                time.sleep(tokens / self.tokens_per_second)
+        return summary
+
+    # pylint: disable=redefined-builtin
+    @measure_function
+    def invoke(
+        self,
+        input: LanguageModelInput,
+        config: Optional[RunnableConfig] = None,
+        *,
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> str:
+        attempt = 0
+        while True:
+            try:
+                return super().invoke(input, config=config, stop=stop, **kwargs)
+            except FakeLLMError:
+                attempt += 1
+                if attempt >= self.max_tries:
+                    raise
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
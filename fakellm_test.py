@@ -0,0 +1,62 @@
+"""Test the fake model."""
+
+import time
+
+import pytest
+
+import summarizer
+from fakellm import FakeLLM, FakeLLMError, fake_summary, fake_token_count
+from simplestats import Timer
+
+_PROMPT = "Title: ABC-12 - Improve the widget\n\nThe widget needs more gears."
+
+
+class TestFakeLLM:
+    """Test the FakeLLM."""
+
+    @pytest.fixture(autouse=True)
+    def clear_stats(self) -> None:
+        """Start each test with no recorded statistics."""
+        Timer.clear()
+
+    def test_deterministic(self):
+        """Test that a prompt always gets the same summary."""
+        llm = FakeLLM(ttft=0, tokens_per_second=0)
+        summary = llm.invoke(_PROMPT)
+        assert summary == FakeLLM(ttft=0, tokens_per_second=0).invoke(_PROMPT)
+        assert summary.startswith("ABC-12 is in progress.")
+        assert summary != fake_summary(_PROMPT + " Also wheels.")
+
+    def test_timing(self):
+        """Test that the model takes as long as configured to answer."""
+        llm = FakeLLM(ttft=0.05, tokens_per_second=2000)
+        start = time.monotonic()
+        summary = llm.invoke(_PROMPT)
+        tokens = fake_token_count(summary)
+        assert time.monotonic() - start >= 0.05 + tokens / 2000
+        first = Timer.stats("FakeLLM.first_token")
+        assert first.units == fake_token_count(_PROMPT)
+        assert first.elapsed_ns >= 50_000_000
+        assert Timer.stats("FakeLLM.generation").units == tokens
+
+    def test_failures(self):
+        """Test that failed attempts are retried until they run out."""
+        llm = FakeLLM(ttft=0, tokens_per_second=0, throttle_rate=0.5, retry_delay=0)
+        summaries = {llm.invoke(f"{_PROMPT} {i}") for i in range(20)}
+        assert len(summaries) == 20
+        failures = Timer.stats("FakeLLM.failure").count
+        assert failures > 0
+        assert Timer.stats("FakeLLM.generation").count == 20
+        llm = FakeLLM(ttft=0, error_rate=1, max_tries=3, retry_delay=0)
+        with pytest.raises(FakeLLMError, match="503"):
+            llm.invoke(_PROMPT)
+        assert Timer.stats("FakeLLM.failure").count == failures + 3
+
+    def test_summarizer_backend(self, monkeypatch):
+        """Test that the summarizer uses the fake model when configured to."""
+        monkeypatch.setattr(summarizer, "LLM_BACKEND", "fake")
+        monkeypatch.setenv("FAKE_LLM_TTFT", "0")
+        chat = summarizer.get_chat_model(max_new_tokens=20)
+        assert isinstance(chat, FakeLLM)
+        assert fake_token_count(chat.invoke(_PROMPT)) <= 20
+        assert summarizer.count_tokens(["a b", "c"]) == 3
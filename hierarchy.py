@@ -0,0 +1,250 @@
+"""
+A local index of the Jira issue hierarchy.
+
+The index records the parent of every issue that has been seen, and from that
+the children of each issue, so that ancestors, descendants and subtree sizes
+can be answered without any API calls. It is updated incrementally as issues
+are (re)fetched, and it can be persisted to a local file so that it survives
+restarts.
+
+The parent of an issue is a property of the issue itself, so it is known as
+soon as the issue has been fetched. The set of children, on the other hand,
+can only be known by searching for them. The index therefore also tracks when
+the children of each issue were last retrieved in full, and only treats them
+as complete for a limited time.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from typing import Iterable, Optional
+
+_logger = logging.getLogger(__name__)
+
+# Version of the persisted file format
+_FORMAT_VERSION = 1
+
+
+class HierarchyIndex:
+    """
+    An index of parent/child relationships between issues.
+
+    Examples:
+    >>> index = HierarchyIndex()
+    >>> index.update("A-1", None)
+    >>> index.update("A-2", "A-1")
+    >>> index.update("A-3", "A-2")
+    >>> index.set_children("A-1", ["A-2"])
+    >>> index.set_children("A-2", ["A-3"])
+    >>> index.set_children("A-3", [])
+    >>> index.ancestors("A-3")
+    ['A-2', 'A-1']
+    >>> index.descendants("A-1")
+    ['A-2', 'A-3']
+    >>> (index.depth("A-3"), index.subtree_size("A-1"), index.is_complete("A-1"))
+    (2, 2, True)
+    >>> index.update("A-3", "A-1")  # Moved to a new parent
+    >>> index.children("A-2")
+    []
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, max_age: timedelta = timedelta(minutes=10)
+    ) -> None:
+        """
+        Create a hierarchy index.
+
+        Parameters:
+            - path: If provided, the index is loaded from this file, and
+              `save()` writes it back.
+            - max_age: How long a retrieved set of children is considered to
+              be complete.
+        """
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # The parent of each issue that has been seen (None for top-level)
+        self._parent: dict[str, Optional[str]] = {}
+        # The known children of each issue
+        self._children: dict[str, set[str]] = {}
+        # When the children of an issue were last retrieved in full
+        self._complete: dict[str, float] = {}
+        self._dirty = False
+        if path is not None and os.path.exists(path):
+            self._load(path)
+
+    def _link(self, key: str, parent: Optional[str]) -> None:
+        """Record the parent of an issue. The lock must be held."""
+        old = self._parent.get(key)
+        if key in self._parent and old == parent:
+            return
+        if old is not None and old in self._children:
+            self._children[old].discard(key)
+        self._parent[key] = parent
+        if parent is not None:
+            self._children.setdefault(parent, set()).add(key)
+        self._dirty = True
+
+    def update(self, key: str, parent: Optional[str]) -> None:
+        """
+        Record the current parent of an issue.
+
+        Parameters:
+            - key: The key of the issue
+            - parent: The key of its parent, or None if it has no parent
+        """
+        with self._lock:
+            self._link(key, parent)
+
+    def set_children(self, key: str, children: Iterable[str]) -> None:
+        """
+        Record the complete set of children of an issue.
+
+        Parameters:
+            - key: The key of the issue
+            - children: The keys of all of its children
+        """
+        with self._lock:
+            children = set(children)
+            for child in self._children.get(key, set()) - children:
+                # No longer a child; its actual parent is unknown
+                self._parent.pop(child, None)
+            for child in children:
+                self._link(child, key)
+            self._children[key] = children
+            self._complete[key] = time.time()
+            self._dirty = True
+
+    def remove(self, key: str) -> None:
+        """
+        Forget an issue (e.g., because it was deleted).
+
+        Parameters:
+            - key: The key of the issue
+        """
+        with self._lock:
+            parent = self._parent.pop(key, None)
+            if parent is not None and parent in self._children:
+                self._children[parent].discard(key)
+            self._complete.pop(key, None)
+            self._dirty = True
+
+    def knows(self, key: str) -> bool:
+        """True if the parent of the issue is known."""
+        with self._lock:
+            return key in self._parent
+
+    def parent(self, key: str) -> Optional[str]:
+        """The parent of an issue, or None if it has none or is unknown."""
+        with self._lock:
+            return self._parent.get(key)
+
+    def children(self, key: str) -> list[str]:
+        """The known children of an issue."""
+        with self._lock:
+            return sorted(self._children.get(key, set()))
+
+    def ancestors(self, key: str) -> list[str]:
+        """
+        The known ancestors of an issue, nearest first.
+
+        The chain stops at the first issue whose parent is unknown; use
+        `knows()` on the last ancestor to check whether the chain is complete.
+        """
+        with self._lock:
+            chain: list[str] = []
+            parent = self._parent.get(key)
+            while parent is not None and parent not in chain and parent != key:
+                chain.append(parent)
+                parent = self._parent.get(parent)
+            return chain
+
+    def descendants(self, key: str) -> list[str]:
+        """The known descendants of an issue, in breadth-first order."""
+        with self._lock:
+            found: list[str] = []
+            seen = {key}
+            frontier = [key]
+            while frontier:
+                next_frontier: list[str] = []
+                for node in frontier:
+                    for child in sorted(self._children.get(node, set())):
+                        if child not in seen:
+                            seen.add(child)
+                            found.append(child)
+                            next_frontier.append(child)
+                frontier = next_frontier
+            return found
+
+    def depth(self, key: str) -> int:
+        """The number of known ancestors of an issue."""
+        return len(self.ancestors(key))
+
+    def subtree_size(self, key: str) -> int:
+        """The number of known descendants of an issue."""
+        return len(self.descendants(key))
+
+    def is_complete(self, key: str) -> bool:
+        """
+        True if the children of an issue, and of all its descendants, have
+        been retrieved recently enough to be trusted.
+        """
+        oldest = time.time() - self.max_age.total_seconds()
+        nodes = [key, *self.descendants(key)]
+        with self._lock:
+            return all(self._complete.get(node, 0) >= oldest for node in nodes)
+
+    def clear(self) -> None:
+        """Forget everything."""
+        with self._lock:
+            self._parent.clear()
+            self._children.clear()
+            self._complete.clear()
+            self._dirty = True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._parent)
+
+    def _load(self, path: str) -> None:
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as ex:
+            _logger.warning("Unable to load hierarchy index %s: %s", path, ex)
+            return
+        if data.get("version") != _FORMAT_VERSION:
+            _logger.warning("Ignoring hierarchy index %s: unknown version", path)
+            return
+        with self._lock:
+            for key, parent in data["parents"].items():
+                self._link(key, parent)
+            self._complete.update(data["complete"])
+            self._dirty = False
+        _logger.info("Loaded %d issues from hierarchy index %s", len(self), path)
+
+    def save(self) -> None:
+        """Write the index to its file, if it has one and has changed."""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "version": _FORMAT_VERSION,
+                "parents": dict(self._parent),
+                "complete": dict(self._complete),
+            }
+            self._dirty = False
+        # Write to a temporary file, then rename, so readers never see a
+        # partially written index
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, delete=False, encoding="utf-8"
+        ) as file:
+            json.dump(data, file)
+        os.replace(file.name, self.path)
@@ -0,0 +1,69 @@
+"""Test the hierarchy index."""
+
+from datetime import timedelta
+
+import pytest
+
+from hierarchy import HierarchyIndex
+
+
+class TestHierarchyIndex:
+    """Test the HierarchyIndex."""
+
+    @pytest.fixture
+    def index(self) -> HierarchyIndex:
+        """Create an index of a small tree: A-1 -> (A-2 -> A-4, A-3)."""
+        index = HierarchyIndex()
+        index.set_children("A-1", ["A-2", "A-3"])
+        index.set_children("A-2", ["A-4"])
+        index.set_children("A-3", [])
+        index.set_children("A-4", [])
+        return index
+
+    def test_queries(self, index):
+        """Test the ancestor and descendant queries."""
+        assert index.ancestors("A-4") == ["A-2", "A-1"]
+        assert index.descendants("A-1") == ["A-2", "A-3", "A-4"]
+        assert index.depth("A-1") == 0
+        assert index.depth("A-4") == 2
+        assert index.subtree_size("A-2") == 1
+
+    def test_incremental_update(self, index):
+        """Test that moving an issue updates both of its parents."""
+        index.update("A-4", "A-3")
+        assert index.children("A-2") == []
+        assert index.children("A-3") == ["A-4"]
+        assert index.ancestors("A-4") == ["A-3", "A-1"]
+
+    def test_children_replaced(self, index):
+        """Test that a new set of children drops the ones that are gone."""
+        index.set_children("A-1", ["A-3"])
+        assert index.descendants("A-1") == ["A-3"]
+        assert not index.knows("A-2")
+
+    def test_completeness(self, index):
+        """Test that the children are only trusted while they are fresh."""
+        assert index.is_complete("A-1")
+        index.update("A-5", "A-4")  # A-5's children have never been retrieved
+        assert not index.is_complete("A-1")
+        index.max_age = timedelta(seconds=-1)
+        assert not index.is_complete("A-3")
+
+    def test_cycles(self):
+        """Test that cycles in the links don't cause infinite loops."""
+        index = HierarchyIndex()
+        index.update("A-1", "A-2")
+        index.update("A-2", "A-1")
+        assert index.ancestors("A-1") == ["A-2"]
+        assert index.descendants("A-1") == ["A-2"]
+
+    def test_persistence(self, index, tmp_path):
+        """Test that the index can be saved and reloaded."""
+        path = str(tmp_path / "hierarchy.json")
+        index.path = path
+        index.update("A-1", None)
+        index.save()
+        loaded = HierarchyIndex(path)
+        assert loaded.descendants("A-1") == ["A-2", "A-3", "A-4"]
+        assert loaded.knows("A-1")
+        assert loaded.is_complete("A-1")
@@ -0,0 +1,269 @@
+"""
+Persistent, on-disk storage for Jira issue data.
+
+The store is a local SQLite database in WAL mode, so it survives restarts and
+can be shared by all the processes on a host. It holds the raw field payload
+of each issue along with its (serialized) changelog and related issues. It is
+used as a second cache tier behind the in-memory IssueCache.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Iterable, Optional
+
+_logger = logging.getLogger(__name__)
+
+# Maximum number of keys to put in a single "IN (...)" query. SQLite limits
+# the number of parameters in a statement.
+_KEY_CHUNK_SIZE = 500
+
+_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS issue (
+    issue_key TEXT PRIMARY KEY,
+    updated TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    changelog TEXT,
+    related TEXT,
+    validated REAL NOT NULL
+)
+"""
+
+
+@dataclass
+class StoredIssue:
+    """The data for an issue, as held in the store."""
+
+    key: str
+    """The Jira key of the issue"""
+    updated: str
+    """The issue's "updated" timestamp, as returned by the API"""
+    fields: dict[str, Any]
+    """The raw "fields" payload of the issue"""
+    changelog: Optional[list[Any]]
+    """The serialized changelog, if it has been fetched"""
+    related: Optional[list[Any]]
+    """The serialized related issues, if they have been fetched"""
+    validated: float
+    """When the data was last known to be current (seconds since the epoch)"""
+
+
+class IssueStore:
+    """
+    A persistent store of Jira issue data.
+
+    Entries are keyed by the issue key and carry the issue's "updated" time.
+    The changelog and related issues are only kept as long as they belong to
+    the same version of the issue as the stored fields.
+
+    Examples:
+    >>> store = IssueStore(":memory:")
+    >>> store.put("ABC-1", "2024-01-01T00:00:00.000+0000", {"summary": "Hi"})
+    >>> store.put_extra("ABC-1", "2024-01-01T00:00:00.000+0000", changelog=[])
+    >>> store.merge_fields("ABC-1", "2024-01-01T00:00:00.000+0000", {"x": None})
+    >>> item = store.get("ABC-1")
+    >>> (item.fields, item.changelog, item.related)
+    ({'summary': 'Hi', 'x': None}, [], None)
+    >>> store.delete("ABC-1")
+    >>> store.get("ABC-1") is None
+    True
+    """
+
+    def __init__(self, path: str, max_age: timedelta = timedelta(minutes=5)) -> None:
+        """
+        Open (or create) an issue store.
+
+        Parameters:
+            - path: The path to the database file
+            - max_age: Entries that have not been validated against the server
+              for longer than this are ignored.
+        """
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+        # An in-memory database is private to a connection, so it can only be
+        # shared between threads via a single connection.
+        self._shared: Optional[sqlite3.Connection] = None
+        self._shared_lock = threading.Lock()
+        if path == ":memory:":
+            self._shared = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        return conn
+
+    def _execute(self, sql: str, params: Iterable[Any] = ()) -> list[Any]:
+        """Run a statement and return all the resulting rows."""
+        if self._shared is not None:
+            with self._shared_lock:
+                return self._shared.execute(sql, tuple(params)).fetchall()
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn.execute(sql, tuple(params)).fetchall()
+
+    def get(self, key: str) -> Optional[StoredIssue]:
+        """
+        Get the stored data for an issue.
+
+        Parameters:
+            - key: The key of the issue
+
+        Returns:
+            The stored data, or None if the issue is not stored (or too old)
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, StoredIssue]:
+        """
+        Get the stored data for a set of issues.
+
+        Parameters:
+            - keys: The keys of the issues
+
+        Returns:
+            A dictionary of the issues that were found
+        """
+        keys = list(keys)
+        oldest = time.time() - self.max_age.total_seconds()
+        found: dict[str, StoredIssue] = {}
+        for i in range(0, len(keys), _KEY_CHUNK_SIZE):
+            chunk = keys[i : i + _KEY_CHUNK_SIZE]
+            marks = ",".join("?" * len(chunk))
+            rows = self._execute(
+                "SELECT issue_key, updated, fields, changelog, related, validated"
+                + f" FROM issue WHERE validated >= ? AND issue_key IN ({marks})",
+                [oldest, *chunk],
+            )
+            for row in rows:
+                found[row[0]] = StoredIssue(
+                    key=row[0],
+                    updated=row[1],
+                    fields=json.loads(row[2]),
+                    changelog=json.loads(row[3]) if row[3] is not None else None,
+                    related=json.loads(row[4]) if row[4] is not None else None,
+                    validated=row[5],
+                )
+        return found
+
+    def put(self, key: str, updated: str, fields: dict[str, Any]) -> None:
+        """
+        Store the fields of an issue.
+
+        If the issue's "updated" time has changed, any stored changelog and
+        related issues are discarded.
+
+        Parameters:
+            - key: The key of the issue
+            - updated: The issue's "updated" timestamp
+            - fields: The raw "fields" payload of the issue
+        """
+        self._execute(
+            "INSERT INTO issue (issue_key, updated, fields, validated)"
+            + " VALUES (?, ?, ?, ?) ON CONFLICT (issue_key) DO UPDATE SET"
+            + " changelog = CASE WHEN updated = excluded.updated"
+            + " THEN changelog ELSE NULL END,"
+            + " related = CASE WHEN updated = excluded.updated"
+            + " THEN related ELSE NULL END,"
+            + " updated = excluded.updated, fields = excluded.fields,"
+            + " validated = excluded.validated",
+            [key, updated, json.dumps(fields), time.time()],
+        )
+
+    def merge_fields(self, key: str, updated: str, fields: dict[str, Any]) -> None:
+        """
+        Add fields to the stored fields of an issue.
+
+        The fields are only added if they belong to the same version of the
+        issue as the stored fields.
+
+        Parameters:
+            - key: The key of the issue
+            - updated: The "updated" timestamp of the issue the fields belong to
+            - fields: The raw "fields" payload to add
+        """
+        if not fields:
+            return
+        # json_set() (unlike json_patch()) keeps fields whose value is null
+        paths = ", ".join("?, json(?)" for _ in fields)
+        params: list[Any] = []
+        for name, value in fields.items():
+            params += [f'$."{name}"', json.dumps(value)]
+        self._execute(
+            f"UPDATE issue SET fields = json_set(fields, {paths})"
+            + " WHERE issue_key = ? AND updated = ?",
+            [*params, key, updated],
+        )
+
+    def put_extra(
+        self,
+        key: str,
+        updated: str,
+        changelog: Optional[list[Any]] = None,
+        related: Optional[list[Any]] = None,
+    ) -> None:
+        """
+        Store the changelog and/or related issues of an issue.
+
+        The data is only stored if it belongs to the same version of the issue
+        as the stored fields.
+
+        Parameters:
+            - key: The key of the issue
+            - updated: The "updated" timestamp of the issue the data belongs to
+            - changelog: The serialized changelog
+            - related: The serialized related issues
+        """
+        if changelog is not None:
+            self._execute(
+                "UPDATE issue SET changelog = ? WHERE issue_key = ? AND updated = ?",
+                [json.dumps(changelog), key, updated],
+            )
+        if related is not None:
+            self._execute(
+                "UPDATE issue SET related = ? WHERE issue_key = ? AND updated = ?",
+                [json.dumps(related), key, updated],
+            )
+
+    def mark_validated(self, keys: Iterable[str]) -> None:
+        """
+        Record that the stored data for a set of issues is still current.
+
+        Parameters:
+            - keys: The keys of the issues
+        """
+        keys = list(keys)
+        now = time.time()
+        for i in range(0, len(keys), _KEY_CHUNK_SIZE):
+            chunk = keys[i : i + _KEY_CHUNK_SIZE]
+            marks = ",".join("?" * len(chunk))
+            self._execute(
+                f"UPDATE issue SET validated = ? WHERE issue_key IN ({marks})",
+                [now, *chunk],
+            )
+
+    def delete(self, key: str) -> None:
+        """
+        Remove an issue from the store.
+
+        Parameters:
+            - key: The key of the issue
+        """
+        self._execute("DELETE FROM issue WHERE issue_key = ?", [key])
+
+    def clear(self) -> None:
+        """Remove all issues from the store."""
+        self._execute("DELETE FROM issue")
+
+    def __len__(self) -> int:
+        return int(self._execute("SELECT COUNT(*) FROM issue")[0][0])
@@ -0,0 +1,108 @@
+"""Test the persistent issue store."""
+
+import time
+from datetime import timedelta
+
+import pytest
+
+import jiraissues
+from issuestore import IssueStore
+from jiraissues import Issue, IssueCache
+
+UPDATED = "2024-01-01T00:00:00.000+0000"
+LATER = "2024-01-02T00:00:00.000+0000"
+
+
+class TestIssueStore:
+    """Test the IssueStore."""
+
+    @pytest.fixture
+    def store(self, tmp_path) -> IssueStore:
+        """Create a store in a temporary file."""
+        return IssueStore(str(tmp_path / "issues.db"))
+
+    def test_reopen(self, tmp_path, store):
+        """Test that the stored issues outlive the store object."""
+        store.put("ABC-1", UPDATED, {"summary": "Hi"})
+        store.put_extra("ABC-1", UPDATED, changelog=[{"id": "1"}], related=[])
+        item = IssueStore(str(tmp_path / "issues.db")).get("ABC-1")
+        assert item is not None
+        assert item.updated == UPDATED
+        assert item.fields == {"summary": "Hi"}
+        assert item.changelog == [{"id": "1"}]
+        assert item.related == []
+
+    def test_merge_fields(self, store):
+        """Test that merged fields are only added to the same version."""
+        store.put("ABC-1", UPDATED, {"summary": "Hi", "status": None})
+        store.merge_fields("ABC-1", UPDATED, {"status": {"name": "New"}, "x": None})
+        store.merge_fields("ABC-1", LATER, {"y": 1})
+        item = store.get("ABC-1")
+        assert item is not None
+        assert item.fields == {"summary": "Hi", "status": {"name": "New"}, "x": None}
+
+    def test_put_extra(self, store):
+        """Test that the changelog and links only belong to one version."""
+        store.put("ABC-1", UPDATED, {})
+        store.put_extra("ABC-1", LATER, changelog=[])
+        item = store.get("ABC-1")
+        assert item is not None and item.changelog is None
+        store.put_extra("ABC-1", UPDATED, changelog=[], related=[{"key": "ABC-2"}])
+        # Storing the same version again keeps them
+        store.put("ABC-1", UPDATED, {"summary": "Hi"})
+        item = store.get("ABC-1")
+        assert item is not None
+        assert (item.changelog, item.related) == ([], [{"key": "ABC-2"}])
+        # A new version drops them
+        store.put("ABC-1", LATER, {"summary": "Bye"})
+        item = store.get("ABC-1")
+        assert item is not None
+        assert (item.changelog, item.related) == (None, None)
+
+    def test_max_age(self, store):
+        """Test that get_many() skips issues that haven't been validated."""
+        store.put("ABC-1", UPDATED, {})
+        store.put("ABC-2", UPDATED, {})
+        time.sleep(0.05)
+        store.max_age = timedelta(seconds=0.04)
+        store.mark_validated(["ABC-2"])
+        assert list(store.get_many(["ABC-1", "ABC-2", "ABC-3"])) == ["ABC-2"]
+        store.max_age = timedelta(minutes=5)
+        assert len(store.get_many(["ABC-1", "ABC-2", "ABC-3"])) == 2
+        assert len(store) == 2
+
+
+class TestStoredIssues:
+    """Test caching issues in the store."""
+
+    def test_from_stored(self, tmp_path, fake_jira, jira):
+        """Test that an issue reloaded from the store matches the original."""
+        store = IssueStore(str(tmp_path / "issues.db"))
+        issue = IssueCache(100, store=store, hydrate=True).get_issue(jira, "TEST-2")
+        changelog = issue.changelog
+        related = issue.related
+        requests = fake_jira.stats["requests"]
+        stored = store.get("TEST-2")
+        assert stored is not None
+        reloaded = Issue.from_stored(jira, stored, store)
+        assert str(reloaded) == str(issue)
+        assert reloaded.updated == issue.updated
+        assert reloaded.changelog == changelog
+        assert reloaded.related == related
+        assert fake_jira.stats["requests"] == requests
+        # A new cache is filled from the store, too
+        cache = IssueCache(100, store=store, hydrate=True)
+        assert cache.get_issue(jira, "TEST-2").related == related
+        assert cache.store_hits == 1
+        assert fake_jira.stats["requests"] == requests
+
+    def test_store_from_env(self, tmp_path, monkeypatch):
+        """Test configuring the store via the environment."""
+        monkeypatch.delenv("ISSUE_STORE_PATH", raising=False)
+        assert jiraissues._store_from_env() is None  # pylint: disable=protected-access
+        monkeypatch.setenv("ISSUE_STORE_PATH", str(tmp_path / "issues.db"))
+        monkeypatch.setenv("ISSUE_STORE_MAX_AGE", "60")
+        store = jiraissues._store_from_env()  # pylint: disable=protected-access
+        assert store is not None
+        assert store.path == str(tmp_path / "issues.db")
+        assert store.max_age == timedelta(minutes=1)
@@ -1,20 +1,34 @@
 """Helper functions for working with Jira issues."""
 
+# pylint: disable=too-many-lines
+
+import atexit
 import logging
-import queue
+import os
+import random
+import sys
 import threading
-from dataclasses import dataclass, field
-from datetime import UTC, datetime
-from functools import reduce
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime, timedelta
+from email.utils import parsedate_to_datetime
+from functools import cache, reduce
 from operator import getitem
-from typing import Any, List, Optional, Set
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, TypeVar
 from zoneinfo import ZoneInfo
 
 import requests
 from atlassian import Jira  # type: ignore
-from backoff_utils import backoff, strategies  # type: ignore
 
-from simplestats import measure_function
+from cachepolicy import EvictionPolicy, LRUPolicy, make_policy
+from hierarchy import HierarchyIndex
+from issuestore import IssueStore, StoredIssue
+from ratelimit import CircuitBreaker, RateLimiter
+from simplestats import Timer, measure_function
 
 _logger = logging.getLogger(__name__)
 
@@ -33,8 +47,62 @@ BACKOFF_EXCEPTIONS: list[type[Exception]] = [
     requests.exceptions.HTTPError,
     requests.exceptions.ReadTimeout,
 ]
-# The Jira API seems to be limited to < 10 QPS
-BACKOFF_STRATEGY = strategies.Exponential(minimum=0.1, maximum=60, factor=2)
+# HTTP status codes that indicate a transient error that should be retried
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# HTTP status codes that mean an issue doesn't exist or we may not see it
+INACCESSIBLE_STATUS_CODES = {403, 404}
+# Bounds for the exponential backoff between retries, in seconds
+BACKOFF_MINIMUM = 0.1
+BACKOFF_MAXIMUM = 60
+# Maximum number of attempts for a single API call
+RETRY_MAX_TRIES = 10
+# Maximum time to spend on a single API call, including retries, in seconds
+RETRY_DEADLINE = float(os.environ.get("JIRA_RETRY_DEADLINE", "600"))
+# The Timer that counts the HTTP round-trips to Jira (one per attempt)
+_REQUEST_TIMER = "Jira.request"
+
+# The deadline set by retry_deadline() for the current thread/context
+_deadline: ContextVar[Optional[float]] = ContextVar("_deadline", default=None)
+
+_T = TypeVar("_T")
+
+
+def _limiter_from_env() -> RateLimiter:
+    """
+    Create the rate limiter for Jira API calls.
+
+    JIRA_QPS sets the sustained number of calls per second (default: 8, 0
+    disables limiting), JIRA_BURST sets how many calls may be made back-to-back
+    (default: 10), and JIRA_RATE_LOCK optionally names a file used to share the
+    limit between all the processes on the host.
+    """
+    return RateLimiter(
+        rate=float(os.environ.get("JIRA_QPS", "8")),
+        burst=int(os.environ.get("JIRA_BURST", "10")),
+        path=os.environ.get("JIRA_RATE_LOCK") or None,
+    )
+
+
+# Paces the calls to the Jira API from all threads, so that we stay under the
+# server's limit instead of relying on backoff after being throttled.
+jira_limiter = _limiter_from_env()
+# Fails calls fast while the Jira server appears to be down
+jira_breaker = CircuitBreaker(threshold=5, reset_after=30)
+
+# Maximum number of issue keys to put in a single `key in (...)` query. This
+# keeps the query URL well within typical server limits.
+_KEY_CHUNK_SIZE = 100
+# Number of results to request per page of a JQL search
+_SEARCH_PAGE_SIZE = 100
+# Number of changelog entries to request per page (Jira Cloud only; the
+# server API returns the whole changelog at once)
+_CHANGELOG_PAGE_SIZE = 100
+# Number of comments to request per page
+_COMMENT_PAGE_SIZE = 50
+# Maximum number of parent keys per hierarchy query. Each key appears several
+# times (Epic Link, Parent Link, parent), so the chunks are smaller than
+# _KEY_CHUNK_SIZE.
+_PARENT_CHUNK_SIZE = 50
 
 
 def rget(d: dict, *path, default=None) -> Any:
@@ -71,28 +139,195 @@ def rget(d: dict, *path, default=None) -> Any:
         return default
 
 
-def with_retry(func):
+def _is_retryable(ex: Exception) -> bool:
+    """Determine whether a failed call is worth retrying."""
+    if isinstance(ex, requests.exceptions.HTTPError):
+        if ex.response is None:
+            return True
+        return ex.response.status_code in RETRY_STATUS_CODES
+    return True  # Connection problems and timeouts
+
+
+def _inaccessible_status(ex: Exception) -> Optional[int]:
+    """
+    Get the status code of a failed call if it means the requested issue
+    doesn't exist or can't be seen, or None otherwise.
+    """
+    if isinstance(ex, requests.exceptions.HTTPError) and ex.response is not None:
+        if ex.response.status_code in INACCESSIBLE_STATUS_CODES:
+            return ex.response.status_code
+    return None
+
+
+class InaccessibleIssueError(Exception):
+    """
+    Raised when an issue can't be retrieved because it doesn't exist or we
+    don't have permission to see it.
+
+    Examples:
+    >>> str(InaccessibleIssueError("ABC-1", 403))
+    'Issue ABC-1 is not accessible (HTTP 403)'
+    """
+
+    def __init__(self, key: str, status: Optional[int] = None) -> None:
+        """
+        Parameters:
+            - key: The key of the issue
+            - status: The HTTP status code of the response, if known
+        """
+        super().__init__(
+            f"Issue {key} is not accessible"
+            + (f" (HTTP {status})" if status is not None else "")
+        )
+        self.key = key
+        self.status = status
+
+
+def _is_outage(ex: Exception) -> bool:
+    """Determine whether a failed call indicates the server is unavailable."""
+    if isinstance(ex, requests.exceptions.HTTPError):
+        return ex.response is None or ex.response.status_code >= 500
+    return True
+
+
+def _retry_after(ex: Exception) -> Optional[float]:
     """
-    Wrapper to apply backoff to a function.
+    Get the delay requested by the server via the Retry-After header.
+
+    Returns:
+        The number of seconds to wait, or None if there is no (valid) header
+    """
+    if not isinstance(ex, requests.exceptions.HTTPError) or ex.response is None:
+        return None
+    value = ex.response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:  # It can also be an HTTP date
+        when = parsedate_to_datetime(value)
+        return max((when - datetime.now(tz=UTC)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def retry_deadline(seconds: float) -> Iterator[None]:
+    """
+    Limit the total time that Jira calls may spend retrying.
+
+    Within the block, every call made via with_retry gives up once the deadline
+    has passed. Nested deadlines can only shorten the outer one.
+
+    Parameters:
+        - seconds: The number of seconds from now until the deadline.
+    """
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def with_retry(func: Callable[[], _T]) -> _T:
+    """
+    Call a Jira API function, with rate limiting and retries.
+
+    Each attempt first waits for the Jira rate limiter. Failures are only
+    retried if they are transient (connection problems, timeouts, 429 and 5xx
+    responses), waiting as requested by the server's Retry-After header or via
+    exponential backoff with jitter. Retries stop after RETRY_MAX_TRIES
+    attempts or once the operation's deadline (RETRY_DEADLINE, or a shorter
+    one set via `retry_deadline`) would be exceeded. While the Jira circuit
+    breaker is open, calls fail immediately.
 
     Parameters:
-        - func: The function to wrap.
+        - func: The function to call.
 
     Returns:
         The result of the function.
+
+    Raises:
+        - CircuitOpenError: If Jira appears to be down.
+        - The exception from the last attempt if the call could not be
+          completed.
     """
-    return backoff(
-        func,
-        max_tries=100,
-        strategy=BACKOFF_STRATEGY,
-        catch_exceptions=BACKOFF_EXCEPTIONS,
-    )
+    deadline = time.monotonic() + RETRY_DEADLINE
+    if (outer := _deadline.get()) is not None:
+        deadline = min(deadline, outer)
+    attempt = 0
+    while True:
+        trial = jira_breaker.check()
+        jira_limiter.acquire()
+        try:
+            with Timer(_REQUEST_TIMER):
+                result = func()
+        except tuple(BACKOFF_EXCEPTIONS) as ex:
+            if _is_outage(ex):
+                jira_breaker.failure()
+            else:
+                jira_breaker.success()  # The server is up, if unhappy
+            attempt += 1
+            if not _is_retryable(ex) or attempt >= RETRY_MAX_TRIES:
+                raise
+            delay = _retry_after(ex)
+            if delay is None:
+                # Exponential backoff with "full jitter"
+                delay = random.uniform(
+                    0, min(BACKOFF_MAXIMUM, BACKOFF_MINIMUM * 2**attempt)
+                )
+            if time.monotonic() + delay > deadline:
+                raise
+            _logger.info("Retrying in %.1fs after error: %s", delay, ex)
+            time.sleep(delay)
+        except BaseException:
+            # Not a failure of the server (e.g. an unparsable response); don't
+            # count it, but don't leave a trial call hanging either. Calls that
+            # aren't the trial must leave the one in progress alone.
+            if trial:
+                jira_breaker.abandon()
+            raise
+        else:
+            jira_breaker.success()
+            return result
+
+
+# Changed values up to this length are interned
+_INTERN_MAX_LENGTH = 40
 
 
-@dataclass
+def _intern(value: Any) -> Any:
+    """
+    Intern a string, so that all the objects holding the same value share a
+    single copy. Used for the small, closed vocabularies in the issue data
+    (statuses, issue types, field names, ...). Other values are returned
+    unchanged.
+
+    Examples:
+    >>> _intern("In" + " Progress") is _intern("In Progress")
+    True
+    >>> _intern(None) is None
+    True
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@cache
+def _zoneinfo(name: str) -> ZoneInfo:
+    """Get the (shared) ZoneInfo for a timezone name."""
+    return ZoneInfo(name)
+
+
+@dataclass(slots=True, frozen=True, weakref_slot=True)
 class Change:
     """
     Represents a change made to a field.
+
+    Changes are immutable so that identical ones can be shared; see _change().
     """
 
     field: str
@@ -102,8 +337,47 @@ class Change:
     to: str
     """The new value of the field."""
 
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "field", _intern(self.field))
+        # Short values (statuses, names, versions, ...) repeat across issues
+        if self.frm is not None and len(self.frm) <= _INTERN_MAX_LENGTH:
+            object.__setattr__(self, "frm", _intern(self.frm))
+        if self.to is not None and len(self.to) <= _INTERN_MAX_LENGTH:
+            object.__setattr__(self, "to", _intern(self.to))
+
+
+# The Change objects shared by all changelogs, by (field, from, to). They are
+# only kept while some changelog holds them, so the table doesn't outgrow the
+# issues in memory.
+_shared_changes: weakref.WeakValueDictionary[
+    tuple[str, Optional[str], Optional[str]], Change
+] = weakref.WeakValueDictionary()
+
+
+def _change(field_name: str, frm: Optional[str], to: Optional[str]) -> Change:
+    """
+    Get a Change object.
+
+    The same changes (e.g., status transitions) are made to many issues, so
+    changes whose values are short enough to be interned are shared. This also
+    skips creating (and interning the strings of) most of the Change objects
+    while parsing a changelog.
 
-@dataclass
+    Examples:
+    >>> _change("status", "New", "Closed") is _change("status", "New", "Closed")
+    True
+    """
+    change = _shared_changes.get((field_name, frm, to))
+    if change is None:
+        change = Change(field_name, frm, to)  # type: ignore[arg-type]
+        if (frm is None or len(frm) <= _INTERN_MAX_LENGTH) and (
+            to is None or len(to) <= _INTERN_MAX_LENGTH
+        ):
+            _shared_changes[(change.field, change.frm, change.to)] = change
+    return change
+
+
+@dataclass(slots=True)
 class ChangelogEntry:
     """
     An entry in the changelog for an issue.
@@ -118,9 +392,14 @@ class ChangelogEntry:
     """When the change was made."""
     changes: list[Change] = field(default_factory=list)
     """The changes made to the issue."""
+    id: str = ""
+    """The id of the history record. Ids increase as records are added."""
+
+    def __post_init__(self) -> None:
+        self.author = _intern(self.author)
 
 
-@dataclass
+@dataclass(slots=True)
 class Comment:
     """A comment on an issue."""
 
@@ -131,6 +410,9 @@ class Comment:
     body: str
     """The content of the comment."""
 
+    def __post_init__(self) -> None:
+        self.author = _intern(self.author)
+
 
 # How issues are related: MAIN <relationship> RELATED
 _HOW_SUBTASK = "has a sub-task"
@@ -138,7 +420,7 @@ _HOW_INEPIC = "is the parent of"
 _HOW_INPARENT = "is the parent of"
 
 
-@dataclass
+@dataclass(slots=True)
 class RelatedIssue:
     """A reference to a related issue and how it's related."""
 
@@ -155,6 +437,12 @@ class RelatedIssue:
     resolution: str
     """The resolution of the issue"""
 
+    def __post_init__(self) -> None:
+        self.how = _intern(self.how)
+        self.issue_type = _intern(self.issue_type)
+        self.status = _intern(self.status)
+        self.resolution = _intern(self.resolution)
+
     @property
     def is_child(self) -> bool:
         """True if the related issue is a child of the main issue."""
@@ -164,15 +452,53 @@ class RelatedIssue:
         return f"{self.key} ({self.issue_type}) - {self.summary} ({self.status}/{self.resolution})"
 
 
-class User:  # pylint: disable=too-few-public-methods
+class User:
     """A Jira user."""
 
+    __slots__ = ("display_name", "key", "name", "timezone", "tzinfo", "__weakref__")
+
+    # All the live User objects, by user key, so that each user is held only
+    # once no matter how many issues refer to them
+    _registry: weakref.WeakValueDictionary[str, "User"] = weakref.WeakValueDictionary()
+    _registry_lock = threading.Lock()
+
     def __init__(self, data: dict[str, Any]) -> None:
-        self.display_name = str(data.get("displayName", ""))
-        self.key = str(data.get("key", ""))
-        self.name = str(data.get("name", ""))
-        self.timezone = str(data.get("timeZone", ""))
-        self.tzinfo = ZoneInfo(self.timezone)
+        self.display_name = _intern(str(data.get("displayName", "")))
+        self.key = _intern(str(data.get("key", "")))
+        self.name = _intern(str(data.get("name", "")))
+        self.timezone = _intern(str(data.get("timeZone", "")))
+        self.tzinfo = _zoneinfo(self.timezone)
+
+    @classmethod
+    def from_data(cls, data: dict[str, Any]) -> "User":
+        """
+        Get the User for a user payload from the API, reusing the existing
+        object for the user if it is unchanged.
+
+        Parameters:
+            - data: The user payload
+
+        Returns:
+            The user
+
+        Examples:
+        >>> data = {"key": "jdoe", "name": "jdoe", "displayName": "J Doe",
+        ...         "timeZone": "UTC"}
+        >>> User.from_data(data) is User.from_data(dict(data))
+        True
+        """
+        key = str(data.get("key", ""))
+        with cls._registry_lock:
+            user = cls._registry.get(key)
+            if (
+                user is None
+                or user.name != str(data.get("name", ""))
+                or user.display_name != str(data.get("displayName", ""))
+                or user.timezone != str(data.get("timeZone", ""))
+            ):
+                user = cls(data)
+                cls._registry[key] = user
+            return user
 
     def __str__(self) -> str:
         return f"{self.display_name} ({self.key})"
@@ -191,87 +517,466 @@ class User:  # pylint: disable=too-few-public-methods
         )
 
 
+# The fields that are fetched to populate an Issue object. Only fetch the data
+# we need.
+_ISSUE_FIELDS = [
+    "summary",
+    "description",
+    "issuetype",
+    "parent",
+    "project",
+    "status",
+    "labels",
+    "resolution",
+    "updated",
+    CF_STATUS_SUMMARY,
+    CF_BLOCKED,
+    CF_BLOCKED_REASON,
+    CF_CONTRIBUTORS,
+    "comment",
+    "assignee",
+    CF_EPIC_LINK,
+    CF_PARENT_LINK,
+]
+
+# The fields that hold an issue's links to other issues
+_LINK_FIELDS = [
+    "issuelinks",
+    "subtasks",
+    CF_FEATURE_LINK,
+]
+
+# The fields that are fetched to fully hydrate an Issue. Along with
+# `expand=changelog`, this fills in everything but the issue's children in a
+# single request.
+_HYDRATED_FIELDS = _ISSUE_FIELDS + _LINK_FIELDS
+
+# The fields fetched for each loading profile. An issue loaded with a smaller
+# profile fetches the rest of its fields (in one request) the first time one
+# of them is used.
+_FIELD_PROFILES: dict[str, list[str]] = {
+    # Enough to identify and classify the issue and place it in the hierarchy
+    "header": [
+        "summary",
+        "issuetype",
+        "parent",
+        "project",
+        "status",
+        "labels",
+        "resolution",
+        "updated",
+        CF_EPIC_LINK,
+        CF_PARENT_LINK,
+    ],
+    # Everything except the free-form text (description and comments)
+    "scheduling": [
+        "summary",
+        "issuetype",
+        "parent",
+        "project",
+        "status",
+        "labels",
+        "resolution",
+        "updated",
+        CF_EPIC_LINK,
+        CF_PARENT_LINK,
+        CF_STATUS_SUMMARY,
+        CF_BLOCKED,
+        CF_BLOCKED_REASON,
+        CF_CONTRIBUTORS,
+        "assignee",
+    ],
+    "full": _ISSUE_FIELDS,
+}
+
+# The Issue attributes that are only set once their field has been loaded,
+# and the field each one comes from
+_LAZY_ATTRIBUTES: dict[str, str] = {
+    "description": "description",
+    "status_summary": CF_STATUS_SUMMARY,
+    "blocked": CF_BLOCKED,
+    "blocked_reason": CF_BLOCKED_REASON,
+    "contributors": CF_CONTRIBUTORS,
+    "assignee": "assignee",
+    "_comments": "comment",
+}
+
+
+def _profile_fields(profile: str, hydrate: bool = False) -> list[str]:
+    """
+    Get the fields to request for a loading profile.
+
+    Parameters:
+        - profile: The name of the profile ("header", "scheduling" or "full")
+        - hydrate: Also request the issue links
+
+    Returns:
+        The list of fields
+
+    Examples:
+    >>> _profile_fields("header")[:3]
+    ['summary', 'issuetype', 'parent']
+    >>> _profile_fields("everything")
+    Traceback (most recent call last):
+    ...
+    ValueError: Unknown field profile: everything
+    """
+    if profile not in _FIELD_PROFILES:
+        raise ValueError(f"Unknown field profile: {profile}")
+    return _FIELD_PROFILES[profile] + (_LINK_FIELDS if hydrate else [])
+
+
+def _with_requested(fields: dict[str, Any], requested: Iterable[str]) -> dict[str, Any]:
+    """
+    Make sure every requested field appears in a "fields" payload.
+
+    Empty fields may be left out of the response, but an issue must be able to
+    tell a field that is empty from one that has not been loaded.
+
+    Examples:
+    >>> _with_requested({"summary": "Hi"}, ["summary", "description"])
+    {'summary': 'Hi', 'description': None}
+    """
+    for name in requested:
+        fields.setdefault(name, None)
+    return fields
+
+
 class Issue:  # pylint: disable=too-many-instance-attributes
     """
     Represents a Jira issue as a proper object.
     """
 
+    # Issues are held in large numbers by the cache, so keep them compact
+    __slots__ = (
+        "client",
+        "key",
+        "store",
+        "summary",
+        "description",
+        "issue_type",
+        "project_key",
+        "status",
+        "labels",
+        "resolution",
+        "updated",
+        "status_summary",
+        "_changelog",
+        "_comments",
+        "_related",
+        "_links",
+        "blocked",
+        "blocked_reason",
+        "contributors",
+        "assignee",
+        "_parent_key",
+    )
+
     @measure_function
-    def __init__(self, client: Jira, issue_key: str) -> None:
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        client: Jira,
+        issue_key: str,
+        data: Optional[dict[str, Any]] = None,
+        store: Optional[IssueStore] = None,
+        hydrate: bool = False,
+        profile: str = "full",
+    ) -> None:
+        """
+        Create an Issue object.
+
+        Parameters:
+            - client: The Jira client to use for fetching additional data.
+            - issue_key: The key of the issue.
+            - data: The issue payload as returned by the API (e.g., from a JQL
+              search). If not provided, the issue is fetched from the server.
+              If the payload includes the changelog or the issue links, they
+              are used instead of being fetched separately. Fields that are
+              missing from the payload are fetched when first used.
+            - store: A persistent store to save the issue's data into. Data
+              that is fetched later (changelog, related issues) is saved too.
+            - hydrate: When fetching the issue, also retrieve its changelog
+              and issue links in the same request.
+            - profile: When fetching the issue, the set of fields to retrieve
+              ("header", "scheduling" or "full"). The remaining fields are
+              fetched when first used.
+
+        Raises:
+            - InaccessibleIssueError: If the issue doesn't exist or we're not
+              allowed to see it.
+        """
         self.client = client
         self.key = issue_key
-
-        # Only fetch the data we need
-        fields = [
-            "summary",
-            "description",
-            "issuetype",
-            "parent",
-            "project",
-            "status",
-            "labels",
-            "resolution",
-            "updated",
-            CF_STATUS_SUMMARY,
-            CF_BLOCKED,
-            CF_BLOCKED_REASON,
-            CF_CONTRIBUTORS,
-            "comment",
-            "assignee",
-            CF_EPIC_LINK,
-            CF_PARENT_LINK,
-        ]
-        # Need to Handle 403 errors
-        # DEBUG:urllib3.connectionpool:https://server.com:443 "GET
-        # /rest/api/2/issue/XXXX-16688?fields=summary,...,comment HTTP/1.1" 403
-        # None
-        # DEBUG:atlassian.rest_client:HTTP: GET
-        # rest/api/2/issue/XXXX-16688?fields=summary,...,comment -> 403
-        # Forbidden
-        # DEBUG:atlassian.rest_client:HTTP: Response text ->
-        # {"errorMessages":["You do not have the permission to see the specified
-        # issue."],"errors":{}}
-        data = check_response(
-            with_retry(lambda: client.issue(issue_key, fields=",".join(fields)))
-        )
+        self.store = store
+
+        if data is None:
+            fields = _profile_fields(profile, hydrate)
+            expand = "changelog" if hydrate else None
+            try:
+                data = check_response(
+                    with_retry(
+                        lambda: client.issue(
+                            issue_key, fields=",".join(fields), expand=expand
+                        )
+                    )
+                )
+            except requests.exceptions.HTTPError as ex:
+                # The server responds with 403 for issues we're not allowed to
+                # see, and 404 for ones that don't exist
+                status = _inaccessible_status(ex)
+                if status is None:
+                    raise
+                raise InaccessibleIssueError(issue_key, status) from ex
+            _with_requested(data["fields"], fields)
 
         # Populate the fields
-        self.summary: str = rget(data, "fields", "summary", default="")
-        self.description: str = rget(data, "fields", "description", default="")
-        self.issue_type: str = rget(data, "fields", "issuetype", "name", default="")
-        self.project_key: str = rget(data, "fields", "project", "key", default="")
-        self.status: str = rget(data, "fields", "status", "name", default="")
-        self.labels: Set[str] = set(rget(data, "fields", "labels", default=[]))
-        self.resolution: str = rget(
-            data, "fields", "resolution", "name", default="Unresolved"
-        )
-        # The "last updated" time is provided w/ TZ info
-        self.updated: datetime = datetime.fromisoformat(rget(data, "fields", "updated"))
-        self.status_summary: str = rget(data, "fields", CF_STATUS_SUMMARY, default="")
+        self._parse_header(data["fields"])
         self._changelog: Optional[List[ChangelogEntry]] = None
-        self._comments: Optional[List[Comment]] = None
-        # Go ahead and parse the comments to avoid an extra API call
-        self._comments = self._parse_comment_data(
-            rget(data, "fields", "comment", "comments", default=[])
-        )
         self._related: Optional[List[RelatedIssue]] = None
-        # Some instances have None for the blocked flag instead of a value
-        blocked_dict = rget(data, "fields", CF_BLOCKED, default={}) or {}
-        self.blocked = str(blocked_dict.get("value", "False")).lower() in ["true"]
-        self.blocked_reason: str = rget(data, "fields", CF_BLOCKED_REASON, default="")
-        self.contributors = {
-            User(user) for user in (rget(data, "fields", CF_CONTRIBUTORS) or [])
-        }
-        self.assignee = (
-            User(data["fields"]["assignee"]) if data["fields"]["assignee"] else None
+        # The links held in the issue itself (i.e., everything but the children)
+        self._links: Optional[List[RelatedIssue]] = None
+        if "issuelinks" in data["fields"]:
+            self._links = self._parse_links(data["fields"])
+        # The changelog is only usable if the server returned all of it
+        histories = rget(data, "changelog", "histories")
+        if histories is not None and len(histories) >= rget(
+            data, "changelog", "total", default=0
+        ):
+            self._changelog = self._parse_changelog(histories)
+        # The rest of the attributes are left unset if their fields were not
+        # loaded; see __getattr__()
+        self._parse_details(data["fields"])
+
+        if self.store is not None:
+            self.store.put(self.key, self.updated.isoformat(), data["fields"])
+            if self._changelog is not None:
+                self._store_changelog()
+        hierarchy.update(self.key, self._parent_key)
+        _logger.info("Retrieved issue: %s", self)
+
+    # Parsing is on the hot path when loading large hierarchies, so the parse
+    # methods look fields up directly (each one once) rather than with rget().
+
+    def _parse_header(self, fields: dict[str, Any]) -> None:
+        """Set the attributes that are loaded with every profile."""
+        get = fields.get
+        self.summary: str = get("summary", "")
+        self.issue_type: str = _intern((get("issuetype") or {}).get("name", ""))
+        self.project_key: str = _intern((get("project") or {}).get("key", ""))
+        self.status: str = _intern((get("status") or {}).get("name", ""))
+        self.labels: Set[str] = {_intern(label) for label in get("labels") or []}
+        self.resolution: str = _intern(
+            (get("resolution") or {}).get("name", "Unresolved")
         )
+        # The "last updated" time is provided w/ TZ info
+        self.updated: datetime = datetime.fromisoformat(fields["updated"])
         # The parent link can be from several sources. They are listed below in
-        # reverse order of preference:
-        self._parent_key: Optional[str] = rget(data, "fields", CF_EPIC_LINK)
-        self._parent_key = rget(data, "fields", CF_PARENT_LINK) or self._parent_key
-        self._parent_key = rget(data, "fields", "parent", "key") or self._parent_key
+        # order of preference:
+        self._parent_key: Optional[str] = (
+            (get("parent") or {}).get("key") or get(CF_PARENT_LINK) or get(CF_EPIC_LINK)
+        )
 
-        _logger.info("Retrieved issue: %s", self)
+    def _parse_details(self, fields: dict[str, Any]) -> None:
+        """Set the attributes whose fields are present in a "fields" payload."""
+        if "description" in fields:
+            self.description: str = fields["description"]
+        if CF_STATUS_SUMMARY in fields:
+            self.status_summary: str = fields[CF_STATUS_SUMMARY]
+        if CF_BLOCKED in fields:
+            # Some instances have None for the blocked flag instead of a value
+            blocked_dict = fields[CF_BLOCKED] or {}
+            self.blocked = str(blocked_dict.get("value", "False")).lower() in ["true"]
+        if CF_BLOCKED_REASON in fields:
+            self.blocked_reason: str = fields[CF_BLOCKED_REASON]
+        if CF_CONTRIBUTORS in fields:
+            self.contributors = {
+                User.from_data(user) for user in (fields[CF_CONTRIBUTORS] or [])
+            }
+        if "assignee" in fields:
+            self.assignee = (
+                User.from_data(fields["assignee"]) if fields["assignee"] else None
+            )
+        if "comment" in fields:
+            # Go ahead and parse the comments to avoid an extra API call
+            self._comments: Optional[List[Comment]] = self._parse_comment_data(
+                (fields["comment"] or {}).get("comments", [])
+            )
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes that have not been set, which are the
+        # ones whose fields were not part of the profile the issue was loaded
+        # with. Load all the missing fields at once, then try again.
+        if name not in _LAZY_ATTRIBUTES:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        self.load_fields()
+        return object.__getattribute__(self, name)
+
+    def _is_loaded(self, name: str) -> bool:
+        """Check whether an attribute is set, without loading it."""
+        try:
+            object.__getattribute__(self, name)
+        except AttributeError:
+            return False
+        return True
+
+    def missing_fields(self, profile: str = "full") -> List[str]:
+        """
+        The fields of a loading profile that have not been loaded yet.
+
+        Parameters:
+            - profile: The name of the profile
+
+        Returns:
+            The names of the missing fields
+        """
+        wanted = _profile_fields(profile)
+        return [
+            field_name
+            for name, field_name in _LAZY_ATTRIBUTES.items()
+            if field_name in wanted and not self._is_loaded(name)
+        ]
+
+    @measure_function
+    def load_fields(self, profile: str = "full") -> None:
+        """
+        Fetch the fields of a loading profile that have not been loaded yet.
+
+        Parameters:
+            - profile: The name of the profile
+        """
+        missing = self.missing_fields(profile)
+        if not missing:
+            return
+        _logger.debug("Loading fields of %s: %s", self.key, ", ".join(missing))
+        data = check_response(
+            with_retry(lambda: self.client.issue(self.key, fields=",".join(missing)))
+        )
+        self.merge_fields(_with_requested(data["fields"], missing))
+
+    def merge_fields(self, fields: dict[str, Any]) -> None:
+        """
+        Add the data of separately fetched fields to this issue.
+
+        Parameters:
+            - fields: A "fields" payload from the API
+        """
+        self._parse_details(fields)
+        if self.store is not None:
+            self.store.merge_fields(self.key, self.updated.isoformat(), fields)
+
+    def loaded_fields(self) -> List[str]:
+        """The fields that have been loaded, other than the comments."""
+        loaded = _profile_fields("header") + [
+            field_name
+            for name, field_name in _LAZY_ATTRIBUTES.items()
+            if name != "_comments" and self._is_loaded(name)
+        ]
+        return loaded + (_LINK_FIELDS if self._links is not None else [])
+
+    @measure_function
+    def refresh(self, fields: Optional[dict[str, Any]] = None) -> None:
+        """
+        Bring the issue up to date with the server, in place.
+
+        The loaded fields are fetched again. The changelog and the comments
+        only grow, so if they have been loaded, only the entries newer than
+        the ones already held are fetched and appended. (Edits to existing
+        comments are not picked up.) The related issues are fetched again
+        when next used.
+
+        Parameters:
+            - fields: The "fields" payload of the issue with the loaded fields
+              (see `loaded_fields()`), if it has already been fetched. If not
+              provided, it is fetched.
+        """
+        if fields is None:
+            wanted = self.loaded_fields()
+            data = check_response(
+                with_retry(lambda: self.client.issue(self.key, fields=",".join(wanted)))
+            )
+            fields = _with_requested(data["fields"], wanted)
+        self._parse_header(fields)
+        self._parse_details(fields)
+        if "issuelinks" in fields:
+            self._links = self._parse_links(fields)
+        self._related = None  # The children may have changed
+        if self._changelog is not None:
+            self._changelog = self._fetch_changelog(self._changelog)
+        if "comment" not in fields and self._is_loaded("_comments"):
+            self._comments = self._fetch_comments(self._comments)
+        if self.store is not None:
+            stored = dict(fields)
+            if self._is_loaded("_comments") and self._comments is not None:
+                stored["comment"] = {
+                    "comments": [
+                        {
+                            "author": {"displayName": comment.author},
+                            "created": comment.created.isoformat(),
+                            "body": comment.body,
+                        }
+                        for comment in self._comments
+                    ]
+                }
+            self.store.put(self.key, self.updated.isoformat(), stored)
+            if self._changelog is not None:
+                self._store_changelog()
+        hierarchy.update(self.key, self._parent_key)
+        _logger.info("Refreshed issue: %s", self)
+
+    def forget_related(self) -> List[str]:
+        """
+        Drop the related issues, so that they are fetched again when next
+        used.
+
+        The related issues hold the summaries and statuses of the linked issues
+        and children, and an issue can gain children, without its own update
+        time changing.
+
+        Returns:
+            The keys of the related issues that were known
+        """
+        known = [rel.key for rel in self._related or self._links or []]
+        self._related = None
+        self._links = None
+        return known
+
+    @classmethod
+    def from_stored(
+        cls, client: Jira, stored: StoredIssue, store: IssueStore
+    ) -> "Issue":
+        """
+        Create an Issue from data held in a persistent store.
+
+        Parameters:
+            - client: The Jira client to use for fetching additional data.
+            - stored: The stored issue data.
+            - store: The store the data came from.
+
+        Returns:
+            The issue object.
+        """
+        issue = cls(
+            client, stored.key, data={"key": stored.key, "fields": stored.fields}
+        )
+        issue.store = store
+        if stored.changelog is not None:
+            issue._changelog = [
+                ChangelogEntry(
+                    author=entry["author"],
+                    created=datetime.fromisoformat(entry["created"]),
+                    changes=[
+                        _change(change["field"], change["frm"], change["to"])
+                        for change in entry["changes"]
+                    ],
+                    id=entry.get("id", ""),
+                )
+                for entry in stored.changelog
+            ]
+        if stored.related is not None:
+            issue._related = [RelatedIssue(**related) for related in stored.related]
+        return issue
 
     def __str__(self) -> str:
         return (
@@ -290,87 +995,118 @@ class Issue:  # pylint: disable=too-many-instance-attributes
         return int(self_number) < int(other_number)
 
     @measure_function
-    def _fetch_changelog(self) -> List[ChangelogEntry]:
-        """Fetch the changelog from the API."""
-        _logger.debug("Retrieving changelog for %s", self.key)
-        log = check_response(
-            with_retry(
-                lambda: self.client.get_issue_changelog(self.key, start=0, limit=1000)
-            )
-        )
-        items: List[ChangelogEntry] = []
-        for entry in log["histories"]:
-            changes: List[Change] = []
-            for change in entry["items"]:
-                changes.append(
-                    Change(
-                        field=change["field"],
-                        frm=change["fromString"],
-                        to=change["toString"],
-                    )
-                )
-            items.append(
-                ChangelogEntry(
-                    author=rget(entry, "author", "displayName", default=""),
-                    created=datetime.fromisoformat(entry["created"]),
-                    changes=changes,
-                )
+    def _fetch_changelog(
+        self, known: Optional[List[ChangelogEntry]] = None
+    ) -> List[ChangelogEntry]:
+        """
+        Fetch the changelog from the API.
+
+        If the earlier part of the changelog is already known, only the newer
+        entries are fetched (the server API can only return the whole
+        changelog, but only the new entries are parsed) and appended to it.
+        """
+        if not known or not all(entry.id for entry in known):
+            _logger.debug("Retrieving changelog for %s", self.key)
+            return self._parse_changelog(list(iter_changelog(self.client, self.key)))
+        _logger.debug("Retrieving new changelog entries for %s", self.key)
+        last = max(int(entry.id) for entry in known)
+        newer = [
+            history
+            for history in iter_changelog(self.client, self.key, start=len(known))
+            if int(history["id"]) > last
+        ]
+        return known + self._parse_changelog(newer)
+
+    @staticmethod
+    def _parse_changelog(histories: List[dict[str, Any]]) -> List[ChangelogEntry]:
+        """Parse the history entries of a changelog."""
+        return [
+            ChangelogEntry(
+                author=(entry.get("author") or {}).get("displayName", ""),
+                created=datetime.fromisoformat(entry["created"]),
+                changes=[
+                    _change(item["field"], item["fromString"], item["toString"])
+                    for item in entry["items"]
+                ],
+                id=str(entry.get("id", "")),
             )
-        return items
+            for entry in histories
+        ]
 
     @property
     def changelog(self) -> List[ChangelogEntry]:
         """The changelog for the issue."""
         # Since it requires an additional API call, we only fetch it if it's
         # accessed, and we cache the result.
-        if not self._changelog:
+        if self._changelog is None:
             self._changelog = self._fetch_changelog()
+            if self.store is not None:
+                self._store_changelog()
         return self._changelog
 
+    def _store_changelog(self) -> None:
+        """Save the changelog to the persistent store."""
+        assert self.store is not None and self._changelog is not None
+        self.store.put_extra(
+            self.key,
+            self.updated.isoformat(),
+            changelog=[
+                {
+                    "author": entry.author,
+                    "created": entry.created.isoformat(),
+                    "changes": [asdict(change) for change in entry.changes],
+                    "id": entry.id,
+                }
+                for entry in self._changelog
+            ],
+        )
+
     @measure_function
-    def _fetch_comments(self) -> List[Comment]:
-        """Fetch the comments from the API."""
-        _logger.debug("Retrieving comments for %s", self.key)
-        comments = check_response(
-            with_retry(lambda: self.client.issue(self.key, fields="comment"))
-        )["fields"]["comment"]["comments"]
-        return self._parse_comment_data(comments)
+    def _fetch_comments(self, known: Optional[List[Comment]] = None) -> List[Comment]:
+        """
+        Fetch the comments from the API.
+
+        If some of the comments are already known, only the ones created after
+        the latest of them are fetched (newest first) and appended.
+        """
+        if not known:
+            _logger.debug("Retrieving comments for %s", self.key)
+            comments = check_response(
+                with_retry(lambda: self.client.issue(self.key, fields="comment"))
+            )["fields"]["comment"]["comments"]
+            return self._parse_comment_data(comments)
+        _logger.debug("Retrieving new comments for %s", self.key)
+        latest = max(comment.created for comment in known)
+        newer: List[dict[str, Any]] = []
+        for comment in iter_comments(self.client, self.key, newest_first=True):
+            if datetime.fromisoformat(comment["created"]) <= latest:
+                break
+            newer.append(comment)
+        return known + self._parse_comment_data(newer[::-1])
 
     def _parse_comment_data(self, comments: List[dict[str, Any]]) -> List[Comment]:
-        items: List[Comment] = []
-        for comment in comments:
-            items.append(
-                Comment(
-                    author=rget(comment, "author", "displayName", default=""),
-                    created=datetime.fromisoformat(comment["created"]),
-                    body=comment["body"],
-                )
+        return [
+            Comment(
+                author=(comment.get("author") or {}).get("displayName", ""),
+                created=datetime.fromisoformat(comment["created"]),
+                body=comment["body"],
             )
-        return items
+            for comment in comments
+        ]
 
     @property
     def comments(self) -> List[Comment]:
         """The comments on the issue."""
-        if not self._comments:
+        if self._comments is None:
             self._comments = self._fetch_comments()
         return self._comments
 
-    @measure_function
-    def _fetch_related(self) -> List[RelatedIssue]:  # pylint: disable=too-many-branches
-        """Fetch the related issues from the API."""
-        fields = [
-            "issuelinks",
-            "subtasks",
-            CF_FEATURE_LINK,
-        ]
+    @staticmethod
+    def _parse_links(fields: dict[str, Any]) -> List[RelatedIssue]:
+        """Parse the links to other issues held in the fields of an issue."""
         found_issues: set[str] = set()
-        _logger.debug("Retrieving related links for %s", self.key)
-        data = check_response(
-            with_retry(lambda: self.client.issue(self.key, fields=",".join(fields)))
-        )
-        # Get the related issues
         related: List[RelatedIssue] = []
-        for link in data["fields"]["issuelinks"]:
+        for link in fields.get("issuelinks") or []:
             if "inwardIssue" in link and link["inwardIssue"]["key"] not in found_issues:
                 rfields = link["inwardIssue"]["fields"]
                 related.append(
@@ -402,7 +1138,7 @@ class Issue:  # pylint: disable=too-many-instance-attributes
                 found_issues.add(link["outwardIssue"]["key"])
 
         # Get the sub-tasks
-        for subtask in data["fields"]["subtasks"]:
+        for subtask in fields.get("subtasks") or []:
             if subtask["key"] not in found_issues:
                 related.append(
                     RelatedIssue(
@@ -419,7 +1155,7 @@ class Issue:  # pylint: disable=too-many-instance-attributes
                 found_issues.add(subtask["key"])
 
         # The Feature Link has to be handled separately
-        feature = rget(data, "fields", CF_FEATURE_LINK)
+        feature = fields.get(CF_FEATURE_LINK)
         if feature is not None and feature["key"] not in found_issues:
             related.append(
                 RelatedIssue(
@@ -442,86 +1178,91 @@ class Issue:  # pylint: disable=too-many-instance-attributes
             )
             found_issues.add(feature["key"])
 
-        # Issues in the epic requires a query since there's no pointer from the epic
-        # issue to it's children. epic_issues returns an error if the issue is not
-        # an Epic. These are downward links to children
-        if self.issue_type == "Epic":
-            issues_in_epic = check_response(
+        return related
+
+    @measure_function
+    def _fetch_related(self) -> List[RelatedIssue]:
+        """Fetch the related issues from the API."""
+        if self._links is None:
+            _logger.debug("Retrieving related links for %s", self.key)
+            data = check_response(
                 with_retry(
-                    lambda: self.client.epic_issues(
-                        self.key, fields="key, summary, issuetype, status"
-                    )
+                    lambda: self.client.issue(self.key, fields=",".join(_LINK_FIELDS))
                 )
             )
-            for i in issues_in_epic["issues"]:
-                if i["key"] not in found_issues:
-                    related.append(
-                        RelatedIssue(
-                            key=i["key"],
-                            how=_HOW_INEPIC,
-                            summary=rget(i, "fields", "summary", default=""),
-                            issue_type=rget(
-                                i, "fields", "issuetype", "name", default="unknown"
-                            ),
-                            status=rget(
-                                i, "fields", "status", "name", default="unknown"
-                            ),
-                            resolution=rget(
-                                i,
-                                "fields",
-                                "status",
-                                "statusCategory",
-                                "name",
-                                default="unknown",
-                            ),
-                        )
-                    )
-                    found_issues.add(i["key"])
+            self._links = self._parse_links(data["fields"])
+        related = list(self._links)
+        found_issues = {rel.key for rel in related}
+
+        # Issues in the epic (or with this issue as their Parent Link) require a
+        # query since there's no pointer from the issue to its children. These
+        # are downward links to children
+        if self.issue_type == "Epic":
+            (jql, how) = (f"'Epic Link' = '{self.key}'", _HOW_INEPIC)
         else:
             # Non-epic issues use the parent link
-            issues_with_parent = check_response(
-                with_retry(
-                    lambda: self.client.jql(
-                        f"'Parent Link' = '{self.key}'",
-                        limit=200,
-                        fields="key, summary, issuetype, status",
+            (jql, how) = (f"'Parent Link' = '{self.key}'", _HOW_INPARENT)
+        for i in search_issues(self.client, jql, ["summary", "issuetype", "status"]):
+            if i["key"] not in found_issues:
+                related.append(
+                    RelatedIssue(
+                        key=i["key"],
+                        how=how,
+                        summary=rget(i, "fields", "summary", default=""),
+                        issue_type=rget(
+                            i, "fields", "issuetype", "name", default="unknown"
+                        ),
+                        status=rget(i, "fields", "status", "name", default="unknown"),
+                        resolution=rget(
+                            i,
+                            "fields",
+                            "status",
+                            "statusCategory",
+                            "name",
+                            default="unknown",
+                        ),
                     )
                 )
-            )
-            for i in issues_with_parent["issues"]:
-                if i["key"] not in found_issues:
-                    related.append(
-                        RelatedIssue(
-                            key=i["key"],
-                            how=_HOW_INPARENT,
-                            summary=rget(i, "fields", "summary", default=""),
-                            issue_type=rget(
-                                i, "fields", "issuetype", "name", default="unknown"
-                            ),
-                            status=rget(
-                                i, "fields", "status", "name", default="unknown"
-                            ),
-                            resolution=rget(
-                                i,
-                                "fields",
-                                "status",
-                                "statusCategory",
-                                "name",
-                                default="unknown",
-                            ),
-                        )
-                    )
-                    found_issues.add(i["key"])
+                found_issues.add(i["key"])
 
+        hierarchy.set_children(self.key, [rel.key for rel in related if rel.is_child])
         return related
 
     @property
     def related(self) -> List[RelatedIssue]:
         """Other issues that are related to this one."""
-        if not self._related:
+        if self._related is None:
             self._related = self._fetch_related()
+            if self.store is not None:
+                self.store.put_extra(
+                    self.key,
+                    self.updated.isoformat(),
+                    related=[asdict(related) for related in self._related],
+                )
         return self._related
 
+    @property
+    def estimated_size(self) -> int:
+        """
+        An estimate of the memory used by this object, in bytes.
+
+        This is only an approximation, dominated by the free-form text of the
+        issue (description and comments), plus a fixed overhead for the object
+        itself and for each of its comments, changes, and related issues.
+        """
+        # The overheads were measured with benchmarks/issue_memory.py. Fields
+        # that have not been loaded are not counted (or loaded).
+        size = 1280 + len(self.summary)
+        for name in ["description", "status_summary", "blocked_reason"]:
+            size += len((self._is_loaded(name) and getattr(self, name)) or "")
+        for comment in (self._is_loaded("_comments") and self._comments) or []:
+            size += 144 + len(comment.body)
+        for entry in self._changelog or []:
+            size += 160 + 72 * len(entry.changes)
+        for related in self._related or self._links or []:
+            size += 176 + len(related.summary)
+        return size
+
     @property
     def children(self) -> List[RelatedIssue]:
         """The child issues of this issue."""
@@ -541,11 +1282,20 @@ class Issue:  # pylint: disable=too-many-instance-attributes
     @measure_function
     def all_parents(self) -> List[str]:
         """All the parent issues of this issue."""
-        parents = []
-        issue = issue_cache.get_issue(self.client, self.key)
-        while issue.parent:
-            parents.append(issue.parent)
-            issue = issue_cache.get_issue(self.client, issue.parent)
+        parents: List[str] = []
+        key = self.key
+        while True:
+            if not hierarchy.knows(key):
+                # Fetching the issue records its parent in the index
+                try:
+                    issue_cache.get_issue(self.client, key, profile="header")
+                except InaccessibleIssueError:
+                    break
+            parent = hierarchy.parent(key)
+            if parent is None or parent in parents:
+                break
+            parents.append(parent)
+            key = parent
         return parents
 
     @property
@@ -666,13 +1416,18 @@ def get_self(client: Jira) -> User:
     global _self  # pylint: disable=global-statement
     if _self is None:
         data = check_response(with_retry(client.myself))
-        _self = User(data)
+        _self = User.from_data(data)
     return _self
 
 
-class IssueCache:
+class IssueCache:  # pylint: disable=too-many-instance-attributes
     """
     A cache of Jira issues to avoid fetching the same issue multiple times.
+
+    The cache is safe to use from multiple threads. The lock only protects the
+    cache's bookkeeping and is never held while fetching from the server.
+    Concurrent misses for different keys are fetched in parallel, while
+    concurrent misses for the same key share a single fetch.
     """
 
     @dataclass
@@ -682,19 +1437,283 @@ class IssueCache:
         """
 
         issue: Issue
+        size: int = 0
+        """The estimated size of the issue, in bytes."""
         insert_time: datetime = field(default_factory=lambda: datetime.now(tz=UTC))
-        last_used_time: datetime = field(default_factory=lambda: datetime.now(tz=UTC))
+        validated_time: datetime = field(default_factory=lambda: datetime.now(tz=UTC))
+        """When the issue was last known to match the server."""
         fetch_count: int = 0
 
-    def __init__(self, max_size: int) -> None:
+    @dataclass
+    class InFlight:
+        """
+        A fetch from the server that is in progress for a key.
+
+        The thread that registers the fetch is responsible for performing it
+        and completing this record. Other threads that miss on the same key
+        wait for it to be completed.
+        """
+
+        done: threading.Event = field(default_factory=threading.Event)
+        issue: Optional[Issue] = None
+        error: Optional[Exception] = None
+        invalidated: bool = False
+        """The key was removed from the cache while the fetch was running."""
+
+        def wait(self) -> Issue:
+            """Wait for the fetch to complete and return its result."""
+            self.done.wait()
+            if self.error is not None:
+                raise self.error
+            assert self.issue is not None
+            return self.issue
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        max_size: int,
+        policy: Optional[EvictionPolicy] = None,
+        ttl: Optional[timedelta] = None,
+        max_bytes: Optional[int] = None,
+        store: Optional[IssueStore] = None,
+        hydrate: bool = False,
+        negative_ttl: timedelta = timedelta(minutes=30),
+    ) -> None:
+        """
+        Create an issue cache.
+
+        Parameters:
+            - max_size: The maximum number of issues to hold.
+            - policy: The policy used to choose which issue to evict when the
+              cache is full (default: LRU).
+            - ttl: If provided, cached issues that have not been fetched or
+              revalidated for longer than this are treated as misses and
+              refetched.
+            - max_bytes: If provided, the maximum estimated memory size of all
+              the cached issues.
+            - store: If provided, a persistent store that is consulted before
+              fetching from the server, and that all fetched data is saved to.
+            - hydrate: Fetch the changelog and issue links of each issue along
+              with its fields, instead of with separate requests when they are
+              first used.
+            - negative_ttl: How long to remember that an issue doesn't exist
+              or can't be seen before requesting it again.
+        """
         self.lock = threading.Lock()
         self._cache: dict[str, IssueCache.Entry] = {}
+        self._inflight: dict[str, IssueCache.InFlight] = {}
+        self._policy = policy or LRUPolicy()
         self.hits = 0
         self.tries = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.revalidated = 0
+        self.changed = 0
+        self.size_bytes = 0
         self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.store = store
+        self.store_hits = 0
+        self.hydrate = hydrate
+        self.negative_ttl = negative_ttl
+        # Issues that could not be retrieved, and when to try them again
+        self._inaccessible: dict[str, tuple[datetime, InaccessibleIssueError]] = {}
+        self.inaccessible_hits = 0
+
+    def _drop(self, key: str) -> None:
+        """Remove an entry from the cache. The lock must be held."""
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry.size
+            self._policy.removed(key)
+
+    def _insert(self, key: str, issue: Issue) -> None:
+        """Add an issue to the cache, evicting entries as necessary."""
+        self._drop(key)
+        entry = IssueCache.Entry(issue, size=issue.estimated_size)
+        self._cache[key] = entry
+        self.size_bytes += entry.size
+        self._policy.inserted(key)
+        while len(self._cache) > self.max_size or (
+            self.max_bytes is not None and self.size_bytes > self.max_bytes
+        ):
+            victim = self._policy.victim()
+            if victim is None or victim == key:
+                break  # Always keep the issue that was just added
+            _logger.debug("Cache evict: %s", victim)
+            self._drop(victim)
+            self.evictions += 1
+
+    def _touch(self, key: str) -> None:
+        """Record a cache hit for the given key."""
+        self.hits += 1
+        _logger.debug("Cache hit: %s", key)
+        self._cache[key].fetch_count += 1
+        self._policy.accessed(key)
+
+    def _expired(self, key: str) -> bool:
+        """Check whether the entry for a key has outlived the TTL."""
+        return (
+            self.ttl is not None
+            and datetime.now(tz=UTC) - self._cache[key].validated_time > self.ttl
+        )
+
+    def _denied(self, key: str) -> Optional[InaccessibleIssueError]:
+        """
+        Get the error for a key that is known to be inaccessible, or None. The
+        lock must be held.
+        """
+        if key not in self._inaccessible:
+            return None
+        (retry_time, error) = self._inaccessible[key]
+        if datetime.now(tz=UTC) >= retry_time:
+            del self._inaccessible[key]
+            return None
+        return error
+
+    def _lookup(self, keys: Iterable[str]) -> tuple[
+        dict[str, Issue],
+        dict[str, InaccessibleIssueError],
+        dict[str, InFlight],
+        dict[str, InFlight],
+    ]:
+        """
+        Look up a set of keys in the cache. The lock must be held.
+
+        Returns:
+            A tuple of (hits, keys known to be inaccessible, fetches started by
+            other threads, fetches that are now owned by the caller).
+        """
+        found: dict[str, Issue] = {}
+        denied: dict[str, InaccessibleIssueError] = {}
+        waiting: dict[str, IssueCache.InFlight] = {}
+        owned: dict[str, IssueCache.InFlight] = {}
+        for key in keys:
+            self.tries += 1
+            error = self._denied(key)
+            if error is not None:
+                _logger.debug("Cache hit (inaccessible): %s", key)
+                self.inaccessible_hits += 1
+                denied[key] = error
+                continue
+            if key in self._cache and self._expired(key):
+                _logger.debug("Cache expired: %s", key)
+                self._drop(key)
+                self.expirations += 1
+            if key in self._cache:
+                self._touch(key)
+                found[key] = self._cache[key].issue
+            elif key in self._inflight:
+                _logger.debug("Cache miss (in flight): %s", key)
+                waiting[key] = self._inflight[key]
+            else:
+                _logger.debug("Cache miss: %s", key)
+                owned[key] = IssueCache.InFlight()
+                self._inflight[key] = owned[key]
+        return (found, denied, waiting, owned)
+
+    def _complete(
+        self,
+        owned: dict[str, InFlight],
+        fetch: Callable[[], tuple[dict[str, Issue], dict[str, InaccessibleIssueError]]],
+    ) -> None:
+        """
+        Perform a fetch for a set of owned keys and publish the results to
+        the cache and any waiting threads. The lock must NOT be held.
+        """
+        try:
+            (issues, errors) = fetch()
+        except Exception as ex:
+            with self.lock:
+                for key, pending in owned.items():
+                    pending.error = ex
+                    del self._inflight[key]
+                    pending.done.set()
+            raise
+        retry_time = datetime.now(tz=UTC) + self.negative_ttl
+        with self.lock:
+            for key, pending in owned.items():
+                if key in issues:
+                    pending.issue = issues[key]
+                    if not pending.invalidated:
+                        self._insert(key, issues[key])
+                else:
+                    pending.error = errors.get(key) or InaccessibleIssueError(key)
+                    if not pending.invalidated:
+                        self._inaccessible[key] = (retry_time, pending.error)
+                del self._inflight[key]
+                pending.done.set()
+
+    def _load(
+        self, client: Jira, keys: List[str], profile: str = "full"
+    ) -> tuple[dict[str, Issue], dict[str, InaccessibleIssueError]]:
+        """
+        Load a set of issues from the persistent store, or from the server if
+        they are not stored.
+
+        Returns:
+            A tuple of (the issues that were loaded, the errors for the ones
+            that are inaccessible). Keys in neither are inaccessible too.
+        """
+        errors: dict[str, InaccessibleIssueError] = {}
+        # The changelog and links are only worth fetching up front along with
+        # all the other fields
+        hydrate = self.hydrate and profile == "full"
+        issues: dict[str, Issue] = {}
+        if self.store is not None:
+            for key, stored in self.store.get_many(keys).items():
+                _logger.debug("Store hit: %s", key)
+                issues[key] = Issue.from_stored(client, stored, self.store)
+            with self.lock:
+                self.store_hits += len(issues)
+        missing = [key for key in keys if key not in issues]
+        if len(missing) == 1:
+            try:
+                issues[missing[0]] = Issue(
+                    client,
+                    missing[0],
+                    store=self.store,
+                    hydrate=hydrate,
+                    profile=profile,
+                )
+            except InaccessibleIssueError as ex:
+                errors[missing[0]] = ex
+        elif missing:
+            issues.update(
+                fetch_issues(
+                    client, missing, store=self.store, hydrate=hydrate, profile=profile
+                )
+            )
+        return (issues, errors)
+
+    def _fill(self, client: Jira, issues: Iterable[Issue], profile: str) -> None:
+        """
+        Fetch the fields of a loading profile that are missing from a set of
+        cached issues, in bulk.
+        """
+        lacking = {
+            issue.key: issue for issue in issues if issue.missing_fields(profile)
+        }
+        if not lacking:
+            return
+        fields = sorted(
+            {f for i in lacking.values() for f in i.missing_fields(profile)}
+        )
+        for data in _search_keys(client, list(lacking), fields):
+            if data["key"] in lacking:
+                lacking[data["key"]].merge_fields(
+                    _with_requested(data["fields"], fields)
+                )
+        with self.lock:
+            for key, issue in lacking.items():
+                entry = self._cache.get(key)
+                if entry is not None and entry.issue is issue:
+                    # The issue has grown
+                    self.size_bytes += issue.estimated_size - entry.size
+                    entry.size = issue.estimated_size
 
     @measure_function
-    def get_issue(self, client: Jira, key: str) -> Issue:
+    def get_issue(self, client: Jira, key: str, profile: str = "full") -> Issue:
         """
         Get an issue from the cache, or fetch it from the server if it's not
         already cached.
@@ -702,39 +1721,184 @@ class IssueCache:
         Parameters:
             - client: The Jira client to use for fetching the issue.
             - key: The key of the issue to fetch.
+            - profile: The set of fields to fetch if the issue isn't cached
+              ("header", "scheduling" or "full"). Any other fields are fetched
+              and added to the cached issue when they are first used.
 
         Returns:
             The issue object.
+
+        Raises:
+            - InaccessibleIssueError: If the issue doesn't exist or we're not
+              allowed to see it. This is remembered for the cache's
+              negative_ttl.
         """
         with self.lock:
-            self.tries += 1
-            if key not in self._cache:
-                _logger.debug("Cache miss: %s", key)
-                if len(self._cache) == self.max_size:
-                    # Remove the least recently used entry from the cache as
-                    # determined by last_used_time
-                    del self._cache[
-                        min(self._cache, key=lambda k: self._cache[k].last_used_time)
-                    ]
-                issue = Issue(client, key)
-                self._cache[key] = IssueCache.Entry(issue)
-            else:
-                self.hits += 1
-                _logger.debug("Cache hit: %s", key)
-                self._cache[key].fetch_count += 1
-                self._cache[key].last_used_time = datetime.now()
-            return self._cache[key].issue
+            (found, denied, waiting, owned) = self._lookup([key])
+        if key in denied:
+            raise denied[key]
+        if key in found:
+            return found[key]
+        if owned:
+            self._complete(owned, lambda: self._load(client, [key], profile))
+            return owned[key].wait()
+        return waiting[key].wait()
+
+    @measure_function
+    def get_issues(
+        self, client: Jira, keys: Iterable[str], profile: str = "full"
+    ) -> List[Issue]:
+        """
+        Get a set of issues from the cache, fetching all the ones that are not
+        already cached from the server in bulk.
+
+        Parameters:
+            - client: The Jira client to use for fetching the issues.
+            - keys: The keys of the issues to fetch.
+            - profile: The set of fields that is needed ("header",
+              "scheduling" or "full"). Cached issues that were loaded with a
+              smaller profile have the missing fields fetched in bulk.
+
+        Returns:
+            The issue objects, in the same order as the keys. Issues that don't
+            exist or that we're not allowed to see are left out.
+        """
+        keys = list(keys)
+        with self.lock:
+            (found, _, waiting, owned) = self._lookup(dict.fromkeys(keys))
+        if owned:
+            self._complete(owned, lambda: self._load(client, list(owned), profile))
+        for key, pending in (owned | waiting).items():
+            try:
+                found[key] = pending.wait()
+            except InaccessibleIssueError:
+                pass
+        self._fill(client, found.values(), profile)
+        return [found[key] for key in keys if key in found]
+
+    def is_inaccessible(self, key: str) -> bool:
+        """
+        Check whether an issue is known not to exist or to be hidden from us,
+        without requesting it.
+
+        Parameters:
+            - key: The key of the issue
+
+        Returns:
+            True if a recent request for the issue was refused
+        """
+        with self.lock:
+            return self._denied(key) is not None
+
+    @measure_function
+    def revalidate(
+        self,
+        client: Jira,
+        keys: Optional[Iterable[str]] = None,
+        refresh: bool = False,
+        related: bool = False,
+    ) -> int:
+        """
+        Check cached issues against the server, discarding the ones that have
+        changed.
+
+        Only the key and "updated" time of each issue are requested, in batched
+        searches. Issues that are unchanged keep all of their data, including
+        any changelog and related issues that have already been fetched.
+
+        Parameters:
+            - client: The Jira client to use for checking the issues.
+            - keys: The keys of the issues to check (default: all cached
+              issues).
+            - refresh: If True, bring the changed issues up to date in place
+              (fetching only their new changelog entries and comments) instead
+              of removing them.
+            - related: If True, also fetch the related issues of the checked
+              issues again when they are next used (see
+              `Issue.forget_related`), and revalidate the cached related issues
+              themselves.
+
+        Returns:
+            The number of cached issues that had changed.
+        """
+        with self.lock:
+            keys = list(self._cache) if keys is None else list(keys)
+            cached = {k: self._cache[k].issue for k in keys if k in self._cache}
+        if not cached:
+            return 0
+        current = fetch_updated(client, cached.keys())
+        changed = [k for k, issue in cached.items() if current.get(k) != issue.updated]
+        now = datetime.now(tz=UTC)
+        with self.lock:
+            for key, issue in cached.items():
+                entry = self._cache.get(key)
+                if entry is None or entry.issue is not issue:
+                    continue  # Replaced or removed while we were checking
+                if key in current and current[key] == issue.updated:
+                    entry.validated_time = now
+                elif not refresh or key not in current:
+                    self._drop(key)
+            self.revalidated += len(cached)
+            self.changed += len(changed)
+        # Issues that no longer exist (or have moved) can't be refreshed
+        refreshed = {k: cached[k] for k in changed if refresh and k in current}
+        if self.store is not None:
+            self.store.mark_validated([k for k in cached if k not in changed])
+            for key in changed:
+                if key not in refreshed:
+                    self.store.delete(key)
+        _logger.info(
+            "Revalidated %d cached issues, %d changed", len(cached), len(changed)
+        )
+        if refreshed:
+            self._refresh(client, refreshed)
+        if related:
+            with self.lock:
+                kept = [self._cache[k].issue for k in cached if k in self._cache]
+            others = {k for issue in kept for k in issue.forget_related()}
+            return len(changed) + self.revalidate(
+                client, others - cached.keys(), refresh
+            )
+        return len(changed)
+
+    def _refresh(self, client: Jira, issues: dict[str, Issue]) -> None:
+        """
+        Bring a set of cached issues up to date in place. Their fields are
+        fetched in bulk.
+        """
+        fields = sorted({f for issue in issues.values() for f in issue.loaded_fields()})
+        payloads = {
+            data["key"]: _with_requested(data["fields"], fields)
+            for data in _search_keys(client, list(issues), fields)
+        }
+        now = datetime.now(tz=UTC)
+        for key, issue in issues.items():
+            if key not in payloads:
+                self.remove(key)
+                continue
+            issue.refresh(payloads[key])
+            with self.lock:
+                entry = self._cache.get(key)
+                if entry is not None and entry.issue is issue:
+                    self.size_bytes += issue.estimated_size - entry.size
+                    entry.size = issue.estimated_size
+                    entry.validated_time = now
 
     def remove(self, key: str) -> None:
         """
-        Remove an Issue from the cache.
+        Remove an Issue from the cache (including the persistent store).
 
         Parameters:
             - key: The key of the issue to remove.
         """
         with self.lock:
-            if key in self._cache:
-                del self._cache[key]
+            self._drop(key)
+            self._inaccessible.pop(key, None)
+            if key in self._inflight:
+                # The data being fetched may already be out of date
+                self._inflight[key].invalidated = True
+        if self.store is not None:
+            self.store.delete(key)
 
     def remove_older_than(self, when: datetime) -> None:
         """
@@ -747,53 +1911,421 @@ class IssueCache:
         with self.lock:
             for key in list(self._cache.keys()):
                 if self._cache[key].insert_time < when:
-                    del self._cache[key]
+                    self._drop(key)
 
     def clear(self) -> None:
-        """Clear the cache."""
+        """
+        Clear the in-memory cache.
+
+        The persistent store is left intact, since it is shared with other
+        processes. Its entries expire on their own after the store's max_age.
+        """
         with self.lock:
             self._cache = {}
+            self._policy.clear()
+            self.size_bytes = 0
+            self._inaccessible = {}
+            for pending in self._inflight.values():
+                pending.invalidated = True
 
     def __str__(self) -> str:
         with self.lock:
             hr = self.hits * 100 / self.tries if self.tries > 0 else 0
-            return f"Hits: {self.hits} ({hr:.1f}%), Tries: {self.tries}, Size: {len(self._cache)}"
+            return (
+                f"Hits: {self.hits} ({hr:.1f}%), Tries: {self.tries}, "
+                + f"Size: {len(self._cache)} ({self.size_bytes / 2**20:.1f} MiB), "
+                + f"Evictions: {self.evictions}, Expired: {self.expirations}, "
+                + f"Revalidated: {self.revalidated} ({self.changed} changed), "
+                + f"Inaccessible: {len(self._inaccessible)}"
+                + f" ({self.inaccessible_hits} hits)"
+                + (f", Store hits: {self.store_hits}" if self.store else "")
+            )
+
+
+def _store_from_env() -> Optional[IssueStore]:
+    """
+    Open the persistent issue store, if one is configured.
+
+    The store is enabled by setting ISSUE_STORE_PATH to the path of the
+    database file. ISSUE_STORE_MAX_AGE sets how long (in seconds) stored issues
+    are considered current (default: 300).
+    """
+    path = os.environ.get("ISSUE_STORE_PATH")
+    if not path:
+        return None
+    max_age = timedelta(seconds=int(os.environ.get("ISSUE_STORE_MAX_AGE", "300")))
+    return IssueStore(path, max_age)
+
+
+def _cache_from_env() -> IssueCache:
+    """
+    Create the global issue cache, as configured by the environment.
+
+    - ISSUE_CACHE_SIZE: The maximum number of issues (default: 10000)
+    - ISSUE_CACHE_MAX_MB: The maximum estimated size of the issues, in MiB
+      (default: 0, no limit)
+    - ISSUE_CACHE_TTL: How long (in seconds) issues are used without checking
+      the server (default: 0, no limit)
+    - ISSUE_CACHE_POLICY: The eviction policy, "lru" or "lfu" (default: lru)
+    - ISSUE_CACHE_HYDRATE: Whether to fetch the changelog and links of issues
+      along with their fields, "true" or "false" (default: false)
+    - ISSUE_NEGATIVE_TTL: How long (in seconds) issues that can't be retrieved
+      are remembered as such (default: 1800)
+    """
+    ttl = float(os.environ.get("ISSUE_CACHE_TTL", "0"))
+    max_mb = float(os.environ.get("ISSUE_CACHE_MAX_MB", "0"))
+    hydrate = os.environ.get("ISSUE_CACHE_HYDRATE", "false").lower() in ["true", "1"]
+    return IssueCache(
+        int(os.environ.get("ISSUE_CACHE_SIZE", "10000")),
+        policy=make_policy(os.environ.get("ISSUE_CACHE_POLICY", "lru")),
+        ttl=timedelta(seconds=ttl) if ttl > 0 else None,
+        max_bytes=int(max_mb * 2**20) if max_mb > 0 else None,
+        store=_store_from_env(),
+        hydrate=hydrate,
+        negative_ttl=timedelta(
+            seconds=int(os.environ.get("ISSUE_NEGATIVE_TTL", "1800"))
+        ),
+    )
 
 
 # The global cache of issues
-issue_cache = IssueCache(10000)
+issue_cache = _cache_from_env()
+
+# The global index of the issue hierarchy
+hierarchy = HierarchyIndex(os.environ.get("HIERARCHY_INDEX_PATH"))
+atexit.register(hierarchy.save)
+
+
+def _search_page(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    client: Jira,
+    jql: str,
+    fields: List[str],
+    start: int,
+    limit: int,
+    expand: Optional[str] = None,
+) -> dict:
+    """Fetch a single page of results for a JQL query."""
+    return check_response(
+        with_retry(
+            lambda: client.jql(
+                jql,
+                fields=",".join(fields),
+                start=start,
+                limit=limit,
+                expand=expand,
+                validate_query="warn",
+            )
+        )
+    )
 
 
-@measure_function
-def descendants(client: Jira, issue_key: str) -> list[str]:
+def _quote_keys(keys: Iterable[str]) -> str:
     """
-    Get the descendants of an issue.
+    Format issue keys as a list for a JQL `in` clause.
+
+    Examples:
+    >>> _quote_keys(["ABC-1", "ABC-2"])
+    "'ABC-1', 'ABC-2'"
+    """
+    return ", ".join(f"'{key}'" for key in keys)
+
+
+def search_issues(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    client: Jira,
+    jql: str,
+    fields: List[str],
+    expand: Optional[str] = None,
+    page_size: int = _SEARCH_PAGE_SIZE,
+    prefetch: bool = False,
+) -> Iterator[dict[str, Any]]:
+    """
+    Run a JQL query, yielding the payload of each matching issue.
+
+    The results are retrieved a page at a time, following `startAt` until the
+    `total` reported by the server has been reached, so nothing is silently
+    truncated and only one page is held in memory at a time.
 
     Parameters:
-        - client: The Jira client to use for fetching the issues.
-        - issue_key: The key of the issue to get the descendants of.
+        - client: The Jira client to use for the search.
+        - jql: The JQL query.
+        - fields: The fields to retrieve for each issue. Only request what is
+          needed; the key is always returned.
+        - expand: The properties to expand (e.g., "changelog").
+        - page_size: The number of issues to request per page.
+        - prefetch: Fetch the next page in the background while the current
+          one is being processed.
 
     Returns:
-        A list of issue keys that are descendants of the given issue.
+        An iterator over the issue payloads.
     """
-    pending: queue.SimpleQueue[str] = queue.SimpleQueue()
-    pending.put(issue_key)
 
-    desc: list[str] = []
+    def fetch(start: int) -> dict:
+        return _search_page(client, jql, fields, start, page_size, expand)
 
-    while not pending.empty():
-        key = pending.get()
-        result = check_response(
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        result = fetch(0)
+        start = 0
+        while True:
+            page = result.get("issues", [])
+            start += len(page)
+            more = bool(page) and start < result.get("total", 0)
+            pending: Optional[Future[dict]] = None
+            if more and executor is not None:
+                # Run in a copy of our context so the retry deadline applies
+                pending = executor.submit(copy_context().run, fetch, start)
+            yield from page
+            if not more:
+                break
+            result = pending.result() if pending is not None else fetch(start)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_changelog(
+    client: Jira, issue_key: str, start: int = 0
+) -> Iterator[dict[str, Any]]:
+    """
+    Get the changelog of an issue, yielding each history entry.
+
+    Parameters:
+        - client: The Jira client to use.
+        - issue_key: The key of the issue.
+        - start: The number of (oldest) entries to skip. The server API always
+          returns the whole changelog, so callers must be prepared to see the
+          skipped entries anyway.
+
+    Returns:
+        An iterator over the history entries, oldest first.
+    """
+    while True:
+        page = check_response(
             with_retry(
-                lambda: client.jql(
-                    f"'Epic Link' = '{key}' or 'Parent Link' = '{key}'",
-                    limit=200,
-                    fields="key",
+                lambda: client.get_issue_changelog(
+                    issue_key, start=start, limit=_CHANGELOG_PAGE_SIZE
                 )
             )
         )
-        for issue in result["issues"]:
-            issue_key = issue["key"]
-            desc.append(issue_key)
-            pending.put(issue_key)
+        # Jira Cloud returns pages of "values", while the server API returns
+        # all the "histories" at once
+        entries = page.get("values", page.get("histories", []))
+        yield from entries
+        start += len(entries)
+        if not entries or start >= page.get("total", start):
+            break
+
+
+def iter_comments(
+    client: Jira, issue_key: str, newest_first: bool = False
+) -> Iterator[dict[str, Any]]:
+    """
+    Get the comments on an issue, yielding each comment.
+
+    The comments are fetched a page at a time as the iterator is consumed, so
+    stopping early avoids fetching the rest.
+
+    Parameters:
+        - client: The Jira client to use.
+        - issue_key: The key of the issue.
+        - newest_first: Yield the most recent comments first.
+
+    Returns:
+        An iterator over the comments, in order of creation.
+    """
+    url = f"{client.resource_url('issue')}/{issue_key}/comment"
+    order = "-created" if newest_first else "created"
+    start = 0
+    while True:
+        page = check_response(
+            with_retry(
+                lambda: client.get(
+                    url,
+                    params={
+                        "startAt": start,
+                        "maxResults": _COMMENT_PAGE_SIZE,
+                        "orderBy": order,
+                    },
+                )
+            )
+        )
+        comments = page.get("comments", [])
+        yield from comments
+        start += len(comments)
+        if not comments or start >= page.get("total", start):
+            break
+
+
+def _search_keys(
+    client: Jira, keys: List[str], fields: List[str], expand: Optional[str] = None
+) -> Iterator[dict[str, Any]]:
+    """
+    Search for a set of issues by key, yielding the payload of each issue.
+
+    The keys are split into chunks, and each chunk is retrieved via a paginated
+    `key in (...)` query. Keys that don't exist (or that we can't see) are
+    silently skipped.
+    """
+    for i in range(0, len(keys), _KEY_CHUNK_SIZE):
+        chunk = keys[i : i + _KEY_CHUNK_SIZE]
+        yield from search_issues(
+            client, f"key in ({_quote_keys(chunk)})", fields, expand
+        )
+
+
+@measure_function
+def fetch_issues(
+    client: Jira,
+    keys: Iterable[str],
+    store: Optional[IssueStore] = None,
+    hydrate: bool = False,
+    profile: str = "full",
+) -> dict[str, Issue]:
+    """
+    Fetch a set of issues from the server using batched JQL searches.
+
+    The keys are retrieved in chunks via paginated `key in (...)` queries that
+    request the same fields as fetching a single Issue. The results are not
+    cached.
+
+    Parameters:
+        - client: The Jira client to use for fetching the issues.
+        - keys: The keys of the issues to fetch.
+        - store: A persistent store to save the issues into.
+        - hydrate: Also retrieve the changelog and issue links of each issue.
+        - profile: The set of fields to retrieve ("header", "scheduling" or
+          "full"). The remaining fields are fetched when first used.
+
+    Returns:
+        A dictionary mapping each of the requested keys to its Issue. Issues
+        that don't exist or that we're not allowed to see are left out.
+    """
+    wanted = list(dict.fromkeys(keys))
+    issues: dict[str, Issue] = {}
+    fields = _profile_fields(profile, hydrate)
+    expand = "changelog" if hydrate else None
+    for data in _search_keys(client, wanted, fields, expand):
+        _with_requested(data["fields"], fields)
+        issues[data["key"]] = Issue(client, data["key"], data, store)
+    # Issues that have been moved to a different project are returned under
+    # their new key, so those need to be fetched individually.
+    for key in wanted:
+        if key not in issues:
+            try:
+                issues[key] = Issue(
+                    client, key, store=store, hydrate=hydrate, profile=profile
+                )
+            except InaccessibleIssueError as ex:
+                _logger.info("Skipping issue: %s", ex)
+    return {key: issues[key] for key in wanted if key in issues}
+
+
+@measure_function
+def fetch_updated(client: Jira, keys: Iterable[str]) -> dict[str, datetime]:
+    """
+    Fetch the "last updated" time of a set of issues using batched JQL
+    searches.
+
+    Parameters:
+        - client: The Jira client to use for fetching the issues.
+        - keys: The keys of the issues to check.
+
+    Returns:
+        A dictionary mapping issue keys to their last updated time. Issues that
+        no longer exist (or have been moved) are not included.
+    """
+    return {
+        data["key"]: datetime.fromisoformat(data["fields"]["updated"])
+        for data in _search_keys(client, list(dict.fromkeys(keys)), ["updated"])
+    }
+
+
+@dataclass(slots=True)
+class Descendant:
+    """An issue found below another one in the issue hierarchy."""
+
+    key: str
+    """The Jira key of the issue"""
+    parent: Optional[str]
+    """The key of the issue's parent (None if the search didn't tell)"""
+    depth: int
+    """How many levels below the starting issue it is (children are 1)"""
+
+
+@measure_function
+def descendants(  # pylint: disable=too-many-locals
+    client: Jira, issue_key: str
+) -> list[Descendant]:
+    """
+    Get the descendants of an issue.
+
+    The hierarchy is walked one level at a time, finding the children of all
+    the issues at the current level with (chunked) `'Epic Link' in (...) or
+    'Parent Link' in (...) or parent in (...)` queries. The number of searches
+    is therefore proportional to the depth of the tree rather than its size.
+    The results are recorded in the hierarchy index.
+
+    Parameters:
+        - client: The Jira client to use for fetching the issues.
+        - issue_key: The key of the issue to get the descendants of.
+
+    Returns:
+        The descendants of the given issue, in breadth-first order.
+    """
+    desc: list[Descendant] = []
+    children: dict[str, list[str]] = {issue_key: []}
+    frontier = [issue_key]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier: list[str] = []
+        for i in range(0, len(frontier), _PARENT_CHUNK_SIZE):
+            chunk = frontier[i : i + _PARENT_CHUNK_SIZE]
+            parents = _quote_keys(chunk)
+            jql = (
+                f"'Epic Link' in ({parents}) or 'Parent Link' in ({parents})"
+                + f" or parent in ({parents})"
+            )
+            fields = ["parent", CF_EPIC_LINK, CF_PARENT_LINK]
+            for data in search_issues(client, jql, fields):
+                key = data["key"]
+                if key in children:  # Guard against cycles in the links
+                    continue
+                # Same order of preference as Issue.parent. If the link isn't
+                # returned, it can only be known when searching a single parent
+                parent = (
+                    rget(data, "fields", "parent", "key")
+                    or rget(data, "fields", CF_PARENT_LINK)
+                    or rget(data, "fields", CF_EPIC_LINK)
+                    or (chunk[0] if len(chunk) == 1 else None)
+                )
+                if parent is None:
+                    # It's still a descendant, but it can't be placed in the
+                    # hierarchy index
+                    _logger.warning("Unknown parent of descendant %s", key)
+                desc.append(Descendant(key=key, parent=parent, depth=depth))
+                if parent in children:
+                    children[parent].append(key)
+                children[key] = []
+                next_frontier.append(key)
+        frontier = next_frontier
+    for key, keys in children.items():
+        hierarchy.set_children(key, keys)
     return desc
+
+
+def subtree_keys(client: Jira, issue_key: str) -> list[str]:
+    """
+    Get the keys of all the descendants of an issue, using the hierarchy
+    index when it is up to date.
+
+    Parameters:
+        - client: The Jira client to use if the hierarchy must be fetched.
+        - issue_key: The key of the issue.
+
+    Returns:
+        The keys of the descendants, in breadth-first order.
+    """
+    if not hierarchy.is_complete(issue_key):
+        descendants(client, issue_key)
+    return hierarchy.descendants(issue_key)
@@ -0,0 +1,402 @@
+"""Test the Jira issue cache against the fake Jira server."""
+
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any
+
+import pytest
+from atlassian import Jira  # type: ignore
+
+import jiraissues
+from apiclients import make_session
+from cachepolicy import LFUPolicy
+from hierarchy import HierarchyIndex
+from jiraissues import (
+    InaccessibleIssueError,
+    Issue,
+    IssueCache,
+    descendants,
+    iter_changelog,
+    iter_comments,
+    search_issues,
+)
+
+
+class TestIssueCache:
+    """Test the IssueCache."""
+
+    def test_revalidate_related(self, fake_jira, jira):
+        """Test that a child's new status reaches its cached parent."""
+        cache = IssueCache(100)
+
+        def child_status() -> str:
+            epic = cache.get_issue(jira, "TEST-2")
+            return next(rel.status for rel in epic.related if rel.key == "TEST-4")
+
+        before = child_status()
+        status = "Closed" if before != "Closed" else "New"
+        fake_jira.update_issue(
+            "TEST-4", {"status": {"name": status, "statusCategory": {"name": "Done"}}}
+        )
+        # The epic itself hasn't changed
+        cache.revalidate(jira, ["TEST-2"], refresh=True)
+        assert child_status() == before
+        cache.revalidate(jira, ["TEST-2"], refresh=True, related=True)
+        assert child_status() == status
+
+    def test_ttl(self, fake_jira, jira):
+        """Test that issues are fetched again once they outlive the TTL."""
+        cache = IssueCache(100, ttl=timedelta(hours=1))
+        cache.get_issue(jira, "TEST-4")
+        cache.get_issue(jira, "TEST-4")
+        assert fake_jira.stats["issue"] == 1
+        cache.ttl = timedelta(0)
+        cache.get_issue(jira, "TEST-4")
+        assert fake_jira.stats["issue"] == 2
+        assert cache.expirations == 1
+
+    def test_max_bytes(self, jira):
+        """Test that issues are evicted to stay within the memory budget."""
+        cache = IssueCache(100)
+        size = cache.get_issue(jira, "TEST-4").estimated_size
+        cache = IssueCache(100, max_bytes=size * 2)
+        for key in ["TEST-4", "TEST-5", "TEST-6", "TEST-7"]:
+            cache.get_issue(jira, key)
+        assert cache.size_bytes <= size * 2
+        assert cache.evictions == 2
+
+    def test_evictions(self, fake_jira, jira):
+        """Test that the eviction policy picks the issue to drop."""
+        cache = IssueCache(2, policy=LFUPolicy())
+        cache.get_issues(jira, ["TEST-4", "TEST-5"])
+        cache.get_issue(jira, "TEST-4")
+        cache.get_issue(jira, "TEST-6")
+        assert cache.evictions == 1
+        requests = fake_jira.stats["requests"]
+        cache.get_issues(jira, ["TEST-4", "TEST-6"])
+        assert fake_jira.stats["requests"] == requests
+        cache.get_issue(jira, "TEST-5")
+        assert fake_jira.stats["requests"] == requests + 1
+
+    @pytest.mark.parametrize("key,status", [("TEST-4", 403), ("TEST-99", 404)])
+    def test_negative_ttl(self, fake_jira, jira, key, status):
+        """Test that inaccessible issues are remembered for a while."""
+        fake_jira.forbidden.add("TEST-4")
+        cache = IssueCache(100, negative_ttl=timedelta(seconds=0.5))
+        with pytest.raises(InaccessibleIssueError) as error:
+            cache.get_issue(jira, key)
+        assert error.value.status == status
+        requests = fake_jira.stats["requests"]
+        with pytest.raises(InaccessibleIssueError):
+            cache.get_issue(jira, key)
+        assert [i.key for i in cache.get_issues(jira, [key, "TEST-5"])] == ["TEST-5"]
+        assert cache.is_inaccessible(key)
+        assert cache.inaccessible_hits == 2
+        assert fake_jira.stats["requests"] == requests + 1
+        # Once the TTL has passed, the issue is fetched again
+        time.sleep(0.6)
+        fake_jira.forbidden.clear()
+        assert not cache.is_inaccessible(key)
+        if status == 403:
+            assert cache.get_issue(jira, key).key == key
+        else:
+            with pytest.raises(InaccessibleIssueError):
+                cache.get_issue(jira, key)
+        assert fake_jira.stats["requests"] == requests + 2
+
+    def test_from_env(self, monkeypatch):
+        """Test configuring the global cache via the environment."""
+        monkeypatch.setenv("ISSUE_CACHE_SIZE", "50")
+        monkeypatch.setenv("ISSUE_CACHE_MAX_MB", "2")
+        monkeypatch.setenv("ISSUE_CACHE_TTL", "60")
+        monkeypatch.setenv("ISSUE_CACHE_POLICY", "lfu")
+        monkeypatch.setenv("ISSUE_CACHE_HYDRATE", "true")
+        cache = jiraissues._cache_from_env()  # pylint: disable=protected-access
+        assert cache.max_size == 50
+        assert cache.hydrate
+        assert cache.max_bytes == 2 * 2**20
+        assert cache.ttl == timedelta(minutes=1)
+        assert isinstance(cache._policy, LFUPolicy)  # pylint: disable=protected-access
+        for name in [
+            "ISSUE_CACHE_MAX_MB",
+            "ISSUE_CACHE_TTL",
+            "ISSUE_CACHE_POLICY",
+            "ISSUE_CACHE_HYDRATE",
+        ]:
+            monkeypatch.delenv(name)
+        cache = jiraissues._cache_from_env()  # pylint: disable=protected-access
+        assert cache.max_bytes is None and cache.ttl is None
+        assert not cache.hydrate
+
+
+@pytest.mark.parametrize("fake_jira", [{"latency": 0.2}], indirect=True)
+class TestSingleFlight:
+    """Test that concurrent misses in the IssueCache share their fetches."""
+
+    @staticmethod
+    def _together(func: Any, args: list[Any]) -> list[Any]:
+        """Call a function from several threads at once, returning the results."""
+        barrier = threading.Barrier(len(args))
+
+        def call(arg: Any) -> Any:
+            barrier.wait()
+            try:
+                return func(arg)
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                return ex
+
+        with ThreadPoolExecutor(max_workers=len(args)) as executor:
+            return list(executor.map(call, args))
+
+    def test_same_key(self, fake_jira, jira):
+        """Test that concurrent misses on one key make a single request."""
+        cache = IssueCache(100)
+        issues = self._together(lambda key: cache.get_issue(jira, key), ["TEST-4"] * 8)
+        assert all(issue is issues[0] for issue in issues)
+        assert fake_jira.stats["issue"] == 1
+
+    def test_different_keys(self, fake_jira, jira):
+        """Test that misses on different keys are fetched in parallel."""
+        cache = IssueCache(100)
+        keys = ["TEST-4", "TEST-5", "TEST-6", "TEST-7"]
+        start = time.monotonic()
+        issues = self._together(lambda key: cache.get_issue(jira, key), keys)
+        assert [issue.key for issue in issues] == keys
+        assert fake_jira.stats["issue"] == len(keys)
+        assert time.monotonic() - start < len(keys) * fake_jira.latency
+
+    def test_error(self, jira, monkeypatch):
+        """Test that a failed fetch fails all its waiters, and is retried."""
+        cache = IssueCache(100)
+        fetch = jira.issue
+        calls = []
+
+        def failing(*args: Any, **_kwargs: Any) -> Any:
+            calls.append(args)
+            time.sleep(0.2)
+            raise RuntimeError("Boom")
+
+        monkeypatch.setattr(jira, "issue", failing)
+        errors = self._together(lambda key: cache.get_issue(jira, key), ["TEST-4"] * 4)
+        assert len(calls) == 1
+        assert all(isinstance(error, RuntimeError) for error in errors)
+        # Nothing is left waiting on the failed fetch
+        monkeypatch.setattr(jira, "issue", fetch)
+        assert cache.get_issue(jira, "TEST-4").key == "TEST-4"
+
+
+class TestLoadingProfiles:
+    """Test loading issues with a subset of their fields."""
+
+    @pytest.mark.parametrize("name", ["blocked", "assignee", "description"])
+    def test_lazy(self, fake_jira, jira, name):
+        """Test that the rest of the fields are loaded in one extra request."""
+        issue = IssueCache(100).get_issue(jira, "TEST-4", profile="header")
+        assert fake_jira.stats["issue"] == 1
+        assert issue.missing_fields("scheduling")
+        getattr(issue, name)
+        assert fake_jira.stats["issue"] == 2
+        for attribute in ["blocked", "assignee", "description", "status_summary"]:
+            getattr(issue, attribute)
+        issue.comments  # pylint: disable=pointless-statement
+        assert not issue.missing_fields("full")
+        assert fake_jira.stats["issue"] == 2
+
+    def test_not_lazy(self, fake_jira, jira):
+        """Test that other unknown attributes are still errors."""
+        issue = IssueCache(100).get_issue(jira, "TEST-4", profile="header")
+        with pytest.raises(AttributeError):
+            issue.no_such_thing  # pylint: disable=pointless-statement
+        assert not hasattr(issue, "_no_such_thing")
+        assert fake_jira.stats["issue"] == 1
+
+
+class TestBulkLoading:
+    """Test loading sets of issues with batched searches."""
+
+    def test_chunks(self, fake_jira, jira, monkeypatch):
+        """Test that the keys are searched for in chunks."""
+        monkeypatch.setattr(jiraissues, "_KEY_CHUNK_SIZE", 3)
+        keys = [f"TEST-{n}" for n in range(7, 0, -1)]
+        cache = IssueCache(100)
+        assert [issue.key for issue in cache.get_issues(jira, keys)] == keys
+        assert fake_jira.stats["search"] == 3
+        assert fake_jira.stats["requests"] == 3
+        # They're all cached now
+        cache.get_issues(jira, keys)
+        assert fake_jira.stats["requests"] == 3
+
+    def test_moved(self, fake_jira, jira):
+        """Test that moved and missing issues are fetched one at a time."""
+        fake_jira.move_issue("TEST-5", "OTHER-1")
+        issues = IssueCache(100).get_issues(
+            jira, ["TEST-4", "TEST-5", "TEST-99", "TEST-6"]
+        )
+        assert [issue.key for issue in issues] == ["TEST-4", "TEST-5", "TEST-6"]
+        assert issues[1].project_key == "OTHER"
+        assert fake_jira.stats["search"] == 1
+        assert fake_jira.stats["issue"] == 2
+        assert fake_jira.stats["requests"] == 3
+
+
+class TestHydration:
+    """Test fetching the changelog and links of issues along with their fields."""
+
+    def test_single(self, fake_jira, jira):
+        """Test that a hydrated issue is fetched in one request."""
+        issue = IssueCache(100, hydrate=True).get_issue(jira, "TEST-4")
+        assert len(issue.changelog) == len(fake_jira.issues["TEST-4"].histories)
+        assert len(issue.comments) == len(fake_jira.issues["TEST-4"].comments)
+        assert fake_jira.stats["requests"] == 1
+        # Only the children need a search
+        assert {"TEST-1", "TEST-2", "TEST-5"} <= {rel.key for rel in issue.related}
+        assert fake_jira.stats["issue"] == 1
+        assert fake_jira.stats["requests"] == 1 + fake_jira.stats["search"]
+
+    def test_bulk(self, fake_jira, jira):
+        """Test that hydrated issues are fetched in one search."""
+        keys = ["TEST-4", "TEST-5", "TEST-6", "TEST-7"]
+        issues = IssueCache(100, hydrate=True).get_issues(jira, keys)
+        for issue in issues:
+            assert len(issue.changelog) == len(fake_jira.issues[issue.key].histories)
+        assert fake_jira.stats["requests"] == 1
+
+    def test_not_hydrated(self, fake_jira, jira):
+        """Test that the changelog is otherwise fetched when first used."""
+        issue = IssueCache(100).get_issue(jira, "TEST-4")
+        assert fake_jira.stats["requests"] == 1
+        assert len(issue.changelog) == len(fake_jira.issues["TEST-4"].histories)
+        assert fake_jira.stats["requests"] == 2
+
+
+class TestDescendants:
+    """Test walking the issue hierarchy."""
+
+    @pytest.mark.parametrize("chunk_size,searches", [(50, 3), (2, 4), (1, 7)])
+    def test_levels(self, fake_jira, jira, monkeypatch, chunk_size, searches):
+        """Test that each level of the hierarchy is searched in chunks."""
+        monkeypatch.setattr(jiraissues, "_PARENT_CHUNK_SIZE", chunk_size)
+        found = descendants(jira, "TEST-1")
+        assert [(d.key, d.parent, d.depth) for d in found] == [
+            ("TEST-2", "TEST-1", 1),
+            ("TEST-3", "TEST-1", 1),
+            ("TEST-4", "TEST-2", 2),
+            ("TEST-5", "TEST-2", 2),
+            ("TEST-6", "TEST-3", 2),
+            ("TEST-7", "TEST-3", 2),
+        ]
+        # The stories are searched for children too
+        assert fake_jira.stats["search"] == searches
+        assert fake_jira.stats["requests"] == searches
+
+    def test_leaf(self, fake_jira, jira):
+        """Test that an issue without children takes a single search."""
+        assert not descendants(jira, "TEST-4")
+        assert fake_jira.stats["search"] == 1
+
+    def test_unknown_parent(self, monkeypatch):
+        """Test descendants whose parent link isn't returned by the search."""
+        levels = iter(
+            [
+                [{"key": "A-2", "fields": {}}, {"key": "A-3", "fields": {}}],
+                [{"key": "A-4", "fields": {"parent": None}}],
+                [],
+            ]
+        )
+        monkeypatch.setattr(jiraissues, "search_issues", lambda *_: next(levels))
+        monkeypatch.setattr(jiraissues, "hierarchy", HierarchyIndex())
+        found = descendants(None, "A-1")
+        # The children of a single issue are known to be its own
+        assert [(d.key, d.parent, d.depth) for d in found] == [
+            ("A-2", "A-1", 1),
+            ("A-3", "A-1", 1),
+            ("A-4", None, 2),
+        ]
+        assert jiraissues.hierarchy.children("A-1") == ["A-2", "A-3"]
+
+
+class TestPaging:
+    """Test following the pages of searches, changelogs and comments."""
+
+    @pytest.mark.parametrize("prefetch", [False, True])
+    @pytest.mark.parametrize(
+        "page_size,searches", [(1, 7), (3, 3), (6, 2), (7, 1), (100, 1)]
+    )
+    def test_search(self, fake_jira, jira, page_size, searches, prefetch):
+        """Test that every page of the results is fetched, and no more."""
+        found = search_issues(
+            jira, "", ["summary"], page_size=page_size, prefetch=prefetch
+        )
+        assert [data["key"] for data in found] == [f"TEST-{n}" for n in range(1, 8)]
+        assert fake_jira.stats["search"] == searches
+
+    @pytest.mark.parametrize("page_size,requests", [(4, 5), (6, 4), (20, 1)])
+    def test_changelog(self, fake_jira, monkeypatch, page_size, requests):
+        """Test that the changelog is fetched a page at a time from Jira Cloud."""
+        monkeypatch.setattr(jiraissues, "_CHANGELOG_PAGE_SIZE", page_size)
+        cloud = Jira(url=fake_jira.url, token="any", session=make_session(), cloud=True)
+        histories = fake_jira.issues["TEST-5"].histories
+        assert len(histories) == 20
+        entries = list(iter_changelog(cloud, "TEST-5"))
+        assert [entry["id"] for entry in entries] == [h["id"] for h in histories]
+        assert fake_jira.stats["changelog"] == requests
+        # Starting part way through
+        entries = list(iter_changelog(cloud, "TEST-5", start=18))
+        assert [entry["id"] for entry in entries] == [h["id"] for h in histories[18:]]
+
+    def test_server_changelog(self, fake_jira, jira, monkeypatch):
+        """Test that the server API returns the whole changelog at once."""
+        monkeypatch.setattr(jiraissues, "_CHANGELOG_PAGE_SIZE", 4)
+        assert len(list(iter_changelog(jira, "TEST-5"))) == 20
+        assert fake_jira.stats["requests"] == 1
+
+    @pytest.mark.parametrize("page_size,requests", [(2, 4), (3, 3), (8, 1)])
+    def test_comments(self, fake_jira, jira, monkeypatch, page_size, requests):
+        """Test that the comments are fetched a page at a time."""
+        monkeypatch.setattr(jiraissues, "_COMMENT_PAGE_SIZE", page_size)
+        comments = fake_jira.issues["TEST-5"].comments
+        assert len(comments) == 8
+        found = list(iter_comments(jira, "TEST-5", newest_first=True))
+        assert [c["id"] for c in found] == [c["id"] for c in reversed(comments)]
+        assert fake_jira.stats["comment"] == requests
+        # The later pages are only fetched if they're needed
+        next(iter_comments(jira, "TEST-5"))
+        assert fake_jira.stats["comment"] == requests + 1
+
+
+class TestRefresh:
+    """Test bringing an issue up to date in place."""
+
+    def test_incremental(self, fake_jira, jira):
+        """Test that only the new changelog entries and comments are added."""
+        issue = Issue(jira, "TEST-5")
+        changelog = issue.changelog
+        comments = issue.comments
+        fake_jira.update_issue("TEST-5", {"labels": ["changed"]})
+        fake_jira.add_comment("TEST-5", "Something new")
+        before = fake_jira.stats.copy()
+        issue.refresh()
+        # The fields and the changelog (both from the issue resource of the
+        # server API), and the newest page of comments
+        assert fake_jira.stats - before == Counter(requests=3, issue=2, comment=1)
+        assert issue.labels == {"changed"}
+        assert len(issue.changelog) == len(changelog) + 1
+        assert all(new is old for new, old in zip(issue.changelog, changelog))
+        assert issue.changelog[-1].changes[0].field == "labels"
+        assert len(issue.comments) == len(comments) + 1
+        assert all(new is old for new, old in zip(issue.comments, comments))
+        assert issue.comments[-1].body == "Something new"
+
+    def test_unchanged(self, fake_jira, jira):
+        """Test that refreshing an unchanged issue adds nothing."""
+        issue = Issue(jira, "TEST-5")
+        changelog = issue.changelog
+        comments = issue.comments
+        before = fake_jira.stats.copy()
+        issue.refresh()
+        assert fake_jira.stats - before == Counter(requests=3, issue=2, comment=1)
+        assert issue.changelog == changelog
+        assert issue.comments == comments
@@ -0,0 +1,227 @@
+"""
+Client-side flow control for API calls.
+
+The RateLimiter is a token bucket: tokens accumulate at a steady rate up to a
+maximum burst size, and each call consumes one token, waiting for it if
+necessary. A limiter is shared by all threads in a process, and it can
+optionally be coordinated across all the processes on a host by keeping the
+bucket's state in a (locked) file.
+
+The CircuitBreaker tracks consecutive failures of a service, and once the
+service appears to be down, fails calls immediately instead of letting each
+caller wait out its own retries.
+"""
+
+import fcntl
+import logging
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+from simplestats import measure_function
+
+_logger = logging.getLogger(__name__)
+
+# The bucket state stored in the lock file: (tokens, timestamp)
+_STATE_FORMAT = "dd"
+_STATE_SIZE = struct.calcsize(_STATE_FORMAT)
+
+
+class RateLimiter:  # pylint: disable=too-few-public-methods
+    """
+    A token bucket rate limiter.
+
+    Examples:
+    >>> limiter = RateLimiter(rate=100, burst=2)
+    >>> limiter.acquire()  # The bucket starts full, so no waiting
+    0.0
+    """
+
+    def __init__(self, rate: float, burst: int = 1, path: Optional[str] = None):
+        """
+        Create a rate limiter.
+
+        Parameters:
+            - rate: The sustained number of calls allowed per second. A rate of
+              zero (or less) disables limiting.
+            - burst: The number of calls that may be made back-to-back after
+              the limiter has been idle.
+            - path: If provided, the bucket state is kept in this file so that
+              all processes using the same path share one limit.
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.path = path
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._last = time.time()
+        self._fd: Optional[int] = None
+        if path is not None:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _refill(self, tokens: float, last: float, now: float) -> float:
+        """Get the number of tokens in the bucket at time `now`."""
+        return min(float(self.burst), tokens + max(now - last, 0) * self.rate)
+
+    def _take(self) -> float:
+        """
+        Try to take a token from the bucket.
+
+        Returns:
+            0 if a token was taken, otherwise the time to wait before trying
+            again.
+        """
+        with self._lock:
+            if self._fd is None:
+                return self._take_local()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                return self._take_shared(self._fd)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _take_local(self) -> float:
+        now = time.time()
+        self._tokens = self._refill(self._tokens, self._last, now)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _take_shared(self, fd: int) -> float:
+        now = time.time()
+        data = os.pread(fd, _STATE_SIZE, 0)
+        if len(data) == _STATE_SIZE:
+            tokens, last = struct.unpack(_STATE_FORMAT, data)
+            tokens = self._refill(tokens, last, now)
+        else:  # New file; start with a full bucket
+            tokens = float(self.burst)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        os.pwrite(fd, struct.pack(_STATE_FORMAT, tokens, now), 0)
+        return wait
+
+    @measure_function
+    def acquire(self) -> float:
+        """
+        Wait until a call is allowed.
+
+        Returns:
+            The number of seconds spent waiting.
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while (wait := self._take()) > 0:
+            time.sleep(wait)
+            waited += wait
+        if waited > 0:
+            _logger.debug("Rate limited for %.3fs", waited)
+        return waited
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker for calls to a remote service.
+
+    The breaker starts closed, allowing all calls. After `threshold`
+    consecutive failures it opens, and calls are rejected for `reset_after`
+    seconds. After that, a single trial call is let through (half-open): if it
+    succeeds the breaker closes again, and if it fails the breaker re-opens.
+
+    Examples:
+    >>> breaker = CircuitBreaker(threshold=2, reset_after=60)
+    >>> breaker.failure()
+    >>> breaker.check()  # Still closed after one failure
+    False
+    >>> breaker.failure()
+    >>> breaker.check()
+    Traceback (most recent call last):
+    ...
+    ratelimit.CircuitOpenError: Circuit open for another 60s after 2 failures
+    """
+
+    def __init__(self, threshold: int = 5, reset_after: float = 30) -> None:
+        """
+        Create a circuit breaker.
+
+        Parameters:
+            - threshold: The number of consecutive failures that opens the
+              circuit.
+            - reset_after: Seconds to wait after opening before letting a trial
+              call through.
+        """
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        """True if calls are currently being rejected."""
+        with self._lock:
+            return self._opened_at is not None
+
+    def check(self) -> bool:
+        """
+        Check whether a call may proceed.
+
+        Returns:
+            True if the call is the trial call of a half-open circuit, which
+            must then be reported via `success()`, `failure()` or `abandon()`
+
+        Raises:
+            - CircuitOpenError: If the circuit is open.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            remaining = self._opened_at + self.reset_after - time.monotonic()
+            if remaining <= 0 and not self._trial_running:
+                self._trial_running = True  # Half-open: let one call through
+                return True
+            raise CircuitOpenError(
+                f"Circuit open for another {max(remaining, 0):.0f}s"
+                + f" after {self._failures} failures"
+            )
+
+    def success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        with self._lock:
+            if self._opened_at is not None:
+                _logger.warning("Circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def abandon(self) -> None:
+        """
+        Record that the trial call failed without telling whether the service
+        is up (e.g. an unexpected response). The counts are unchanged, but
+        another trial call is let through. Only the trial call (see `check()`)
+        may abandon it.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def failure(self) -> None:
+        """Record a failed call, opening the circuit if there were too many."""
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._failures >= self.threshold:
+                if self._opened_at is None:
+                    _logger.warning("Circuit opened after %d failures", self._failures)
+                self._opened_at = time.monotonic()
@@ -0,0 +1,154 @@
+"""Test the rate limiter."""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import jiraissues
+from ratelimit import CircuitBreaker, CircuitOpenError, RateLimiter
+
+
+class TestRateLimiter:
+    """Test the token bucket rate limiter."""
+
+    @pytest.fixture
+    def lock_file(self, tmp_path) -> str:
+        """A file for sharing the limiter state."""
+        return str(tmp_path / "jira.ratelimit")
+
+    def test_burst_is_not_delayed(self):
+        """Test that a full bucket allows a burst of calls without waiting."""
+        limiter = RateLimiter(rate=1, burst=5)
+        assert sum(limiter.acquire() for _ in range(5)) == 0
+
+    def test_steady_rate(self):
+        """Test that calls beyond the burst are paced at the configured rate."""
+        limiter = RateLimiter(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        # 1 call from the burst + 5 calls at 50 QPS
+        assert time.monotonic() - start >= 5 / 50 * 0.9
+
+    def test_disabled(self):
+        """Test that a rate of zero disables limiting."""
+        limiter = RateLimiter(rate=0, burst=1)
+        assert sum(limiter.acquire() for _ in range(100)) == 0
+
+    def test_shared_limit(self, lock_file):
+        """Test that limiters using the same file share one bucket."""
+        first = RateLimiter(rate=50, burst=2, path=lock_file)
+        second = RateLimiter(rate=50, burst=2, path=lock_file)
+        assert first.acquire() == 0
+        assert second.acquire() == 0
+        # The shared bucket is now empty
+        assert first.acquire() > 0
+
+
+class TestCircuitBreaker:
+    """Test the circuit breaker."""
+
+    @pytest.fixture
+    def breaker(self, monkeypatch) -> CircuitBreaker:
+        """An open breaker, ready for a trial call, used for the Jira calls."""
+        breaker = CircuitBreaker(threshold=1, reset_after=0)
+        breaker.failure()
+        monkeypatch.setattr(jiraissues, "jira_breaker", breaker)
+        monkeypatch.setattr(jiraissues.jira_limiter, "rate", 0)
+        return breaker
+
+    def test_half_open(self, breaker):
+        """Test that only one trial call is let through at a time."""
+        breaker.check()
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+        breaker.success()
+        assert not breaker.is_open
+        breaker.check()
+
+    def test_unexpected_trial_error(self, breaker):
+        """Test that a trial call failing with an unexpected error is retried."""
+
+        def bad_response() -> None:
+            raise json.JSONDecodeError("Expecting value", "<html>", 0)
+
+        with pytest.raises(json.JSONDecodeError):
+            jiraissues.with_retry(bad_response)
+        # The breaker isn't stuck waiting for the trial to finish
+        assert jiraissues.with_retry(lambda: "ok") == "ok"
+        assert not breaker.is_open
+
+    def test_unexpected_error_during_trial(self, breaker):
+        """Test that only the trial call can abandon the trial."""
+        started = {"old": threading.Event(), "trial": threading.Event()}
+        finish = {"old": threading.Event(), "trial": threading.Event()}
+
+        def call(name: str) -> str:
+            started[name].set()
+            assert finish[name].wait(5)
+            if name == "old":
+                raise json.JSONDecodeError("Expecting value", "<html>", 0)
+            return name
+
+        breaker.success()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # A call made before the circuit opened...
+            old = executor.submit(jiraissues.with_retry, lambda: call("old"))
+            assert started["old"].wait(5)
+            breaker.failure()
+            trial = executor.submit(jiraissues.with_retry, lambda: call("trial"))
+            assert started["trial"].wait(5)
+            # ... fails while the trial is running, which it mustn't end
+            finish["old"].set()
+            with pytest.raises(json.JSONDecodeError):
+                old.result()
+            with pytest.raises(CircuitOpenError):
+                breaker.check()
+            finish["trial"].set()
+            assert trial.result() == "trial"
+        assert not breaker.is_open
+
+
+@pytest.mark.parametrize(
+    "fake_jira", [{"throttle_rate": 1.0, "retry_after": 2.5}], indirect=True
+)
+class TestRetry:
+    """Test retrying Jira calls, against a server that throttles them all."""
+
+    @pytest.fixture
+    def sleeps(self, monkeypatch) -> list[float]:
+        """Record the delays between the retries, instead of waiting."""
+        delays: list[float] = []
+        monkeypatch.setattr(jiraissues.time, "sleep", delays.append)
+        monkeypatch.setattr(jiraissues, "jira_breaker", CircuitBreaker())
+        monkeypatch.setattr(jiraissues.jira_limiter, "rate", 0)
+        return delays
+
+    def test_retry_after(self, fake_jira, jira, sleeps, monkeypatch):
+        """Test that the delay requested by the server is honored."""
+
+        def sleep(delay: float) -> None:
+            sleeps.append(delay)
+            fake_jira.throttle_rate = 0
+
+        monkeypatch.setattr(jiraissues.time, "sleep", sleep)
+        issue = jiraissues.with_retry(lambda: jira.issue("TEST-2"))
+        assert issue["key"] == "TEST-2"
+        assert sleeps == [2.5]
+        assert fake_jira.stats["requests"] == 2
+
+    def test_deadline(self, fake_jira, jira, sleeps):
+        """Test that a retry that would pass the deadline fails instead."""
+        with jiraissues.retry_deadline(2):
+            with pytest.raises(requests.exceptions.HTTPError):
+                jiraissues.with_retry(lambda: jira.issue("TEST-2"))
+        assert not sleeps
+        assert fake_jira.stats["requests"] == 1
+        # Without the deadline, the call is retried (up to RETRY_MAX_TRIES)
+        with pytest.raises(requests.exceptions.HTTPError):
+            jiraissues.with_retry(lambda: jira.issue("TEST-2"))
+        assert sleeps == [2.5] * (jiraissues.RETRY_MAX_TRIES - 1)
@@ -4,14 +4,16 @@
 
 import argparse
 import logging
-import os
 import textwrap
 from dataclasses import dataclass, field
+from typing import Optional
 
 from atlassian import Confluence, Jira  # type: ignore
+from sqlalchemy import Engine
 
+from apiclients import confluence_client, jira_client, log_connection_stats
 from cfhelper import CFElement, jiralink
-from jiraissues import Issue, User, descendants, issue_cache
+from jiraissues import InaccessibleIssueError, Issue, User, issue_cache, subtree_keys
 from simplestats import Timer
 from summarizer import (
     get_chat_model,
@@ -137,64 +139,36 @@ def categorize_issues(issues: set[Issue], inactive_days: int) -> dict[str, set[I
     return categorized
 
 
-def main() -> None:  # pylint: disable=too-many-locals,too-many-statements
-    """Main function"""
-    # pylint: disable=duplicate-code
-    parser = argparse.ArgumentParser(description="Generate an issue summary roll-up")
-    parser.add_argument(
-        "--log-level",
-        default="WARNING",
-        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
-        help="Set the logging level",
-    )
-    parser.add_argument(
-        "--inactive-days",
-        type=int,
-        default=14,
-        help="Number of days before an issue is considered inactive",
-    )
-    parser.add_argument(
-        "-p",
-        "--parent",
-        type=str,
-        required=True,
-        help="Title or ID of the parent page",
-    )
-    parser.add_argument(
-        "--db-host",
-        default="localhost",
-        type=str,
-        help="MariaDB host",
-    )
-    parser.add_argument(
-        "--db-port",
-        default=3306,
-        type=int,
-        help="MariaDB port",
-    )
-    parser.add_argument("jira_issue_key", type=str, help="JIRA issue key")
-
-    args = parser.parse_args()
-    logging.basicConfig(level=getattr(logging, str(args.log_level).upper()))
-    issue_key: str = args.jira_issue_key
-    inactive_days: int = args.inactive_days
-    db_host: str = str(args.db_host)
-    db_port: int = int(args.db_port)
+def build_rollup(  # pylint: disable=too-many-locals,too-many-statements
+    jclient: Jira, db: Engine, issue_key: str, inactive_days: int
+) -> Optional[tuple[Issue, CFElement]]:
+    """
+    Build the status page for an initiative from the summaries of its children.
 
-    jclient = Jira(url=os.environ["JIRA_URL"], token=os.environ["JIRA_TOKEN"])
-    cclient = Confluence(
-        os.environ["CONFLUENCE_URL"], token=os.environ["CONFLUENCE_TOKEN"]
-    )
-    db = mariadb_db(host=db_host, port=db_port)
+    Parameters:
+        - jclient: The Jira client
+        - db: The summary database
+        - issue_key: The key of the initiative
+        - inactive_days: Number of days before an issue is considered inactive
 
+    Returns:
+        The initiative and its page, or None if the initiative can't be
+        accessed
+    """
     # Get the existing summaries from the Jira issues
     stime = Timer("Collect")
     stime.start()
     logging.info("Collecting issue summaries for children of %s", issue_key)
     child_inputs: list[IssueSummary] = []
-    initiative = issue_cache.get_issue(jclient, issue_key)
-    for child in initiative.children:
-        issue = issue_cache.get_issue(jclient, child.key)
+    try:
+        initiative = issue_cache.get_issue(jclient, issue_key)
+    except InaccessibleIssueError as ex:
+        logging.error("Unable to roll up: %s", ex)
+        return None
+    # Children that we can't see are left out
+    for issue in issue_cache.get_issues(
+        jclient, [child.key for child in initiative.children]
+    ):
         if not is_active(issue, inactive_days, True):
             logging.info("Skipping inactive issue %s", issue.key)
             continue
@@ -273,9 +247,9 @@ Please provide just the summary paragraph, with no header.
             page.add(element_contrib_list("All contributors", item.contributors))
 
         # Create counts for all descendant issues of the current epic issue
-        desc_keys = descendants(jclient, issue.key)
+        desc_keys = subtree_keys(jclient, issue.key)
         cats = categorize_issues(
-            {issue_cache.get_issue(jclient, key) for key in desc_keys},
+            set(issue_cache.get_issues(jclient, desc_keys)),
             inactive_days,
         )
         d_tag = CFElement("p", content=CFElement("b", content="Sub-issues: "))
@@ -290,10 +264,68 @@ Please provide just the summary paragraph, with no header.
         d_tag.add(f" — Total {len(desc_keys)}")
         page.add(d_tag)
 
+    return initiative, page
+
+
+def main() -> None:  # pylint: disable=too-many-locals,too-many-statements
+    """Main function"""
+    # pylint: disable=duplicate-code
+    parser = argparse.ArgumentParser(description="Generate an issue summary roll-up")
+    parser.add_argument(
+        "--log-level",
+        default="WARNING",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="Set the logging level",
+    )
+    parser.add_argument(
+        "--inactive-days",
+        type=int,
+        default=14,
+        help="Number of days before an issue is considered inactive",
+    )
+    parser.add_argument(
+        "-p",
+        "--parent",
+        type=str,
+        required=True,
+        help="Title or ID of the parent page",
+    )
+    parser.add_argument(
+        "--db-host",
+        default="localhost",
+        type=str,
+        help="MariaDB host",
+    )
+    parser.add_argument(
+        "--db-port",
+        default=3306,
+        type=int,
+        help="MariaDB port",
+    )
+    parser.add_argument("jira_issue_key", type=str, help="JIRA issue key")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, str(args.log_level).upper()))
+    issue_key: str = args.jira_issue_key
+    inactive_days: int = args.inactive_days
+    db_host: str = str(args.db_host)
+    db_port: int = int(args.db_port)
+
+    jclient = jira_client()
+    cclient = confluence_client()
+    db = mariadb_db(host=db_host, port=db_port)
+
+    result = build_rollup(jclient, db, issue_key, inactive_days)
+    if result is None:
+        return
+    initiative, page = result
+
     # Post the page to Confluence
     parent_page_id = lookup_page(cclient, args.parent)
     page_title = f"Initiative status: {initiative.key} - {initiative.summary}"
     cclient.update_or_create(parent_page_id, page_title, page.unwrap())
+    log_connection_stats("Jira", jclient)
+    log_connection_stats("Confluence", cclient)
 
 
 if __name__ == "__main__":
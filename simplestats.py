@@ -1,12 +1,12 @@
 """Collect some simple performance statistics"""
 
 import atexit
+import sys
 import threading
 import time
 from copy import copy
 from dataclasses import dataclass
-from sys import stderr
-from typing import Callable, ParamSpec, TextIO, TypeVar
+from typing import Callable, Optional, ParamSpec, TextIO, TypeVar
 
 _lock = threading.Lock()
 
@@ -30,6 +30,14 @@ class Timer:
         # code to time
         t.stop()
         ```
+
+    - Counting the work done (e.g., tokens processed) along with the time:
+
+        ```python
+        with Timer("my code") as t:
+            # code to time
+            t.add_units(tokens)
+        ```
     """
 
     @dataclass
@@ -39,6 +47,7 @@ class Timer:
         name: str
         count: int = 0
         elapsed_ns: int = 0
+        units: int = 0
 
     # Database of all timer statistics
     _db: dict[str, Stats] = {}
@@ -50,22 +59,29 @@ class Timer:
             cls._db.clear()
 
     @classmethod
-    def dump(cls, out: TextIO = stderr) -> None:
-        """Dump the timer statistics"""
+    def dump(cls, out: Optional[TextIO] = None) -> None:
+        """Dump the timer statistics (default: to stderr)"""
+        out = out or sys.stderr
         with _lock:
             if not cls._db:
                 return  # No timers have been used
             name_size = max(len(t.name) for t in cls._db.values()) + 1
+            with_units = any(t.units for t in cls._db.values())
             header = f"{'Name':<{name_size}} {'Count':>8} {'Avg':>8}  {'Total':>10}"
+            if with_units:
+                header += f"  {'Units':>10} {'Units/s':>10}"
             print(header, file=out)
             print("-" * len(header), file=out)
             for t in cls._db.values():
                 elapsed_s = t.elapsed_ns / 1000000000
-                print(
+                line = (
                     f"{t.name+":":<{name_size}} {t.count:>8}"
-                    + f" {elapsed_s/t.count:>8.3f}s {elapsed_s:>10.3f}s",
-                    file=out,
+                    + f" {elapsed_s/t.count:>8.3f}s {elapsed_s:>10.3f}s"
                 )
+                if t.units:
+                    rate = t.units / elapsed_s if elapsed_s else 0
+                    line += f"  {t.units:>10} {rate:>10.1f}"
+                print(line, file=out)
 
     @classmethod
     def stats(cls, name: str) -> Stats:
@@ -79,12 +95,14 @@ class Timer:
             stats = Timer._db.get(self.name) or Timer.Stats(self.name)
             stats.count += 1
             stats.elapsed_ns += self.elapsed_ns
+            stats.units += self.units
             Timer._db[self.name] = stats
 
     def __init__(self, name: str, autostart: bool = False):
         self.name = name
         self._start = None
         self.elapsed_ns = 0
+        self.units = 0
         if autostart:
             self.start()
 
@@ -100,6 +118,10 @@ class Timer:
             self._start = None
             self._save()
 
+    def add_units(self, units: int) -> None:
+        """Count some work (e.g., tokens) done while timing"""
+        self.units += units
+
     def __enter__(self):
         self.start()
         return self
@@ -11,7 +11,7 @@ import sys
 from logging.config import dictConfig
 from sys import argv
 
-from atlassian import Jira  # type: ignore
+import requests
 from flask import Flask, request
 from flask_jwt_extended import (
     JWTManager,
@@ -23,10 +23,16 @@ from flask_jwt_extended import (
 from sqlalchemy import Engine
 
 import summarizer
-from jiraissues import Issue, issue_cache
+from apiclients import jira_client
+from jiraissues import InaccessibleIssueError, Issue, issue_cache, retry_deadline
+from ratelimit import CircuitOpenError
 from simplestats import Timer
 from summary_dbi import db_stats, mariadb_db, mark_stale, memory_db
 
+# Maximum time to spend retrying Jira calls while handling a single request,
+# in seconds
+_JIRA_REQUEST_DEADLINE = 45
+
 
 def _issue_word_count(issue: Issue, db: Engine) -> int:
     """
@@ -59,7 +65,7 @@ def _word_count(text: str) -> int:
 
 def create_app(skip_db: bool = False) -> Flask:
     """Create the Flask app"""
-    client = Jira(url=os.environ["JIRA_URL"], token=os.environ["JIRA_TOKEN"])
+    client = jira_client()
     if not skip_db:
         db = mariadb_db(
             host=os.environ.get("MARIADB_HOST", "localhost"),
@@ -109,15 +115,29 @@ def create_app(skip_db: bool = False) -> Flask:
 
         app.logger.info("/api/v1/summarize-issue: %s", key)
 
-        issue_cache.clear()
-
-        issue = Issue(client, key)
-        issue_words = _issue_word_count(issue, db)
-        summary = summarizer.get_or_update_summary(issue, db)
+        try:
+            # Bound the time we're willing to wait on Jira for the request
+            with retry_deadline(_JIRA_REQUEST_DEADLINE):
+                # Only refetch the issue if it has changed since it was cached,
+                # and then only what has changed. Its related issues can change
+                # without it, so they are always fetched again.
+                issue_cache.revalidate(client, [key], refresh=True, related=True)
+                issue = issue_cache.get_issue(client, key)
+                issue_words = _issue_word_count(issue, db)
+                summary = summarizer.get_or_update_summary(issue, db)
+        except InaccessibleIssueError as ex:
+            app.logger.info("%s", ex)
+            return {"error": f"Issue {key} does not exist or is not accessible"}, 404
+        except CircuitOpenError as ex:
+            app.logger.warning("Jira unavailable: %s", ex)
+            return {"error": "Jira is unavailable, try again later"}, 503
+        except requests.exceptions.RequestException as ex:
+            app.logger.warning("Jira request failed: %s", ex)
+            return {"error": f"Unable to retrieve {key} from Jira"}, 502
         req.stop()
         getissue_stats = Timer.stats("IssueCache.get_issue")
         fetchrelated_stats = Timer.stats("Issue._fetch_related")
-        llm_stats = Timer.stats("RetryingLCI.invoke")
+        llm_stats = Timer.stats(summarizer.LLM_TIMER)
         return {
             "key": key,
             # Convert the summary into a single line, removing newlines and extra spaces
@@ -128,6 +148,7 @@ def create_app(skip_db: bool = False) -> Flask:
                 "getissue_time": getissue_stats.elapsed_ns / 1000000000,
                 "llm_time": llm_stats.elapsed_ns / 1000000000,
                 "request_time": req.elapsed_ns / 1000000000,
+                "jira_requests": Timer.stats("Jira.request").count,
                 "issue_words": issue_words,
                 "summary_words": _word_count(summary),
             },
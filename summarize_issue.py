@@ -4,11 +4,9 @@
 
 import argparse
 import logging
-import os
 
-from atlassian import Jira  # type: ignore
-
-from jiraissues import Issue
+from apiclients import jira_client
+from jiraissues import InaccessibleIssueError, Issue
 from simplestats import Timer
 from summarizer import get_or_update_summary, summarize_issue
 from summary_dbi import mariadb_db
@@ -40,9 +38,13 @@ def main() -> None:
     )
     prompt_only = args.prompt_only
 
-    jira = Jira(url=os.environ["JIRA_URL"], token=os.environ["JIRA_TOKEN"])
+    jira = jira_client()
 
-    issue = Issue(jira, args.jira_issue_key)
+    try:
+        issue = Issue(jira, args.jira_issue_key)
+    except InaccessibleIssueError as ex:
+        logging.error("%s", ex)
+        return
     db = mariadb_db()
     if prompt_only:
         prompt_txt = summarize_issue(
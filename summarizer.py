@@ -1,10 +1,13 @@
 """Module code to handle summarization of Jira issues."""
 
+import hashlib
 import io
 import logging
 import os
 import textwrap
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
+from itertools import islice
 from typing import Any, List, Optional, Union
 
 import genai.exceptions
@@ -23,17 +26,25 @@ from langchain_core.runnables import RunnableConfig
 from sqlalchemy import Engine
 
 import text_wrapper
+from fakellm import FakeLLM, fake_token_count
 from jiraissues import (
+    InaccessibleIssueError,
     Issue,
     User,
-    check_response,
-    descendants,
     get_self,
     issue_cache,
-    with_retry,
+    search_issues,
+    subtree_keys,
+)
+from simplestats import Timer, measure_function
+from summary_dbi import (
+    get_input_hashes,
+    get_summaries,
+    get_summary,
+    mark_fresh,
+    mark_stale_many,
+    update_summary,
 )
-from simplestats import measure_function
-from summary_dbi import get_summary, mark_stale, update_summary
 
 _logger = logging.getLogger(__name__)
 
@@ -45,6 +56,13 @@ _logger = logging.getLogger(__name__)
 # _MODEL_ID = "ibm-mistralai/merlinite-7b"
 _MODEL_ID = "mistralai/mixtral-8x7b-instruct-v01"
 
+# The model backend to use: "genai" for IBM's GenAI, or "fake" for a local
+# stand-in that simulates the model's speed (see fakellm.py).
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "genai")
+
+# The Timer that counts the calls to the model (including retries)
+LLM_TIMER = "LLM.invoke"
+
 # The marker that indicates the start of the AI summary.
 SUMMARY_START_MARKER = "=== AI SUMMARY START ==="
 # The marker that indicates the end of the AI summary.
@@ -80,11 +98,110 @@ def get_or_update_summary(
     """
     summary = get_summary(summary_db, issue.key, stale_ok)
     if not summary:
-        summary = summarize_issue(issue, summary_db)
-        update_summary(summary_db, issue.key, summary, issue.parent)
+        result = refresh_summary(issue, summary_db)
+        if result.changed:
+            update_summary(
+                summary_db, issue.key, result.summary, issue.parent, result.input_hash
+            )
+        summary = result.summary
     return summary
 
 
+@dataclass(slots=True, frozen=True)
+class Refreshed:
+    """The outcome of refreshing the summary of an issue."""
+
+    summary: str
+    """The summary text."""
+    input_hash: str
+    """The fingerprint of the inputs the summary was generated from."""
+    changed: bool
+    """Whether a new summary was generated, rather than the stored one kept."""
+
+
+# The length of each half of an input fingerprint, in hex digits
+_HALF_HASH_LEN = 32
+
+
+def input_hash(prompt: str, core: Optional[str] = None) -> str:
+    """
+    Compute the fingerprint of the inputs of a summary: the model and the
+    prompt it is given.
+
+    The first half of the fingerprint covers the core of the prompt: the
+    prompt without the summaries of the issue's parent and linked issues. The
+    second half covers the exact prompt.
+
+    Parameters:
+        - prompt: The prompt for the model
+        - core: The core of the prompt (default: the whole prompt)
+
+    Returns:
+        The fingerprint, as 64 hex digits
+
+    Examples:
+    >>> len(input_hash("Summarize this"))
+    64
+    >>> input_hash("Summarize this") == input_hash("Summarize that")
+    False
+    >>> same_core = input_hash("Summarize that", core="Summarize")
+    >>> input_hash("Summarize this", core="Summarize")[:32] == same_core[:32]
+    True
+    """
+
+    def digest(text: str) -> str:
+        hasher = hashlib.sha256(f"{LLM_BACKEND}:{_MODEL_ID}\n".encode())
+        hasher.update(text.encode())
+        return hasher.hexdigest()[:_HALF_HASH_LEN]
+
+    return digest(prompt if core is None else core) + digest(prompt)
+
+
+@measure_function
+def refresh_summary(issue: Issue, summary_db: Engine) -> Refreshed:
+    """
+    Regenerate the summary of a Jira issue, unless its inputs are unchanged.
+
+    Many updates to an issue (labels, links, our own Status Summary) don't
+    change what the model is given. If the prompt is the same as when the
+    stored summary was generated, that summary is marked as current instead
+    of calling the model again. Otherwise, the caller is expected to store the
+    new summary along with its input fingerprint.
+
+    The summaries of the parent and the linked issues are part of the prompt,
+    but a change to them alone doesn't regenerate the summary. They change
+    whenever those issues are regenerated, and their prompts quote this
+    summary in turn, so the prompts of related issues would hardly ever be the
+    same twice. As with the invalidation (only the children's summaries make
+    a summary stale), they are brought up to date the next time the issue's
+    own inputs or its children's summaries change.
+
+    Parameters:
+        - issue: The issue to summarize
+        - summary_db: The database of summaries
+
+    Returns:
+        The summary and whether it is a new one
+    """
+    prompt, fingerprint = _build_prompt(issue, summary_db)
+    stored = get_input_hashes(summary_db, [issue.key]).get(issue.key)
+    if stored is not None and stored[:_HALF_HASH_LEN] == fingerprint[:_HALF_HASH_LEN]:
+        summary = get_summary(summary_db, issue.key, stale_ok=True)
+        if summary is not None:
+            if stored == fingerprint:
+                _logger.info(
+                    "Inputs of %s are unchanged, keeping its summary", issue.key
+                )
+            else:
+                _logger.info(
+                    "Only the related summaries of %s changed, keeping its summary",
+                    issue.key,
+                )
+            mark_fresh(summary_db, [issue.key])
+            return Refreshed(summary, stored, False)
+    return Refreshed(_generate(issue, prompt), fingerprint, True)
+
+
 @measure_function
 def summarize_issue(
     issue: Issue,
@@ -103,7 +220,24 @@ def summarize_issue(
     Returns:
         A string containing the summary (or the prompt)
     """
+    llm_prompt, _ = _build_prompt(issue, summary_db)
+    if return_prompt_only:
+        return llm_prompt
+    return _generate(issue, llm_prompt)
+
+
+def _build_prompt(issue: Issue, summary_db: Optional[Engine]) -> tuple[str, str]:
+    """
+    Render the prompt for summarizing a Jira issue.
 
+    Parameters:
+        - issue: The issue to summarize
+        - summary_db: The database to use for retrieving summaries of related
+          issues
+
+    Returns:
+        The prompt, and the fingerprint of the inputs it was rendered from
+    """
     _logger.info("Summarizing: %s", issue)
 
     # Handle the blockers
@@ -131,31 +265,50 @@ def summarize_issue(
         )
 
     related_block = io.StringIO()
+    # The prompt without the summaries of the parent and the linked issues,
+    # for the fingerprint (see refresh_summary)
+    core_block = io.StringIO()
+    related_summaries: dict[str, str] = {}
+    if summary_db is not None:
+        related_summaries = get_summaries(
+            summary_db, [related.key for related in issue.related]
+        )
+        # If we don't have a summary for a child issue, queue it up to be
+        # summarized
+        mark_stale_many(
+            summary_db,
+            [
+                related.key
+                for related in issue.related
+                if related.is_child
+                and not related_summaries.get(related.key)
+                and not issue_cache.is_inaccessible(related.key)
+            ],
+            add_ok=True,
+        )
     for related in issue.related:
-        summary = None
-        if summary_db is not None:
-            summary = get_summary(summary_db, related.key)
-            if not summary and related.is_child:
-                # If we don't have a summary for a child issue, queue it up to
-                # be summarized
-                mark_stale(summary_db, related.key, add_ok=True)
+        summary = related_summaries.get(related.key)
         # Fix up the "how" wording
         how = related.how
         if how == "Parent Link":
             how = "is a child of"
         if how == "Epic Link":
             how = "is a child of"
-        related_block.write(
-            f'* {issue.key}, {how} "{related.key}: {
-                related.summary} ({related.status}/{related.resolution})"\n'
-        )
+        line = f'* {issue.key}, {how} "{related.key}: {
+            related.summary} ({related.status}/{related.resolution})"\n'
+        related_block.write(line)
+        core_block.write(line)
         if summary is not None:
-            related_block.write(
+            text = (
                 textwrap.fill(summary, initial_indent="  ", subsequent_indent="  ")
+                + "\n"
             )
-            related_block.write("\n")
+            related_block.write(text)
+            if related.is_child:
+                core_block.write(text)
 
-    full_description = f"""\
+    def render(related_text: str) -> str:
+        full_description = f"""\
 Title: {issue.key} - {issue.summary}
 Status/Resolution: {issue.status}/{issue.resolution}
 {blocker_block.getvalue()}
@@ -167,10 +320,10 @@ Status/Resolution: {issue.status}/{issue.resolution}
 {comment_block.getvalue()}
 
 === Related Issues ===
-{related_block.getvalue()}
+{related_text}
 """
 
-    llm_prompt = f"""\
+        return f"""\
 {_prompt_for_type(issue)}
 
 ```
@@ -179,14 +332,19 @@ Status/Resolution: {issue.status}/{issue.resolution}
 
 Please provide your summary below, in paragraph form, with no formatting:
 """
-    if return_prompt_only:
-        return llm_prompt
 
+    llm_prompt = render(related_block.getvalue())
+    return llm_prompt, input_hash(llm_prompt, render(core_block.getvalue()))
+
+
+def _generate(issue: Issue, llm_prompt: str) -> str:
+    """Have the model summarize an issue from its prompt."""
     _logger.info("Summarizing %s via LLM", issue.key)
     _logger.debug("Prompt:\n%s", llm_prompt)
 
     chat = get_chat_model()
-    summary = chat.invoke(llm_prompt, stop=["<|endoftext|>"]).strip()
+    with Timer(LLM_TIMER):
+        summary = chat.invoke(llm_prompt, stop=["<|endoftext|>"]).strip()
     return summary
 
 
@@ -311,8 +469,11 @@ def is_summary_current(issue: Issue) -> bool:
             last_update.isoformat(),
         )
         return False
-    for child in issue.children:
-        child_issue = issue_cache.get_issue(issue.client, child.key)
+    # Only the update times of the children are needed
+    children = issue_cache.get_issues(
+        issue.client, [child.key for child in issue.children], profile="header"
+    )
+    for child_issue in children:
         if child_issue.updated > last_update:
             # A child issue has been updated since we last updated the summary
             _logger.debug(
@@ -383,8 +544,13 @@ def get_chat_model(model_name: str = _MODEL_ID, max_new_tokens=4000) -> LLM:
 
     This function creates a chat model using the IBM GenAI API, and requires the
     API endpoint (GENAI_API) and API key (GENAI_KEY) to be present via
-    environment variables.
+    environment variables. With LLM_BACKEND set to "fake", a local stand-in is
+    returned instead (configured as described in `FakeLLM.from_env`).
     """
+    if LLM_BACKEND == "fake":
+        return FakeLLM.from_env(max_new_tokens=max_new_tokens)
+    if LLM_BACKEND != "genai":
+        raise ValueError(f"Unknown LLM_BACKEND: {LLM_BACKEND}")
     # https://ibm.github.io/ibm-generative-ai/v2.3.0/rst_source/examples.extensions.langchain.langchain_chat_stream.html
     client = _genai_client()
 
@@ -432,25 +598,22 @@ def get_issues_to_summarize(
     # user, so we need to convert
     user_zi = get_self(client).tzinfo
     since_string = since.astimezone(user_zi).strftime("%Y-%m-%d %H:%M")
-    updated_issues = check_response(
-        with_retry(
-            lambda: client.jql(
-                f"labels = '{SUMMARY_ALLOWED_LABEL}' and updated >= '{
-                    since_string}' ORDER BY updated ASC",  # pylint: disable=line-too-long
-                limit=limit,
-                fields="key,updated",
-            )
-        )
+    jql = (
+        f"labels = '{SUMMARY_ALLOWED_LABEL}' and updated >= '{since_string}'"
+        + " ORDER BY updated ASC"
     )
-    keys: List[str] = [issue["key"] for issue in updated_issues["issues"]]
+    updated_issues = search_issues(client, jql, ["key", "updated"], page_size=limit)
+    keys: List[str] = [issue["key"] for issue in islice(updated_issues, limit)]
     # Filter out any issues that are not in the allowed projects
     filtered_keys = []
     most_recent = since
-    issue_cache.clear()  # Clear the cache to ensure we have the latest data
-    for key in keys:
-        issue = issue_cache.get_issue(client, key)
+    # Make sure we have the latest data, while keeping the unchanged issues.
+    # The related issues are fetched again, since their statuses and any new
+    # children don't change the issues' own update times.
+    issue_cache.revalidate(client, refresh=True, related=True)
+    for issue in issue_cache.get_issues(client, keys, profile="header"):
         if is_ok_to_post_summary(issue):
-            filtered_keys.append(key)
+            filtered_keys.append(issue.key)
             most_recent = max(most_recent, issue.updated)
     keys = filtered_keys
 
@@ -464,6 +627,7 @@ def get_issues_to_summarize(
     # Given the updated issues, we also need to propagate the summaries up the
     # hierarchy. We first need to add the parent issues of all the updated
     # issues to the list of issues to summarize.
+    _prefetch_parents(client, keys)
     all_keys = keys.copy()
     for key in keys:
         parents = issue_cache.get_issue(client, key).all_parents
@@ -471,14 +635,20 @@ def get_issues_to_summarize(
         # summarize, but only if they are marked for summarization.
         for parent in parents:
             if parent not in all_keys:
-                issue = issue_cache.get_issue(client, parent)
+                try:
+                    issue = issue_cache.get_issue(client, parent, profile="header")
+                except InaccessibleIssueError:
+                    break
                 if is_ok_to_post_summary(issue):
                     all_keys.append(parent)
                 else:
                     break
     # Sort the keys by level so that we summarize the children before the
     # parents, making the updated summaries available to the parents.
-    keys = sorted(set(all_keys), key=lambda x: issue_cache.get_issue(client, x).level)
+    keys = sorted(
+        set(all_keys),
+        key=lambda x: issue_cache.get_issue(client, x, profile="header").level,
+    )
     _logger.info(
         "Total keys: %d, most recent modification: %s",
         len(keys),
@@ -487,6 +657,28 @@ def get_issues_to_summarize(
     return (keys, most_recent)
 
 
+def _prefetch_parents(client: Jira, keys: List[str]) -> None:
+    """
+    Load the parent chains of the given issues into the issue cache.
+
+    The parents are fetched in bulk, one level of the hierarchy at a time.
+
+    Parameters:
+        - client: The Jira client to use
+        - keys: The keys of the issues whose parents should be loaded
+    """
+    seen = set(keys)
+    level = keys
+    while level:
+        parents = {
+            issue.parent
+            for issue in issue_cache.get_issues(client, level, profile="header")
+            if issue.parent is not None and issue.parent not in seen
+        }
+        seen.update(parents)
+        level = list(parents)
+
+
 @measure_function
 def count_tokens(text: Union[str, list[str]]) -> int:
     """
@@ -500,6 +692,8 @@ def count_tokens(text: Union[str, list[str]]) -> int:
     Returns:
         The number of tokens in the text
     """
+    if LLM_BACKEND == "fake":
+        return fake_token_count(text)
     client = _genai_client()
     response = client.text.tokenization.create(
         model_id=_MODEL_ID,
@@ -557,10 +751,9 @@ def add_summary_label_to_descendants(client: Jira, issue_key: str) -> None:
         - client: The Jira client to use
         - issue_key: The key of the issue to add the label to
     """
-    desc = descendants(client, issue_key)
+    desc = subtree_keys(client, issue_key)
     desc.append(issue_key)
-    for key in desc:
-        issue = issue_cache.get_issue(client, key)
+    for issue in issue_cache.get_issues(client, desc):
         add_summary_label(issue)
 
 
@@ -583,15 +776,11 @@ def rollup_contributors(
         The set of contributors
     """
     contributors: set[User] = set()
-    for child in issue.children:
-        child_issue = issue_cache.get_issue(issue.client, child.key)
-        contributors.update(
-            rollup_contributors(child_issue, include_assignee, active_days)
-        )
-    if active_days == 0 or is_active(issue, active_days):
-        contributors.update(issue.contributors)
-        if include_assignee and issue.assignee is not None:
-            contributors.add(issue.assignee)
+    for item in [issue, *_subtree(issue)]:
+        if active_days == 0 or is_active(item, active_days):
+            contributors.update(item.contributors)
+            if include_assignee and item.assignee is not None:
+                contributors.add(item.assignee)
     return contributors
 
 
@@ -627,10 +816,8 @@ def is_active(issue: Issue, within_days: int, recursive: bool = False) -> bool:
                 )
                 return True
     if recursive:
-        for child in issue.children:
-            if is_active(
-                issue_cache.get_issue(issue.client, child.key), within_days, recursive
-            ):
+        for child in _subtree(issue):
+            if is_active(child, within_days):
                 _logger.debug(
                     "Issue %s is active; because %s is active", issue.key, child.key
                 )
@@ -651,11 +838,26 @@ def active_children(issue: Issue, within_days: int, recursive: bool) -> set[Issu
     Returns:
         The set of active child issues
     """
-    active = set()
-    for child in issue.children:
-        child_issue = issue_cache.get_issue(issue.client, child.key)
-        if is_active(child_issue, within_days):
-            active.add(child_issue)
-        if recursive:
-            active.update(active_children(child_issue, within_days, recursive))
-    return active
+    if recursive:
+        children = _subtree(issue)
+    else:
+        children = issue_cache.get_issues(
+            issue.client, [child.key for child in issue.children]
+        )
+    return {child for child in children if is_active(child, within_days)}
+
+
+def _subtree(issue: Issue) -> List[Issue]:
+    """
+    Get all the issues below an issue in the hierarchy.
+
+    The hierarchy comes from the local index (walking it via the API only if
+    it is out of date), and the issues are then loaded in bulk.
+
+    Parameters:
+        - issue: The issue at the top of the subtree
+
+    Returns:
+        The descendants of the issue
+    """
+    return issue_cache.get_issues(issue.client, subtree_keys(issue.client, issue.key))
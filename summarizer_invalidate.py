@@ -2,17 +2,64 @@
 
 import argparse
 import logging
-import os
 from datetime import UTC, datetime, timedelta
 from time import sleep
 
+import requests
 from atlassian import Jira  # type: ignore
+from sqlalchemy import Engine
 
-from jiraissues import check_response, get_self, with_retry
-from summary_dbi import mariadb_db, mark_stale
+from apiclients import jira_client
+from jiraissues import get_self, search_issues
+from ratelimit import CircuitOpenError
+from summary_dbi import mariadb_db, mark_stale_many
 
 
-def main() -> None:  # pylint: disable=too-many-locals
+def invalidate_updated(
+    jira: Jira, db: Engine, since: datetime, until: datetime, ancestors: bool = False
+) -> int:
+    """
+    Mark the summaries of the issues updated in a time window as stale.
+
+    Parameters:
+        - jira: The Jira client
+        - db: The summary database
+        - since: The start of the window
+        - until: The end of the window (exclusive)
+        - ancestors: Whether to also mark the summaries of all their ancestors
+          as stale
+
+    Returns:
+        The number of issues updated in the window
+    """
+    # The times in the query are in the user's timezone
+    user_tz = get_self(jira).tzinfo
+    until_string = until.astimezone(user_tz).strftime("%Y-%m-%d %H:%M")
+    since_string = since.astimezone(user_tz).strftime("%Y-%m-%d %H:%M")
+    keys = [
+        issue["key"]
+        for issue in search_issues(
+            jira,
+            f"updated >= '{since_string}' AND updated < '{until_string}'"
+            + " ORDER BY updated DESC",
+            ["key"],
+            prefetch=True,
+        )
+    ]
+    marked = mark_stale_many(db, keys, add_ok=False, ancestors=ancestors)
+    for key in keys:
+        if key in marked:
+            logging.info("Marked %s as stale", key)
+    logging.info(
+        "Found %d issues updated between %s and %s",
+        len(keys),
+        since_string,
+        until_string,
+    )
+    return len(keys)
+
+
+def main() -> None:
     """Main function"""
     parser = argparse.ArgumentParser(
         description="Watch the Jira API and invalidate summaries when issues are updated"
@@ -36,6 +83,11 @@ def main() -> None:  # pylint: disable=too-many-locals
         type=int,
         help="MariaDB port",
     )
+    parser.add_argument(
+        "--ancestors",
+        action="store_true",
+        help="Also invalidate the summaries of all the ancestors of updated issues",
+    )
 
     args = parser.parse_args()
     logging.basicConfig(
@@ -47,39 +99,22 @@ def main() -> None:  # pylint: disable=too-many-locals
     db_port = int(args.db_port)
 
     db = mariadb_db(host=db_host, port=db_port)
-    jira = Jira(url=os.environ["JIRA_URL"], token=os.environ["JIRA_TOKEN"])
-    user_tz = get_self(jira).tzinfo
+    jira = jira_client()
 
     # The window must be at least 1 munute due to the granularity of the jql
     # query syntax.
     window = timedelta(minutes=1)
+    since = datetime.now(tz=UTC) - 2 * window
     while True:
         start_time = datetime.now(tz=UTC)
         until = start_time - window
-        until_string = until.astimezone(user_tz).strftime("%Y-%m-%d %H:%M")
-        since = until - window
-        since_string = since.astimezone(user_tz).strftime("%Y-%m-%d %H:%M")
-        issues = check_response(
-            with_retry(
-                lambda: jira.jql(
-                    f"updated >= '{since_string}' AND updated < '{
-                        until_string}' ORDER BY updated DESC",
-                    limit=1000,
-                    fields="key",
-                )
-            )
-        )
-        logging.info(
-            "Found %d issues updated between %s and %s",
-            len(issues["issues"]),
-            since_string,
-            until_string,
-        )
-        for issue in issues["issues"]:
-            key = issue["key"]
-            marked = mark_stale(db, key, add_ok=False)
-            if marked:
-                logging.info("Marked %s as stale", key)
+        try:
+            invalidate_updated(jira, db, since, until, args.ancestors)
+        except (requests.exceptions.RequestException, CircuitOpenError):
+            # Jira is unavailable; keep the window and try it again next time
+            logging.exception("Failed to check the issues updated since %s", since)
+        else:
+            since = until
         sleep((window - (datetime.now(tz=UTC) - start_time)).seconds)
 
 
@@ -3,13 +3,187 @@
 import argparse
 import logging
 import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import groupby
 from time import sleep
+from typing import Iterator, Optional
 
 from atlassian import Jira  # type: ignore
+from sqlalchemy import Engine
 
-from jiraissues import Issue
-from summarizer import summarize_issue
-from summary_dbi import db_stats, get_stale_issues, mariadb_db, update_summary
+from apiclients import jira_client, log_connection_stats
+from jiraissues import issue_cache
+from ratelimit import CircuitOpenError
+from summarizer import refresh_summary
+from summary_dbi import (
+    claim_stale,
+    db_stats,
+    delete_summary,
+    mariadb_db,
+    release_leases,
+    renew_leases,
+    update_summaries,
+)
+
+# The name this process uses to claim stale summaries
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# How long a claim on a batch of stale summaries lasts without being renewed
+_LEASE = timedelta(minutes=10)
+
+
+@contextmanager
+def _heartbeat(
+    db: Engine, owner: str, keys: list[str], lease: timedelta
+) -> Iterator[None]:
+    """
+    Keep renewing the claims on a batch of stale summaries while it is being
+    worked on.
+    """
+    done = threading.Event()
+
+    def renew() -> None:
+        while not done.wait(lease.total_seconds() / 3):
+            try:
+                renew_leases(db, owner, keys, lease)
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Try again at the next beat; the claims outlive a few misses
+                logging.exception("Failed to renew the claims of %s", owner)
+
+    thread = threading.Thread(target=renew, name=f"heartbeat-{owner}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def refresh_stale(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    jira: Jira,
+    db: Engine,
+    limit: int = 100,
+    owner: str = WORKER_ID,
+    lease: timedelta = _LEASE,
+    ancestors: bool = False,
+) -> int:
+    """
+    Claim a batch of stale issues and regenerate their summaries.
+
+    Several workers can refresh the summaries at the same time, as long as they
+    use different owner names; each one gets its own batch.
+
+    An issue whose summary can't be regenerated doesn't hold up the rest of
+    the batch. Its claim is given up so that it is retried, and it counts as
+    one of its attempts. If Jira is down, the work stops, and the claims on
+    the issues that weren't refreshed are given up without counting.
+
+    Parameters:
+        - jira: The Jira client
+        - db: The summary database
+        - limit: The maximum number of issues to refresh
+        - owner: The name of the worker
+        - lease: How long the claim on the batch lasts without being renewed
+        - ancestors: Whether to mark all the ancestors of the refreshed issues
+          as stale, rather than just their parents
+
+    Returns:
+        The number of stale issues that were processed (0 if there were none
+        left to claim)
+    """
+    stale_keys = claim_stale(db, owner, limit, lease)
+    if not stale_keys:
+        return 0
+    with _heartbeat(db, owner, stale_keys, lease):
+        try:
+            failed = _refresh(jira, db, stale_keys, ancestors)
+        except CircuitOpenError:
+            # None of the rest can be done for now, but it's not their fault
+            release_leases(db, owner, stale_keys, attempted=False)
+            raise
+        except Exception:
+            # Let another worker (or this one) retry the rest straight away
+            release_leases(db, owner, stale_keys)
+            raise
+    release_leases(db, owner, failed)
+    return len(stale_keys)
+
+
+def _refresh(
+    jira: Jira, db: Engine, stale_keys: list[str], ancestors: bool
+) -> list[str]:
+    """
+    Regenerate the summaries of a claimed batch of stale issues.
+
+    Returns:
+        The keys of the issues whose summaries could not be regenerated
+    """
+    # Bring any cached copies up to date, then load the rest
+    issue_cache.revalidate(jira, stale_keys, refresh=True)
+    issues = issue_cache.get_issues(jira, stale_keys)
+    # Issues that have been deleted or that we're not allowed to see can't
+    # be summarized; drop them from the queue instead of retrying forever
+    found = {issue.key for issue in issues}
+    for key in stale_keys:
+        if key not in found:
+            logging.info("Dropping inaccessible issue %s", key)
+            delete_summary(db, key)
+    # Regenerate the summaries of children before parents, saving each level
+    # of the hierarchy before moving up so that the parents see the new
+    # summaries of their children. Summaries whose inputs haven't changed are
+    # kept as they are, without invalidating their parents.
+    issues.sort(key=lambda x: x.level)
+    failed: list[str] = []
+    for _, level in groupby(issues, key=lambda x: x.level):
+        updates: list[tuple[str, str, Optional[str]]] = []
+        input_hashes: dict[str, str] = {}
+        for issue in level:
+            logging.info("Refreshing summary for %s", issue.key)
+            try:
+                result = refresh_summary(issue, db)
+            except CircuitOpenError:
+                # Keep the summaries made so far
+                update_summaries(db, updates, ancestors, input_hashes)
+                raise
+            except Exception:  # pylint: disable=broad-exception-caught
+                logging.exception("Failed to refresh the summary of %s", issue.key)
+                failed.append(issue.key)
+                continue
+            if not result.changed:
+                continue
+            updates.append((issue.key, result.summary, issue.parent))
+            input_hashes[issue.key] = result.input_hash
+            logging.debug("New issue %s summary: %s", issue.key, result.summary)
+        update_summaries(db, updates, ancestors, input_hashes)
+    return failed
+
+
+def run_worker(
+    jira: Jira, db: Engine, owner: str, batch_size: int = 100, ancestors: bool = False
+) -> None:
+    """
+    Refresh stale summaries forever.
+
+    Parameters:
+        - jira: The Jira client
+        - db: The summary database
+        - owner: The name of the worker
+        - batch_size: The number of stale summaries to claim at a time
+        - ancestors: Whether to mark all the ancestors of the refreshed issues
+          as stale
+    """
+    while True:
+        try:
+            if not refresh_stale(jira, db, batch_size, owner, ancestors=ancestors):
+                logging.debug("No stale issues found, sleeping...")
+                sleep(60)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # The batch has been released; don't take down the worker
+            logging.exception("Worker %s failed to refresh a batch", owner)
+            sleep(60)
 
 
 def main() -> None:
@@ -34,6 +208,26 @@ def main() -> None:
         type=int,
         help="MariaDB port",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        default=1,
+        type=int,
+        help="Number of batches to refresh in parallel",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        default=100,
+        type=int,
+        help="Number of stale summaries to claim at a time",
+    )
+    parser.add_argument(
+        "--ancestors",
+        action="store_true",
+        help="Invalidate the summaries of all the ancestors of refreshed issues,"
+        + " not just their parents",
+    )
 
     args = parser.parse_args()
     logging.basicConfig(
@@ -45,7 +239,15 @@ def main() -> None:
     db_port = int(args.db_port)
 
     db = mariadb_db(host=db_host, port=db_port)
-    jira = Jira(url=os.environ["JIRA_URL"], token=os.environ["JIRA_TOKEN"])
+    jira = jira_client()
+
+    for n in range(args.workers):
+        threading.Thread(
+            target=run_worker,
+            args=(jira, db, f"{WORKER_ID}:{n}", args.batch_size, args.ancestors),
+            name=f"worker-{n}",
+            daemon=True,
+        ).start()
 
     while True:
         stats = db_stats(db)
@@ -55,19 +257,8 @@ def main() -> None:
             stats["stale"],
             stats["fresh"],
         )
-        stale_keys = get_stale_issues(db, limit=100)
-        if not stale_keys:
-            logging.debug("No stale issues found, sleeping...")
-            sleep(60)
-            continue
-        # Sort by level so that we regenerate summaries of children before parents
-        issues = [Issue(jira, key) for key in stale_keys]
-        issues.sort(key=lambda x: x.level)
-        for issue in issues:
-            logging.info("Refreshing summary for %s", issue.key)
-            summary = summarize_issue(issue, db)
-            update_summary(db, issue.key, summary, issue.parent)
-            logging.debug("Updated issue %s summary: %s", issue.key, summary)
+        log_connection_stats("Jira", jira)
+        sleep(60)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+"""Test the refresh of stale summaries."""
+
+import time
+from datetime import timedelta
+from typing import Any
+
+import pytest
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+import summarizer_refresh
+from jiraissues import Issue, IssueCache
+from ratelimit import CircuitOpenError
+from summarizer import Refreshed
+from summarizer_refresh import refresh_stale
+from summary_dbi import (
+    Summary,
+    claim_stale,
+    get_stale_issues,
+    get_summary,
+    mark_stale_many,
+    memory_db,
+)
+
+STORIES = ["TEST-4", "TEST-5", "TEST-6", "TEST-7"]
+
+
+class TestRefreshStale:
+    """Test refreshing a batch of stale summaries."""
+
+    @pytest.fixture
+    def db(self, monkeypatch) -> Engine:
+        """Create a database in which the stories' summaries are stale."""
+        monkeypatch.setattr(summarizer_refresh, "issue_cache", IssueCache(100))
+        db = memory_db()
+        mark_stale_many(db, STORIES, add_ok=True)
+        return db
+
+    @staticmethod
+    def _attempts(db: Engine, key: str) -> int:
+        with Session(db) as session:
+            record = session.get(Summary, key)
+            assert record is not None
+            return record.attempts
+
+    @staticmethod
+    def _failing(monkeypatch: Any, key: str, error: Exception) -> None:
+        """Make the summary of one issue fail to refresh."""
+
+        def refresh(issue: Issue, _db: Engine) -> Refreshed:
+            if issue.key == key:
+                raise error
+            return Refreshed(f"All about {issue.key}", "0" * 64, True)
+
+        monkeypatch.setattr(summarizer_refresh, "refresh_summary", refresh)
+
+    def test_failed_issue(self, jira, db, monkeypatch):
+        """Test that one failing issue doesn't hold up the rest of its batch."""
+        self._failing(monkeypatch, "TEST-5", RuntimeError("Boom"))
+        assert refresh_stale(jira, db, owner="one") == len(STORIES)
+        assert get_summary(db, "TEST-4") == "All about TEST-4"
+        assert get_summary(db, "TEST-7") == "All about TEST-7"
+        # The failed one can be claimed again, and is eventually given up on
+        assert get_stale_issues(db) == ["TEST-5"]
+        assert self._attempts(db, "TEST-5") == 1
+        for _ in range(4):
+            refresh_stale(jira, db, owner="two")
+        assert self._attempts(db, "TEST-5") == 5
+        assert not claim_stale(db, "three")
+
+    def test_outage(self, jira, db, monkeypatch):
+        """Test that the claims aren't counted against the issues if Jira is down."""
+        self._failing(monkeypatch, "TEST-6", CircuitOpenError("Jira is down"))
+        with pytest.raises(CircuitOpenError):
+            refresh_stale(jira, db, owner="one")
+        # The summaries made before the outage are kept
+        assert get_summary(db, "TEST-5") == "All about TEST-5"
+        assert get_stale_issues(db) == ["TEST-6", "TEST-7"]
+        assert self._attempts(db, "TEST-6") == 0
+        assert claim_stale(db, "two") == ["TEST-6", "TEST-7"]
+
+    def test_heartbeat_errors(self, db, monkeypatch):
+        """Test that the claims keep being renewed after a failed renewal."""
+        calls = []
+
+        def renew(*args: Any) -> int:
+            calls.append(args)
+            raise RuntimeError("The database is busy")
+
+        monkeypatch.setattr(summarizer_refresh, "renew_leases", renew)
+        lease = timedelta(seconds=0.03)
+        with summarizer_refresh._heartbeat(  # pylint: disable=protected-access
+            db, "one", STORIES, lease
+        ):
+            time.sleep(0.1)
+        assert len(calls) >= 2
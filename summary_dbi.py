@@ -1,21 +1,52 @@
 """This package abstracts the interface to the AI summary database."""
 
 import os
-from datetime import UTC, datetime
-from typing import Optional
-
-from sqlalchemy import DateTime, Engine, String, UnicodeText, create_engine
+from datetime import UTC, datetime, timedelta
+from typing import Any, Iterable, Iterator, Optional
+
+from sqlalchemy import (
+    DateTime,
+    Engine,
+    Index,
+    Integer,
+    Select,
+    String,
+    UnicodeText,
+    and_,
+    create_engine,
+    func,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
     MappedAsDataclass,
     Session,
+    aliased,
     mapped_column,
 )
+from sqlalchemy.schema import CreateColumn
 
 # Maximum length of a Jira issue key (i.e. 'ABC-123')
 _MAX_ISSUE_KEY_LEN = 20
 
+# Maximum length of the name of a refresh worker
+_MAX_OWNER_LEN = 100
+
+# Length of the fingerprint of a summary's inputs (a hex SHA-256 digest)
+_INPUT_HASH_LEN = 64
+
+# Maximum number of keys in a single bulk statement. This keeps the IN lists
+# (and the multi-row inserts) well under the bound parameter limits of the
+# databases.
+_BATCH_SIZE = 500
+
 
 class _Base(
     MappedAsDataclass, DeclarativeBase
@@ -37,18 +68,41 @@ class Summary(_Base):  # pylint: disable=too-few-public-methods
           if the summary is not stale)
         - parent_key: Jira issue key of the parent issue (nullable, if the issue
           does not have a parent)
+        - lease_owner: The refresh worker that has claimed the stale summary
+          for regeneration (nullable, if it is not claimed)
+        - lease_expiry: Timestamp when the worker's claim expires (nullable,
+          if it is not claimed)
+        - attempts: The number of times the stale summary has been claimed for
+          regeneration without success
+        - input_hash: A fingerprint of the inputs the summary was generated
+          from (nullable, if not known)
 
     Table semantics:
         - The primary key is the issue_key
+        - The stale queue is indexed by (stale_ts, issue_key), so that the
+          oldest stale summaries can be found without scanning the table
+        - The parent_key is indexed, so that the children of an issue can be
+          found
         - The ai_summary and summary_ts columns are nullable, since the summary
           may not have been generated yet.
         - The stale_ts column indicates whether and when the summary was marked
           as stale
         - Any time the summary text is updated, the summary_ts should be
-          updated, and the stale_ts should be cleared.
+          updated, and the stale_ts and the claim should be cleared.
+        - Stale summaries form a work queue: a worker claims a batch of them
+          with `claim_stale`, keeps the claim alive with `renew_leases` while
+          it works, and gives up the ones it can't finish with
+          `release_leases`. A claim that expires (e.g. because the worker
+          died) can be taken by another worker.
+        - A stale summary whose inputs haven't changed (same input_hash) can be
+          made fresh again with `mark_fresh`, without regenerating it.
     """
 
     __tablename__ = "ai_summary"
+    __table_args__ = (
+        Index("ix_ai_summary_stale_ts", "stale_ts", "issue_key"),
+        Index("ix_ai_summary_parent_key", "parent_key"),
+    )
 
     issue_key: Mapped[str] = mapped_column(
         String(_MAX_ISSUE_KEY_LEN),
@@ -79,6 +133,31 @@ class Summary(_Base):  # pylint: disable=too-few-public-methods
         default=None,
         comment="Jira issue key of the parent issue",
     )
+    lease_owner: Mapped[Optional[str]] = mapped_column(
+        String(_MAX_OWNER_LEN),
+        nullable=True,
+        default=None,
+        comment="The refresh worker that has claimed the summary",
+    )
+    lease_expiry: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        default=None,
+        comment="Timestamp when the worker's claim on the summary expires",
+    )
+    attempts: Mapped[int] = mapped_column(
+        Integer(),
+        nullable=False,
+        default=0,
+        server_default=text("0"),
+        comment="The number of attempts to regenerate the stale summary",
+    )
+    input_hash: Mapped[Optional[str]] = mapped_column(
+        String(_INPUT_HASH_LEN),
+        nullable=True,
+        default=None,
+        comment="Fingerprint of the inputs the summary was generated from",
+    )
 
 
 def memory_db() -> Engine:
@@ -91,6 +170,75 @@ def memory_db() -> Engine:
 
     # Create the DB table(s) if they don't exist
     _Base.metadata.create_all(engine)
+    upgrade_schema(engine)
+
+    return engine
+
+
+def upgrade_schema(db: Engine) -> list[str]:
+    """
+    Bring the schema of an existing database up to date.
+
+    `create_all` only creates the tables that are missing, so the columns and
+    indexes that were added after a table was created must be added here. This
+    is safe to run on every start, and by several processes at once.
+
+    Parameters:
+        - db: Database engine
+
+    Returns:
+        - The names of the columns and indexes that were created
+    """
+    table = _Base.metadata.tables[Summary.__tablename__]
+    created: list[str] = []
+    columns = {column["name"] for column in inspect(db).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in columns:
+            continue
+        ddl = CreateColumn(column).compile(dialect=db.dialect)
+        try:
+            with db.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        except DBAPIError:
+            # Another process may have just added it
+            if column.name not in {
+                c["name"] for c in inspect(db).get_columns(table.name)
+            }:
+                raise
+            continue
+        created.append(column.name)
+    existing = {index["name"] for index in inspect(db).get_indexes(table.name)}
+    for index in sorted(table.indexes, key=lambda index: str(index.name)):
+        if index.name in existing:
+            continue
+        try:
+            index.create(db)
+        except DBAPIError:
+            # Another process may have just created it
+            if index.name not in {
+                i["name"] for i in inspect(db).get_indexes(table.name)
+            }:
+                raise
+            continue
+        created.append(str(index.name))
+    return created
+
+
+def sqlite_db(path: str) -> Engine:
+    """
+    Create (or open) an AI summary database in a local SQLite file.
+
+    Parameters:
+        - path: Path to the database file
+
+    Returns:
+        - Database engine
+    """
+    engine = create_engine(f"sqlite+pysqlite:///{path}", pool_pre_ping=True)
+
+    # Create the DB table(s) if they don't exist
+    _Base.metadata.create_all(engine)
+    upgrade_schema(engine)
 
     return engine
 
@@ -124,6 +272,7 @@ def mariadb_db(
 
     # Create the DB table(s) if they don't exist
     _Base.metadata.create_all(engine)
+    upgrade_schema(engine)
 
     return engine
 
@@ -147,8 +296,170 @@ def get_summary(db: Engine, issue_key: str, stale_ok: bool = False) -> Optional[
     return record.ai_summary
 
 
+def _batches(keys: Iterable[str]) -> Iterator[list[str]]:
+    """
+    Split a set of keys into batches for bulk statements, dropping duplicates.
+
+    Examples:
+    >>> [len(b) for b in _batches(str(n) for n in range(1200))]
+    [500, 500, 200]
+    >>> list(_batches(["A-1", "A-2", "A-1"]))
+    [['A-1', 'A-2']]
+    """
+    unique = list(dict.fromkeys(keys))
+    for start in range(0, len(unique), _BATCH_SIZE):
+        yield unique[start : start + _BATCH_SIZE]
+
+
+def get_summaries(
+    db: Engine, issue_keys: Iterable[str], stale_ok: bool = False
+) -> dict[str, str]:
+    """
+    Get the AI summaries for a set of Jira issue keys.
+
+    This is the bulk version of `get_summary`, reading the summaries in as few
+    queries as possible.
+
+    Parameters:
+        - db: Database engine
+        - issue_keys: Jira issue keys
+        - stale_ok: Whether to return potentially stale summaries
+
+    Returns:
+        - The AI summary text of each issue that has one; issues whose summary
+          does not exist or is stale are left out
+    """
+    summaries: dict[str, str] = {}
+    with Session(db) as session:
+        for batch in _batches(issue_keys):
+            query = select(Summary.issue_key, Summary.ai_summary).where(
+                Summary.issue_key.in_(batch), Summary.ai_summary.isnot(None)
+            )
+            if not stale_ok:
+                query = query.where(Summary.stale_ts.is_(None))
+            for issue_key, summary in session.execute(query):
+                summaries[issue_key] = summary
+    return summaries
+
+
+def get_input_hashes(db: Engine, issue_keys: Iterable[str]) -> dict[str, str]:
+    """
+    Get the fingerprints of the inputs that the AI summaries for a set of Jira
+    issue keys were generated from, whether or not the summaries are stale.
+
+    Parameters:
+        - db: Database engine
+        - issue_keys: Jira issue keys
+
+    Returns:
+        - The input fingerprint of each issue that has a summary and a
+          fingerprint
+    """
+    hashes: dict[str, str] = {}
+    with Session(db) as session:
+        for batch in _batches(issue_keys):
+            query = select(Summary.issue_key, Summary.input_hash).where(
+                Summary.issue_key.in_(batch),
+                Summary.ai_summary.isnot(None),
+                Summary.input_hash.isnot(None),
+            )
+            for issue_key, input_hash in session.execute(query):
+                hashes[issue_key] = input_hash
+    return hashes
+
+
+def _upsert(session: Session, rows: list[dict[str, Any]], columns: list[str]) -> None:
+    """
+    Insert records, or update the given columns of the ones that already exist,
+    in a single statement where the database supports it.
+
+    Parameters:
+        - session: Database session
+        - rows: The records to write, as column values
+        - columns: The columns to update in existing records (none to leave
+          existing records unchanged)
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite.insert(Summary).values(rows)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Summary.issue_key],
+                set_={name: stmt.excluded[name] for name in columns},
+            )
+            if columns
+            else stmt.on_conflict_do_nothing()
+        )
+    elif dialect in ("mysql", "mariadb"):
+        upsert = mysql.insert(Summary).values(rows)
+        # Updating the key to itself leaves existing records unchanged
+        session.execute(
+            upsert.on_duplicate_key_update(
+                {name: upsert.inserted[name] for name in columns or ["issue_key"]}
+            )
+        )
+    else:
+        for row in rows:
+            record = session.get(Summary, row["issue_key"])
+            if record is None:
+                session.add(Summary(**row))
+            else:
+                for name in columns:
+                    setattr(record, name, row[name])
+
+
+def _ancestors(session: Session, issue_keys: Iterable[str]) -> set[tuple[str, str]]:
+    """
+    Find all the ancestors of a set of issues, following the stored parent
+    keys up the hierarchy with one recursive query per batch of keys.
+
+    Parameters:
+        - session: Database session
+        - issue_keys: Jira issue keys
+
+    Returns:
+        - (issue key, ancestor key) for each ancestor of each issue
+    """
+    pairs: set[tuple[str, str]] = set()
+    for batch in _batches(issue_keys):
+        chain = (
+            select(Summary.issue_key.label("origin"), Summary.parent_key.label("key"))
+            .where(Summary.issue_key.in_(batch), Summary.parent_key.isnot(None))
+            .cte("ancestors", recursive=True)
+        )
+        # UNION rather than UNION ALL, so that a loop in the parent keys ends
+        chain = chain.union(
+            select(chain.c.origin, Summary.parent_key)
+            .join(chain, Summary.issue_key == chain.c.key)
+            .where(Summary.parent_key.isnot(None))
+        )
+        for origin, key in session.execute(select(chain.c.origin, chain.c.key)):
+            pairs.add((origin, key))
+    return pairs
+
+
+def _mark_keys_stale(
+    session: Session, issue_keys: Iterable[str], now: datetime
+) -> None:
+    """
+    Mark the existing summaries of a set of issues as stale. The ones that are
+    already stale keep their place in the queue, but their inputs have changed
+    again, so they get a new set of attempts.
+    """
+    for batch in _batches(issue_keys):
+        session.execute(
+            update(Summary)
+            .where(Summary.issue_key.in_(batch))
+            .values(stale_ts=func.coalesce(Summary.stale_ts, now), attempts=0)
+        )
+
+
 def update_summary(
-    db: Engine, issue_key: str, summary: str, parent_key: Optional[str]
+    db: Engine,
+    issue_key: str,
+    summary: str,
+    parent_key: Optional[str],
+    input_hash: Optional[str] = None,
 ) -> None:
     """
     Update the AI summary for the given Jira issue key.
@@ -158,6 +469,8 @@ def update_summary(
         - issue_key: Jira issue key
         - summary: The AI summary text
         - parent_key: Jira issue key of the parent issue
+        - input_hash: The fingerprint of the inputs the summary was generated
+          from
     """
     now = datetime.now(tz=UTC)
     with Session(db) as session:
@@ -167,6 +480,7 @@ def update_summary(
             parent_key=parent_key,
             summary_ts=now,
             stale_ts=None,
+            input_hash=input_hash,
         )
         session.merge(record)
         # Since the parent summaries are influenced by their children, mark the
@@ -178,6 +492,76 @@ def update_summary(
         session.commit()
 
 
+def update_summaries(
+    db: Engine,
+    summaries: Iterable[tuple[str, str, Optional[str]]],
+    ancestors: bool = False,
+    input_hashes: Optional[dict[str, str]] = None,
+) -> None:
+    """
+    Update the AI summaries for a set of Jira issue keys in one transaction.
+
+    This is the bulk version of `update_summary`. The result is the same as
+    updating the summaries one at a time, in order: a parent whose summary is
+    updated before one of its children's is left stale.
+
+    By default, only the parents of the updated issues are marked as stale, so
+    a change reaches the top of the hierarchy one level per refresh. With
+    ancestors, the whole chain of ancestors is marked as stale at once, so that
+    the refresh can regenerate it bottom-up in one pass.
+
+    Parameters:
+        - db: Database engine
+        - summaries: (issue key, AI summary text, parent issue key) for each
+          issue
+        - ancestors: Whether to mark all the ancestors as stale, rather than
+          just the parents
+        - input_hashes: The fingerprint of the inputs each summary was
+          generated from
+    """
+    now = datetime.now(tz=UTC)
+    input_hashes = input_hashes or {}
+    rows: dict[str, dict[str, Any]] = {}
+    for issue_key, summary, parent_key in summaries:
+        rows.pop(issue_key, None)  # Only the last update of a key counts
+        rows[issue_key] = {
+            "issue_key": issue_key,
+            "ai_summary": summary,
+            "parent_key": parent_key,
+            "summary_ts": now,
+            "stale_ts": None,
+            "lease_owner": None,
+            "lease_expiry": None,
+            "attempts": 0,
+            "input_hash": input_hashes.get(issue_key),
+        }
+        if parent_key in rows:
+            rows[parent_key]["stale_ts"] = now
+    if not rows:
+        return
+    # Parents updated in this batch have already been taken care of
+    parents = {row["parent_key"] for row in rows.values()} - set(rows) - {None}
+    with Session(db) as session:
+        values = list(rows.values())
+        for start in range(0, len(values), _BATCH_SIZE):
+            _upsert(
+                session,
+                values[start : start + _BATCH_SIZE],
+                [name for name in values[0] if name != "issue_key"],
+            )
+        if ancestors:
+            # Now that the new parent keys are stored, an ancestor is left
+            # fresh only if it was updated after all its updated descendants
+            order = {key: n for n, key in enumerate(rows)}
+            parents = {
+                key
+                for origin, key in _ancestors(session, rows)
+                if order.get(key, -1) < order[origin]
+            }
+        _mark_keys_stale(session, parents, now)
+        session.commit()
+
+
 def mark_stale(db: Engine, issue_key: str, add_ok: bool = False) -> bool:
     """
     Mark the AI summary for the given Jira issue key as stale.
@@ -208,7 +592,104 @@ def mark_stale(db: Engine, issue_key: str, add_ok: bool = False) -> bool:
                 return False
         if record.stale_ts is None:
             record.stale_ts = datetime.now(tz=UTC)
-            session.commit()
+        # The inputs have changed, so it's worth trying again
+        record.attempts = 0
+        session.commit()
+    return True
+
+
+def mark_stale_many(
+    db: Engine,
+    issue_keys: Iterable[str],
+    add_ok: bool = False,
+    ancestors: bool = False,
+) -> set[str]:
+    """
+    Mark the AI summaries for a set of Jira issue keys as stale, in one
+    transaction.
+
+    This is the bulk version of `mark_stale`.
+
+    Parameters:
+        - db: Database engine
+        - issue_keys: Jira issue keys
+        - add_ok: Whether to add the records that don't exist
+        - ancestors: Whether to also mark the summaries of all the ancestors
+          of the issues as stale, following the stored parent keys
+
+    Returns:
+        - The keys of the records that are now stale (including those that were
+          added, or that were already stale)
+    """
+    now = datetime.now(tz=UTC)
+    marked: set[str] = set()
+    with Session(db) as session:
+        for batch in _batches(issue_keys):
+            if add_ok:
+                _upsert(
+                    session,
+                    [{"issue_key": key, "stale_ts": now} for key in batch],
+                    [],
+                )
+                marked.update(batch)
+            else:
+                marked.update(
+                    session.scalars(
+                        select(Summary.issue_key).where(Summary.issue_key.in_(batch))
+                    )
+                )
+            _mark_keys_stale(session, batch, now)
+        if ancestors:
+            _mark_keys_stale(
+                session, {key for _, key in _ancestors(session, marked)}, now
+            )
+        session.commit()
+    return marked
+
+
+def mark_fresh(db: Engine, issue_keys: Iterable[str]) -> None:
+    """
+    Mark the stale AI summaries for a set of Jira issue keys as current again,
+    without changing them.
+
+    This is for summaries whose inputs haven't changed since they were
+    generated. Unlike an update, it leaves the parents' summaries alone, and
+    the time the summaries were generated is kept.
+
+    Parameters:
+        - db: Database engine
+        - issue_keys: Jira issue keys
+    """
+    with Session(db) as session:
+        for batch in _batches(issue_keys):
+            session.execute(
+                update(Summary)
+                .where(Summary.issue_key.in_(batch), Summary.ai_summary.isnot(None))
+                .values(stale_ts=None, lease_owner=None, lease_expiry=None, attempts=0)
+            )
+        session.commit()
+
+
+def delete_summary(db: Engine, issue_key: str) -> bool:
+    """
+    Remove the AI summary record for the given Jira issue key.
+
+    This is used for issues that no longer exist or that can no longer be
+    accessed, so that they don't stay queued for a refresh forever.
+
+    Parameters:
+        - db: Database engine
+        - issue_key: Jira issue key
+
+    Returns:
+        - True if the record was removed, False if it did not exist
+    """
+    with Session(db) as session:
+        record = session.get(Summary, issue_key)
+        if record is None:
+            return False
+        session.delete(record)
+        session.commit()
     return True
 
 
@@ -224,15 +705,170 @@ def get_stale_issues(db: Engine, limit: int = 0) -> list[str]:
     Returns:
         - A list of Jira issue keys
     """
+    # Only the columns of the stale_ts index are used, so the query is
+    # answered from the index alone
+    query = (
+        select(Summary.issue_key)
+        .where(Summary.stale_ts.isnot(None))
+        .order_by(Summary.stale_ts.asc())
+    )
+    if limit > 0:
+        query = query.limit(limit)
     with Session(db) as session:
-        query = (
-            session.query(Summary)
-            .filter(Summary.stale_ts.isnot(None))
-            .order_by(Summary.stale_ts.asc())
+        return list(session.scalars(query))
+
+
+def claim_stale(  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    db: Engine,
+    owner: str,
+    limit: int = 100,
+    lease: timedelta = timedelta(minutes=10),
+    max_attempts: int = 5,
+    children_first: bool = True,
+) -> list[str]:
+    """
+    Claim a batch of stale summaries for regeneration, starting with the most
+    out-of-date.
+
+    Only the summaries that aren't claimed by another worker (or whose claim
+    has expired) are claimed, so that concurrent workers get separate batches.
+    On MariaDB, the rows being claimed by other workers are skipped rather than
+    waited for (SELECT ... FOR UPDATE SKIP LOCKED). SQLite serializes the
+    writes instead, and the claim is only made on the rows that are still
+    unclaimed when the worker gets to write.
+
+    Summaries that have been claimed max_attempts times without being
+    regenerated are left in the queue, stale, for inspection.
+
+    With children_first, a summary isn't claimed while any of its children's
+    summaries is stale, so that it is regenerated from their new summaries.
+    When a whole chain of ancestors is stale, it is then claimed bottom-up.
+    If nothing is claimable that way (e.g. the parent links form a cycle), the
+    summaries are only held back by the children that are claimed by a worker.
+
+    Parameters:
+        - db: Database engine
+        - owner: The name of the worker, unique among the workers
+        - limit: Maximum number of summaries to claim
+        - lease: How long the claim lasts unless it is renewed
+        - max_attempts: Maximum number of claims on the same stale summary
+        - children_first: Whether to wait for the stale children to be
+          regenerated first
+
+    Returns:
+        - The keys of the claimed issues
+    """
+    now = datetime.now(tz=UTC)
+    claimable = and_(
+        Summary.stale_ts.isnot(None),
+        or_(Summary.lease_expiry.is_(None), Summary.lease_expiry < now),
+        Summary.attempts < max_attempts,
+    )
+    child = aliased(Summary)
+    stale_child = select(child.issue_key).where(
+        child.parent_key == Summary.issue_key,
+        child.issue_key != Summary.issue_key,
+        child.stale_ts.isnot(None),
+        child.attempts < max_attempts,
+    )
+    # Each query is only tried if the previous one found nothing
+    guards: list[Optional[Select[Any]]] = [None]
+    if children_first:
+        # If nothing can be claimed, the stale summaries may be waiting for
+        # each other around a cycle of parent links. Then, only wait for the
+        # children that are being regenerated.
+        guards = [stale_child, stale_child.where(child.lease_expiry >= now)]
+    with Session(db) as session:
+        candidates: list[str] = []
+        for guard in guards:
+            query = select(Summary.issue_key).where(claimable)
+            if guard is not None:
+                query = query.where(~guard.exists())
+            query = query.order_by(Summary.stale_ts.asc()).limit(limit)
+            if db.dialect.name in ("mysql", "mariadb"):
+                query = query.with_for_update(skip_locked=True)
+            candidates = list(session.scalars(query))
+            if candidates:
+                break
+        if not candidates:
+            return []
+        session.execute(
+            update(Summary)
+            .where(Summary.issue_key.in_(candidates), claimable)
+            .values(
+                lease_owner=owner,
+                lease_expiry=now + lease,
+                attempts=Summary.attempts + 1,
+            )
+        )
+        claimed = set(
+            session.scalars(
+                select(Summary.issue_key).where(
+                    Summary.issue_key.in_(candidates), Summary.lease_owner == owner
+                )
+            )
         )
-        if limit > 0:
-            query = query.limit(limit)
-    return [record.issue_key for record in query.all()]
+        session.commit()
+    return [key for key in candidates if key in claimed]
+
+
+def renew_leases(
+    db: Engine,
+    owner: str,
+    issue_keys: Iterable[str],
+    lease: timedelta = timedelta(minutes=10),
+) -> int:
+    """
+    Extend a worker's claims on stale summaries.
+
+    Parameters:
+        - db: Database engine
+        - owner: The name of the worker
+        - issue_keys: The keys of the claimed issues
+        - lease: How long the claims last from now
+
+    Returns:
+        - The number of claims that were still held and have been extended
+    """
+    renewed = 0
+    with Session(db) as session:
+        for batch in _batches(issue_keys):
+            result = session.execute(
+                update(Summary)
+                .where(Summary.issue_key.in_(batch), Summary.lease_owner == owner)
+                .values(lease_expiry=datetime.now(tz=UTC) + lease)
+            )
+            renewed += result.rowcount  # type: ignore[attr-defined]
+        session.commit()
+    return renewed
+
+
+def release_leases(
+    db: Engine, owner: str, issue_keys: Iterable[str], attempted: bool = True
+) -> None:
+    """
+    Give up a worker's claims on stale summaries, so that another worker can
+    claim them straight away. The summaries stay stale.
+
+    Parameters:
+        - db: Database engine
+        - owner: The name of the worker
+        - issue_keys: The keys of the claimed issues
+        - attempted: Whether the claims count as attempts to regenerate the
+          summaries. They don't if the work never got to them (e.g. because
+          Jira is down).
+    """
+    values: dict[str, Any] = {"lease_owner": None, "lease_expiry": None}
+    if not attempted:
+        values["attempts"] = Summary.attempts - 1
+    with Session(db) as session:
+        for batch in _batches(issue_keys):
+            session.execute(
+                update(Summary)
+                .where(Summary.issue_key.in_(batch), Summary.lease_owner == owner)
+                .values(**values)
+            )
+        session.commit()
 
 
 def db_stats(db: Engine) -> dict[str, int]:
@@ -248,8 +884,10 @@ def db_stats(db: Engine) -> dict[str, int]:
             - stale: Number of stale records
             - fresh: Number of fresh records
     """
+    # Both counts in a single pass; COUNT(stale_ts) only counts the non-NULL
+    # values
     with Session(db) as session:
-        total = session.query(Summary).count()
-        stale = session.query(Summary).filter(Summary.stale_ts.isnot(None)).count()
-        fresh = total - stale
-    return {"total": total, "stale": stale, "fresh": fresh}
+        total, stale = session.execute(
+            select(func.count(), func.count(Summary.stale_ts)).select_from(Summary)
+        ).one()
+    return {"total": total, "stale": stale, "fresh": total - stale}
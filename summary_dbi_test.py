@@ -1,15 +1,31 @@
 """Test the database interface."""
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+
 import pytest
-from sqlalchemy import Engine
+from sqlalchemy import Engine, create_engine, inspect, text
 
 from summary_dbi import (
     Summary,
+    claim_stale,
+    db_stats,
+    delete_summary,
+    get_input_hashes,
     get_stale_issues,
+    get_summaries,
     get_summary,
+    mark_fresh,
     mark_stale,
+    mark_stale_many,
     memory_db,
+    release_leases,
+    renew_leases,
+    sqlite_db,
+    update_summaries,
     update_summary,
+    upgrade_schema,
 )
 
 
@@ -82,3 +98,277 @@ class TestDBI:
         update_summary(db, child_key, "zzz", with_abc_123["key"])
         # Parent should now be stale
         assert get_stale_issues(db) == [with_abc_123["key"]]
+
+    def test_delete(self, db, with_abc_123):
+        """Test that a summary can be removed, including from the stale queue."""
+        mark_stale(db, with_abc_123["key"])
+        assert delete_summary(db, with_abc_123["key"])
+        assert get_summary(db, with_abc_123["key"], stale_ok=True) is None
+        assert not get_stale_issues(db)
+        assert not delete_summary(db, with_abc_123["key"])
+
+    def test_get_summaries(self, db, with_abc_123):
+        """Test fetching many summaries at once."""
+        update_summary(db, "ABC-124", "Another summary.", None)
+        mark_stale(db, "ABC-124")
+        keys = ["ABC-123", "ABC-124", "ZZZ-999"]
+        assert get_summaries(db, keys) == {"ABC-123": with_abc_123["summary"]}
+        assert get_summaries(db, keys, stale_ok=True) == {
+            "ABC-123": with_abc_123["summary"],
+            "ABC-124": "Another summary.",
+        }
+        assert not get_summaries(db, [])
+
+    def test_get_summaries_batches(self, db):
+        """Test that long lists of keys are split into several queries."""
+        update_summaries(db, [(f"ABC-{n}", f"Summary {n}", None) for n in range(1200)])
+        summaries = get_summaries(db, [f"ABC-{n}" for n in range(0, 1300, 2)])
+        assert len(summaries) == 600
+        assert summaries["ABC-1198"] == "Summary 1198"
+
+    def test_mark_stale_many(self, db, with_abc_123):
+        """Test marking many summaries as stale at once."""
+        mark_stale(db, "ABC-200", add_ok=True)
+        keys = [with_abc_123["key"], "ABC-200", "ZZZ-999"]
+        assert mark_stale_many(db, keys) == {with_abc_123["key"], "ABC-200"}
+        assert get_stale_issues(db) == ["ABC-200", with_abc_123["key"]]
+        assert mark_stale_many(db, keys, add_ok=True) == set(keys)
+        assert get_stale_issues(db) == ["ABC-200", with_abc_123["key"], "ZZZ-999"]
+        # Adding doesn't lose the existing summary
+        assert get_summary(db, with_abc_123["key"], stale_ok=True) == (
+            with_abc_123["summary"]
+        )
+
+    def test_update_summaries(self, db, with_abc_123):
+        """Test that bulk updates mark the parents as sequential updates would."""
+        mark_stale(db, "DEF-1", add_ok=True)
+        update_summaries(
+            db,
+            [
+                ("DEF-1", "Epic", None),
+                ("DEF-2", "Story", "DEF-1"),
+                ("DEF-3", "Story", with_abc_123["key"]),
+                ("DEF-4", "Epic", None),
+                ("DEF-5", "Story", "DEF-4"),
+                ("DEF-4", "Epic again", None),
+            ],
+        )
+        # DEF-1 was updated before its child, DEF-4 after
+        assert set(get_stale_issues(db)) == {with_abc_123["key"], "DEF-1"}
+        assert get_summaries(db, ["DEF-2", "DEF-3", "DEF-4", "DEF-5"]) == {
+            "DEF-2": "Story",
+            "DEF-3": "Story",
+            "DEF-4": "Epic again",
+            "DEF-5": "Story",
+        }
+        assert get_summary(db, "DEF-1", stale_ok=True) == "Epic"
+
+    def test_db_stats(self, db, with_abc_123):
+        """Test counting the records."""
+        assert db_stats(db) == {"total": 1, "stale": 0, "fresh": 1}
+        mark_stale_many(db, [with_abc_123["key"], "ABC-2", "ABC-3"], add_ok=True)
+        assert db_stats(db) == {"total": 3, "stale": 3, "fresh": 0}
+
+    def test_stale_queue_uses_index(self, db):
+        """Test that the stale queue is read from the index alone."""
+        with db.connect() as conn:
+            plan = conn.execute(
+                text(
+                    "EXPLAIN QUERY PLAN SELECT issue_key FROM ai_summary"
+                    " WHERE stale_ts IS NOT NULL ORDER BY stale_ts LIMIT 100"
+                )
+            ).all()
+        assert "COVERING INDEX ix_ai_summary_stale_ts" in plan[0][-1]
+
+    def test_upgrade_schema(self, tmp_path):
+        """Test adding the indexes to a table created before they existed."""
+        path = tmp_path / "old.db"
+        engine = create_engine(f"sqlite+pysqlite:///{path}")
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE TABLE ai_summary (issue_key VARCHAR(20) PRIMARY KEY,"
+                    " ai_summary TEXT, summary_ts DATETIME, stale_ts DATETIME,"
+                    " parent_key VARCHAR(20))"
+                )
+            )
+            conn.execute(text("INSERT INTO ai_summary VALUES ('A-1', 'x', 0, 0, NULL)"))
+        assert upgrade_schema(engine) == [
+            "lease_owner",
+            "lease_expiry",
+            "attempts",
+            "input_hash",
+            "ix_ai_summary_parent_key",
+            "ix_ai_summary_stale_ts",
+        ]
+        indexes = inspect(engine).get_indexes("ai_summary")
+        assert sorted(index["name"] for index in indexes) == [
+            "ix_ai_summary_parent_key",
+            "ix_ai_summary_stale_ts",
+        ]
+        assert not upgrade_schema(engine)
+        assert claim_stale(engine, "worker") == ["A-1"]
+
+    @pytest.fixture
+    def chain(self, db) -> list[str]:
+        """Add fresh summaries for a chain of issues, from the top down."""
+        keys = ["ABC-1", "ABC-2", "ABC-3", "ABC-4"]
+        parents: list[Optional[str]] = [None, *keys]
+        # From the bottom up, so that the parents stay fresh
+        update_summaries(db, reversed(list(zip(keys, keys, parents))))
+        assert not get_stale_issues(db)
+        return keys
+
+    def test_mark_ancestors_stale(self, db, chain):
+        """Test marking the whole chain of ancestors as stale."""
+        update_summary(db, "DEF-1", "Unrelated", None)
+        assert mark_stale_many(db, ["ABC-3"], ancestors=True) == {"ABC-3"}
+        assert set(get_stale_issues(db)) == {"ABC-1", "ABC-2", "ABC-3"}
+        # A loop in the parent keys doesn't go on forever
+        update_summary(db, "ABC-1", "Looped", "ABC-4")
+        mark_stale_many(db, ["ABC-4"], ancestors=True)
+        assert set(get_stale_issues(db)) == set(chain)
+
+    @pytest.mark.usefixtures("chain")
+    def test_update_summaries_ancestors(self, db):
+        """Test that updates can mark all the ancestors as stale."""
+        update_summaries(db, [("ABC-4", "New", "ABC-3")])
+        assert get_stale_issues(db) == ["ABC-3"]
+        update_summaries(db, [("ABC-3", "New", "ABC-2")])
+        update_summaries(db, [("ABC-4", "Newer", "ABC-3")], ancestors=True)
+        assert set(get_stale_issues(db)) == {"ABC-1", "ABC-2", "ABC-3"}
+        # Ancestors updated after their descendants in the batch stay fresh
+        update_summaries(
+            db,
+            [("ABC-4", "d", "ABC-3"), ("ABC-3", "c", "ABC-2"), ("ABC-1", "a", None)],
+            ancestors=True,
+        )
+        assert get_stale_issues(db) == ["ABC-2"]
+
+
+class TestQueue:
+    """Test the stale summaries as a work queue."""
+
+    @pytest.fixture
+    def db(self) -> Engine:
+        """Create an empty database for testing."""
+        return memory_db()
+
+    def test_claim_stale(self, db):
+        """Test that workers claim separate batches of stale summaries."""
+        mark_stale_many(db, [f"ABC-{n}" for n in range(5)], add_ok=True)
+        first = claim_stale(db, "one", limit=3)
+        second = claim_stale(db, "two", limit=3)
+        assert len(first) == 3 and len(second) == 2
+        assert not set(first) & set(second)
+        assert not claim_stale(db, "three")
+        # Claimed summaries are still stale until they are regenerated
+        assert len(get_stale_issues(db)) == 5
+        update_summaries(db, [(key, "Done", None) for key in first])
+        release_leases(db, "two", second)
+        assert claim_stale(db, "three") == second
+
+    def test_lease_expiry(self, db):
+        """Test that expired claims can be taken over, but renewed ones can't."""
+        mark_stale_many(db, ["ABC-1", "ABC-2"], add_ok=True)
+        assert claim_stale(db, "one", lease=timedelta(0)) == ["ABC-1", "ABC-2"]
+        assert renew_leases(db, "one", ["ABC-1"]) == 1
+        # The worker died; its other claim is taken over
+        assert claim_stale(db, "two") == ["ABC-2"]
+        assert renew_leases(db, "one", ["ABC-1", "ABC-2"]) == 1
+
+    def test_max_attempts(self, db):
+        """Test that summaries that keep failing are eventually given up on."""
+        mark_stale(db, "ABC-1", add_ok=True)
+        for _ in range(3):
+            assert claim_stale(db, "one", max_attempts=3) == ["ABC-1"]
+            release_leases(db, "one", ["ABC-1"])
+        assert not claim_stale(db, "one", max_attempts=3)
+        update_summary(db, "ABC-1", "Finally", None)
+        mark_stale(db, "ABC-1")
+        assert claim_stale(db, "one", max_attempts=3) == ["ABC-1"]
+
+    @pytest.mark.parametrize("bulk", [False, True])
+    def test_restale_resets_attempts(self, db, bulk):
+        """Test that a summary that was given up on is retried after a change."""
+        update_summaries(db, [("ABC-1", "Epic", None), ("ABC-2", "Story", "ABC-1")])
+        mark_stale_many(db, ["ABC-1", "ABC-2"])
+        for _ in range(2):
+            assert claim_stale(db, "one", max_attempts=2) == ["ABC-2"]
+            release_leases(db, "one", ["ABC-2"])
+        assert claim_stale(db, "one", max_attempts=2) == ["ABC-1"]
+        release_leases(db, "one", ["ABC-1"])
+        if bulk:
+            mark_stale_many(db, ["ABC-2"], ancestors=True)
+        else:
+            mark_stale(db, "ABC-2")
+        # It is claimed again, ahead of its parent
+        assert get_stale_issues(db) == ["ABC-1", "ABC-2"]
+        assert claim_stale(db, "one", max_attempts=2) == ["ABC-2"]
+
+    def test_concurrent_claims(self, tmp_path):
+        """Test that concurrent workers never claim the same summary."""
+        db = sqlite_db(str(tmp_path / "queue.db"))
+        mark_stale_many(db, [f"ABC-{n}" for n in range(200)], add_ok=True)
+
+        def work(owner: str) -> list[str]:
+            claimed: list[str] = []
+            while batch := claim_stale(db, owner, limit=7):
+                claimed += batch
+                update_summaries(db, [(key, owner, None) for key in batch])
+            return claimed
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(work, ["w1", "w2", "w3", "w4"]))
+        claimed = [key for result in results for key in result]
+        assert sorted(claimed) == sorted(f"ABC-{n}" for n in range(200))
+        assert not get_stale_issues(db)
+
+    def test_children_first(self, db):
+        """Test that a stale chain is claimed from the bottom up."""
+        keys = ["ABC-1", "ABC-2", "ABC-3"]
+        parents = [None, *keys]
+        # From the bottom up, so that the parents stay fresh
+        update_summaries(db, reversed(list(zip(keys, keys, parents))))
+        mark_stale_many(db, ["ABC-3"], ancestors=True)
+        claimed = []
+        while batch := claim_stale(db, "one"):
+            claimed.append(batch)
+            update_summaries(
+                db, [(key, "New", parents[keys.index(key)]) for key in batch]
+            )
+        assert claimed == [["ABC-3"], ["ABC-2"], ["ABC-1"]]
+        mark_stale_many(db, ["ABC-3"], ancestors=True)
+        assert sorted(claim_stale(db, "one", children_first=False)) == keys
+
+    def test_parent_cycle(self, db):
+        """Test that summaries whose parents form a cycle are still claimed."""
+        update_summaries(db, [("ABC-1", "A", "ABC-2"), ("ABC-2", "B", "ABC-1")])
+        update_summaries(db, [("ABC-3", "C", "ABC-4")])
+        mark_stale_many(db, ["ABC-1", "ABC-2", "ABC-3"])
+        # Any other work comes first
+        assert claim_stale(db, "one") == ["ABC-3"]
+        assert claim_stale(db, "one", limit=1) == ["ABC-1"]
+        # Its child isn't claimed while it is being regenerated
+        assert not claim_stale(db, "two")
+        update_summary(db, "ABC-1", "New", "ABC-2")
+        assert claim_stale(db, "two") == ["ABC-2"]
+
+    def test_mark_fresh(self, db):
+        """Test keeping summaries whose inputs haven't changed."""
+        update_summaries(
+            db,
+            [("ABC-2", "Story", "ABC-1"), ("ABC-3", "Story", "ABC-1")],
+            input_hashes={"ABC-2": "2" * 64},
+        )
+        update_summary(db, "ABC-1", "Epic", None, input_hash="1" * 64)
+        mark_stale_many(db, ["ABC-2", "ABC-4"], add_ok=True)
+        keys = ["ABC-1", "ABC-2", "ABC-3", "ABC-4"]
+        # Stale summaries keep their fingerprints; unknown ones are left out
+        assert get_input_hashes(db, keys) == {"ABC-1": "1" * 64, "ABC-2": "2" * 64}
+        assert claim_stale(db, "one") == ["ABC-2", "ABC-4"]
+        mark_fresh(db, ["ABC-2", "ABC-4"])
+        # The parent isn't invalidated, and a missing summary stays queued
+        assert get_stale_issues(db) == ["ABC-4"]
+        assert get_summary(db, "ABC-2") == "Story"
+        assert not claim_stale(db, "two")